@@ -24,7 +24,9 @@ import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
 
+import numpy as np
 from singa_auto.model import PosTagModel, FixedKnob, IntegerKnob, FloatKnob, CategoricalKnob, utils
+from singa_auto.datasets import CorpusDataset
 from singa_auto.constants import ModelDependency
 from singa_auto.model.dev import test_model_class
 
@@ -94,14 +96,31 @@ class PyBiLstm(PosTagModel):
         self._net.load_state_dict(net_state_dict)
 
     def _extract_word_dict(self, dataset):
-        word_dict = {}
+        # Corpus vocab is in order of first appearance of words
+        return {word: i for (i, word) in enumerate(dataset.vocab)}
 
-        for sent in dataset:
-            for [word, tag] in sent:
-                if word not in word_dict:
-                    word_dict[word] = len(word_dict)
+    def _iter_batches(self, dataset, Tensor, has_tags=True):
+        N = self._knobs.get('batch_size')
+
+        # Batch queries from lists of words
+        if not isinstance(dataset, CorpusDataset):
+            for lo in range(0, len(dataset), N):
+                yield self._prepare_batch(dataset, lo, lo + N, Tensor, has_tags=has_tags)
+            return
 
-        return word_dict
+        # Batch corpus as arrays, mapping its vocab to words of model, with random words for unknown words
+        word_count = len(self._word_dict)
+        vocab_to_word = np.array([self._word_dict.get(x, -1) for x in dataset.vocab] + [word_count], dtype=np.int64)
+        unknown = vocab_to_word == -1
+        for (token_ids, token_tags, _) in dataset.iter_batches(N):
+            words = vocab_to_word[token_ids]  # Padding (-1) maps to the null word
+            is_unknown = unknown[token_ids]
+            words[is_unknown] = np.random.randint(0, word_count, size=int(is_unknown.sum()))
+            tags = None
+            if has_tags:
+                tags = np.where(token_ids == -1, self._tag_count, token_tags[:, :, 0])
+                tags = Tensor(tags.tolist())
+            yield (Tensor(words.tolist()), tags)
 
     def _prepare_batch(self, dataset, lo, hi, Tensor, has_tags=True):
         word_dict = self._word_dict
@@ -140,9 +159,7 @@ class PyBiLstm(PosTagModel):
         return (words_tsr, tags_tsr)
 
     def _predict(self, dataset):
-        N = self._knobs.get('batch_size')
         net = self._net
-        B = math.ceil(len(dataset) / N)  # No. of batches
         word_count = len(self._word_dict)
         null_word = word_count
 
@@ -153,13 +170,7 @@ class PyBiLstm(PosTagModel):
             Tensor = torch.cuda.LongTensor
 
         sents_pred_tags = []
-        for i in range(B):
-            # Extract batch from dataset
-            (words_tsr, _) = self._prepare_batch(dataset,
-                                                 i * N,
-                                                 i * N + N,
-                                                 Tensor,
-                                                 has_tags=False)
+        for (words_tsr, _) in self._iter_batches(dataset, Tensor, has_tags=False):
 
             # Forward propagate batch through model
             probs_tsr = net(words_tsr)
@@ -201,11 +212,7 @@ class PyBiLstm(PosTagModel):
 
         for epoch in range(ep):
             total_loss = 0
-            for i in range(B):
-                # Extract batch from dataset
-                (words_tsr,
-                 tags_tsr) = self._prepare_batch(dataset, i * N, i * N + N,
-                                                 Tensor)
+            for (words_tsr, tags_tsr) in self._iter_batches(dataset, Tensor):
 
                 # Reset gradients for this batch
                 optimizer.zero_grad()
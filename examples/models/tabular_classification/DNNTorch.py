@@ -257,10 +257,8 @@ class DNNTorch(TabularClfModel):
         self._target = target
 
         # Load CSV file as pandas dataframe
-        df = pd.read_csv(dataset_url, index_col=0)
-        if exclude and set(df.columns.tolist()).intersection(
-                set(exclude)) == set(exclude):
-            df = df.drop(exclude, axis=1)
+        dataset = utils.dataset.load_tabular_dataset(dataset_url, index_col=0)
+        df = dataset.to_dataframe(columns=self._get_columns(dataset, exclude))
 
         # Optional: Remove 4 applications with XNA CODE_GENDER (train set)
         df = df[df['CODE_GENDER'] != 'XNA']
@@ -351,7 +349,8 @@ class DNNTorch(TabularClfModel):
 
     def evaluate(self, dataset_url, **kwargs):
         # Load CSV file as pandas dataframe
-        df = pd.read_csv(dataset_url, index_col=0)
+        dataset = utils.dataset.load_tabular_dataset(dataset_url, index_col=0)
+        df = dataset.to_dataframe(columns=self._get_columns(dataset))
 
         # Optional: Remove 4 applications with XNA CODE_GENDER (train set)
         df = df[df['CODE_GENDER'] != 'XNA']
@@ -469,6 +468,15 @@ class DNNTorch(TabularClfModel):
         device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self._model = self._model.to(device)
 
+    def _get_columns(self, dataset, exclude=None):
+        # Columns to read, i.e. features, target & CODE_GENDER (to filter rows by), in the dataset's order
+        target = self._target or 'TARGET'
+        if self._features is None:
+            columns = set(dataset.columns) - set(exclude or [])
+        else:
+            columns = set(self._features) | {target, 'CODE_GENDER'}
+        return [x for x in dataset.columns if x in columns]
+
     def _extract_xy(self, data, method=None):
         if self._target is None:
             self._target = 'TARGET'
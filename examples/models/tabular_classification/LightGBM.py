@@ -73,10 +73,8 @@ class LightGBM(TabularClfModel):
         self._features = features
         self._target = target
 
-        df = pd.read_csv(dataset_url, index_col=0)
-        if exclude and set(df.columns.tolist()).intersection(
-                set(exclude)) == set(exclude):
-            df = df.drop(exclude, axis=1)
+        dataset = utils.dataset.load_tabular_dataset(dataset_url, index_col=0)
+        df = dataset.to_dataframe(columns=self._get_columns(dataset, exclude))
 
         # Optional: Remove 4 applications with XNA CODE_GENDER (train set)
         df = df[df['CODE_GENDER'] != 'XNA']
@@ -129,7 +127,8 @@ class LightGBM(TabularClfModel):
             flag += 1
 
     def evaluate(self, dataset_url, **kwargs):
-        df = pd.read_csv(dataset_url, index_col=0)
+        dataset = utils.dataset.load_tabular_dataset(dataset_url, index_col=0)
+        df = dataset.to_dataframe(columns=self._get_columns(dataset))
 
         # Optional: Remove 4 applications with XNA CODE_GENDER (train set)
         df = df[df['CODE_GENDER'] != 'XNA']
@@ -199,6 +198,15 @@ class LightGBM(TabularClfModel):
             # Load model from temp file
             self._model = lgb.Booster(model_file=tmp.name)
 
+    def _get_columns(self, dataset, exclude=None):
+        # Columns to read, i.e. features, target & CODE_GENDER (to filter rows by), in the dataset's order
+        target = self._target or 'TARGET'
+        if self._features is None:
+            columns = set(dataset.columns) - set(exclude or [])
+        else:
+            columns = set(self._features) | {target, 'CODE_GENDER'}
+        return [x for x in dataset.columns if x in columns]
+
     def _extract_xy(self, data):
         if self._target is None:
             self._target = 'TARGET'
@@ -26,7 +26,7 @@ import json
 from sklearn.preprocessing import PolynomialFeatures
 from sklearn.linear_model import PassiveAggressiveClassifier
 
-from singa_auto.model import TabularClfModel, IntegerKnob, FloatKnob, CategoricalKnob, logger
+from singa_auto.model import TabularClfModel, IntegerKnob, FloatKnob, CategoricalKnob, logger, utils
 from singa_auto.model.dev import test_model_class
 from singa_auto.constants import ModelDependency
 
@@ -65,12 +65,12 @@ class PassiveAClf(TabularClfModel):
         self._features = features
         self._target = target
 
-        # Load CSV file as pandas dataframe
+        # Load CSV file as a tabular dataset
         csv_path = dataset_path
-        data = pd.read_csv(csv_path)
+        dataset = utils.dataset.load_tabular_dataset(csv_path)
 
-        # Extract X & y from dataframe
-        (X, y) = self._extract_xy(data)
+        # Extract X & y from the dataset
+        (X, y) = self._extract_xy(dataset)
 
         X = self.prepare_X(X)
 
@@ -81,12 +81,12 @@ class PassiveAClf(TabularClfModel):
         logger.log('Train accuracy: {}'.format(score))
 
     def evaluate(self, dataset_path, **kwargs):
-        # Load CSV file as pandas dataframe
+        # Load CSV file as a tabular dataset
         csv_path = dataset_path
-        data = pd.read_csv(csv_path)
+        dataset = utils.dataset.load_tabular_dataset(csv_path)
 
-        # Extract X & y from dataframe
-        (X, y) = self._extract_xy(data)
+        # Extract X & y from the dataset
+        (X, y) = self._extract_xy(dataset)
 
         X = self.prepare_X(X)
 
@@ -130,19 +130,19 @@ class PassiveAClf(TabularClfModel):
         else:
             self._target = None
 
-    def _extract_xy(self, data):
+    def _extract_xy(self, dataset):
         features = self._features
         target = self._target
 
         if features is None:
-            X = data.iloc[:, :-1]
-        else:
-            X = data[features]
+            features = dataset.columns[:-1]
 
         if target is None:
-            y = data.iloc[:, -1]
-        else:
-            y = data[target]
+            target = dataset.columns[-1]
+
+        # Read only the columns needed
+        X = dataset.to_dataframe(columns=features)
+        y = dataset.to_dataframe(columns=[target])[target]
 
         return (X, y)
 
@@ -2,10 +2,9 @@ from sklearn.ensemble import RandomForestClassifier
 import pickle
 import base64
 import pandas as pd
-import numpy as np
 import json
 
-from singa_auto.model import TabularClfModel, IntegerKnob, CategoricalKnob, logger
+from singa_auto.model import TabularClfModel, IntegerKnob, CategoricalKnob, logger, utils
 from singa_auto.model.dev import test_model_class
 from singa_auto.constants import ModelDependency
 
@@ -37,15 +36,15 @@ class RandomForestClf(TabularClfModel):
         self._features = features
         self._target = target
 
-        # Load CSV file as pandas dataframe
+        # Load CSV file as a tabular dataset
         csv_path = dataset_path
-        data = pd.read_csv(csv_path)
+        dataset = utils.dataset.load_tabular_dataset(csv_path)
 
-        # Extract X & y from dataframe
-        (X, y) = self._extract_xy(data)
+        # Extract X & y from the dataset, with categorical features as their stored codes
+        (X, y) = self._extract_xy(dataset)
 
-        # Encode categorical features
-        X = self._encoding_categorical_type(X)
+        # Record the codes of categories of categorical features, to encode queries with
+        self._encoding_dict = self._get_encoding_dict(dataset, X.columns)
 
         self._clf.fit(X, y)
 
@@ -54,15 +53,12 @@ class RandomForestClf(TabularClfModel):
         logger.log('Train accuracy: {}'.format(score))
 
     def evaluate(self, dataset_path, **kwargs):
-        # Load CSV file as pandas dataframe
+        # Load CSV file as a tabular dataset
         csv_path = dataset_path
-        data = pd.read_csv(csv_path)
+        dataset = utils.dataset.load_tabular_dataset(csv_path)
 
-        # Extract X & y from dataframe
-        (X, y) = self._extract_xy(data)
-
-        # Encode categorical features
-        X = self._encoding_categorical_type(X)
+        # Extract X & y from the dataset, with categorical features as their stored codes
+        (X, y) = self._extract_xy(dataset)
 
         accuracy = self._clf.score(X, y)
         return accuracy
@@ -99,38 +95,25 @@ class RandomForestClf(TabularClfModel):
         self._features = json.loads(params['features'])
         self._target = params['target']
 
-    def _extract_xy(self, data):
+    def _extract_xy(self, dataset):
         features = self._features
         target = self._target
 
         if features is None:
-            X = data.iloc[:, :-1]
-        else:
-            X = data[features]
+            features = dataset.columns[:-1]
 
         if target is None:
-            y = data.iloc[:, -1]
-        else:
-            y = data[target]
-
-        return (X, y)
+            target = dataset.columns[-1]
 
-    def _encoding_categorical_type(self, cols):
-        # Apply label encoding for those categorical columns
-        cat_cols = list(
-            filter(lambda x: cols[x].dtype == 'object', cols.columns))
-        encoded_cols = pd.DataFrame({col: cols[col].astype('category').cat.codes \
-            if cols[col].dtype == 'object' else cols[col] for col in cols}, index=cols.index)
+        # Read only the columns needed, with categorical features as codes (with NaN for missing values)
+        X = dataset.to_dataframe(columns=features, encode_categoricals=True)
+        y = dataset.to_dataframe(columns=[target])[target]
 
-        # Recover the missing elements 
-        encoded_cols = encoded_cols.replace(to_replace=-1, value=np.nan)
-
-        # Generate the dict that maps categorical features to numerical
-        encoding_dict = {col: {cat: n for n, cat in enumerate(cols[col].astype('category'). \
-            cat.categories)} for col in cat_cols}
-        self._encoding_dict = encoding_dict
+        return (X, y)
 
-        return encoded_cols
+    def _get_encoding_dict(self, dataset, features):
+        # Map categories of each categorical feature to their codes, as stored in the dataset
+        return {col: dataset.get_encoding(col) for col in features if dataset.is_categorical(col)}
 
     def _features_mapping(self, df):
         # Encode the categorical features with pre saved encoding dict
@@ -21,10 +21,9 @@ import xgboost as xgb
 import pickle
 import base64
 import pandas as pd
-import numpy as np
 import json
 
-from singa_auto.model import TabularClfModel, IntegerKnob, FloatKnob, logger
+from singa_auto.model import TabularClfModel, IntegerKnob, FloatKnob, logger, utils
 from singa_auto.model.dev import test_model_class
 from singa_auto.constants import ModelDependency
 
@@ -54,15 +53,15 @@ class XgbClf(TabularClfModel):
         self._features = features
         self._target = target
 
-        # Load CSV file as pandas dataframe
+        # Load CSV file as a tabular dataset
         csv_path = dataset_path
-        data = pd.read_csv(csv_path)
+        dataset = utils.dataset.load_tabular_dataset(csv_path)
 
-        # Extract X & y from dataframe
-        (X, y) = self._extract_xy(data)
+        # Extract X & y from the dataset, with categorical features as their stored codes
+        (X, y) = self._extract_xy(dataset)
 
-        # Encode categorical features
-        X = self._encoding_categorical_type(X)
+        # Record the codes of categories of categorical features, to encode queries with
+        self._encoding_dict = self._get_encoding_dict(dataset, X.columns)
 
         num_class = y.unique().size
 
@@ -81,15 +80,12 @@ class XgbClf(TabularClfModel):
         logger.log('Train accuracy: {}'.format(score))
 
     def evaluate(self, dataset_path,  **kwargs):
-        # Load CSV file as pandas dataframe
+        # Load CSV file as a tabular dataset
         csv_path = dataset_path
-        data = pd.read_csv(csv_path)
+        dataset = utils.dataset.load_tabular_dataset(csv_path)
 
-        # Extract X & y from dataframe
-        (X, y) = self._extract_xy(data)
-
-        # Encode categorical features
-        X = self._encoding_categorical_type(X)
+        # Extract X & y from the dataset, with categorical features as their stored codes
+        (X, y) = self._extract_xy(dataset)
 
         accuracy = self._clf.score(X, y)
         return accuracy
@@ -126,38 +122,25 @@ class XgbClf(TabularClfModel):
         self._features = json.loads(params['features'])
         self._target = params['target']
 
-    def _extract_xy(self, data):
+    def _extract_xy(self, dataset):
         features = self._features
         target = self._target
 
         if features is None:
-            X = data.iloc[:, :-1]
-        else:
-            X = data[features]
+            features = dataset.columns[:-1]
 
         if target is None:
-            y = data.iloc[:, -1]
-        else:
-            y = data[target]
+            target = dataset.columns[-1]
 
-        return (X, y)
+        # Read only the columns needed, with categorical features as codes (with NaN for missing values)
+        X = dataset.to_dataframe(columns=features, encode_categoricals=True)
+        y = dataset.to_dataframe(columns=[target])[target]
 
-    def _encoding_categorical_type(self, cols):
-        # Apply label encoding for those categorical columns
-        cat_cols = list(
-            filter(lambda x: cols[x].dtype == 'object', cols.columns))
-        encoded_cols = pd.DataFrame({col: cols[col].astype('category').cat.codes \
-            if cols[col].dtype == 'object' else cols[col] for col in cols}, index=cols.index)
-
-        # Recover the missing elements (Use XGBoost to automatically handle them)
-        encoded_cols = encoded_cols.replace(to_replace=-1, value=np.nan)
-
-        # Generate the dict that maps categorical features to numerical
-        encoding_dict = {col: {cat: n for n, cat in enumerate(cols[col].astype('category'). \
-            cat.categories)} for col in cat_cols}
-        self._encoding_dict = encoding_dict
+        return (X, y)
 
-        return encoded_cols
+    def _get_encoding_dict(self, dataset, features):
+        # Map categories of each categorical feature to their codes, as stored in the dataset
+        return {col: dataset.get_encoding(col) for col in features if dataset.is_categorical(col)}
 
     def _features_mapping(self, df):
         # Encode the categorical features with pre saved encoding dict
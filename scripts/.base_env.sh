@@ -80,6 +80,7 @@ export DB_DIR_PATH=db/data
 export DATA_DIR_PATH=data # Shares a data folder with containers, relative to workdir
 export LOGS_DIR_PATH=logs # Shares a folder with containers that stores components' logs, relative to workdir
 export PARAMS_DIR_PATH=params # Shares a folder with containers that stores model parameters, relative to workdir
+export PARAMS_STORE_TYPE=FILE # How model parameters are stored: FILE, or CONTENT_ADDRESSED to deduplicate identical arrays across trials
 
 export CONDA_ENVIORNMENT=singa_auto
 # Check the path existence first. If it does not exist, define it
@@ -0,0 +1,104 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+'''
+    Measures latency of Bayesian Optimization proposals against the no. of workers proposed for at once,
+    for skopt's ``Optimizer`` asked & told one worker at a time, and for ``BatchBayesOptimizer``.
+    skopt's ``Optimizer`` optimizes the acquisition function for its next point in ``tell``, so most of its latency
+    shows up per result. Also reports the min distance between points proposed together, where duplicates are at 0.
+
+    Usage: python scripts/benchmarks/advisor_latency.py [--workers 1,8,32,64] [--dims 4] [--warmup 20]
+'''
+
+import argparse
+import time
+import numpy as np
+from skopt.space import Real
+from skopt.optimizer import Optimizer
+
+from singa_auto.advisor.skopt import BatchBayesOptimizer, N_INITIAL_POINTS
+
+
+def objective(point):
+    return float(np.sum(np.square(np.asarray(point) - 0.3)))
+
+
+def min_distance(points):
+    points = np.asarray(points)
+    if len(points) < 2:
+        return float('nan')
+    dists = np.sqrt(np.sum(np.square(points[:, None, :] - points[None, :, :]), axis=-1))
+    return float(np.min(dists[np.triu_indices(len(points), k=1)]))
+
+
+def run_sequential(dimensions, num_workers, warmup):
+    # Previous path: `ask` once per free worker, `tell` (with a refit) once per result
+    optimizer = Optimizer(dimensions, n_initial_points=N_INITIAL_POINTS, base_estimator='gp')
+    for point in optimizer.ask(warmup):
+        optimizer.tell(point, objective(point))
+
+    start = time.perf_counter()
+    points = [optimizer.ask() for _ in range(num_workers)]
+    ask_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for point in points:
+        optimizer.tell(point, objective(point))
+    tell_secs = time.perf_counter() - start
+
+    return (ask_secs, tell_secs, points)
+
+
+def run_batch(dimensions, num_workers, warmup):
+    optimizer = BatchBayesOptimizer(dimensions, background_fit=False)
+    for (i, point) in enumerate(optimizer.ask(list(range(warmup)))):
+        optimizer.tell(i, point, objective(point))
+
+    # Refits are done in the background by the advisor, so only the time to ask & record results counts
+    optimizer._background_fit = True
+    start = time.perf_counter()
+    keys = list(range(warmup, warmup + num_workers))
+    points = optimizer.ask(keys)
+    ask_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for (key, point) in zip(keys, points):
+        optimizer.tell(key, point, objective(point))
+    tell_secs = time.perf_counter() - start
+
+    return (ask_secs, tell_secs, points)
+
+
+def run(worker_counts, num_dims, warmup):
+    dimensions = [Real(0, 1) for _ in range(num_dims)]
+    print('{} dimensions, {} results before proposing'.format(num_dims, warmup))
+    for num_workers in worker_counts:
+        for (name, run_fn) in [('sequential', run_sequential), ('batch', run_batch)]:
+            (ask_secs, tell_secs, points) = run_fn(dimensions, num_workers, warmup)
+            print('{:>4} workers, {:>10}: {:8.1f} ms per proposal, {:8.1f} ms per result, min distance {:.4f}'.format(
+                num_workers, name, ask_secs * 1000 / num_workers, tell_secs * 1000 / num_workers, min_distance(points)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=str, default='1,8,32,64', help='Comma-separated no. of workers proposed for at once')
+    parser.add_argument('--dims', type=int, default=4, help='No. of dimensions to search over')
+    parser.add_argument('--warmup', type=int, default=20, help='No. of results told before proposing')
+    args = parser.parse_args()
+    run([int(x) for x in args.workers.split(',')], args.dims, args.warmup)
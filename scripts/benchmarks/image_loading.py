@@ -0,0 +1,91 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+'''
+    Compares decoding & resizing of batches of images with ``DatasetUtils.load_images``, ``load_images_as_array``
+    & ``transform_images`` against the previous one-image-at-a-time path, in images per second.
+
+    Usage: python scripts/benchmarks/image_loading.py [--images 256] [--width 640] [--height 480] [--image_size 224]
+'''
+
+import io
+import argparse
+import time
+import numpy as np
+from PIL import Image
+
+from singa_auto.datasets.dataset import DatasetUtils
+
+
+def make_images(num_images, width, height, format):
+    images = []
+    for _ in range(num_images):
+        # Smooth gradients with noise, so that images compress like photos rather than random noise
+        (x, y) = np.meshgrid(np.linspace(0, 255, width), np.linspace(0, 255, height))
+        pixels = np.stack([x, y, (x + y) / 2], axis=-1) + np.random.randint(0, 32, (height, width, 3))
+        f = io.BytesIO()
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(f, format=format)
+        images.append(f.getvalue())
+    return images
+
+
+def load_images_sequential(images, image_size):
+    # Previous path: decode each image fully, then resize with a list comprehension per step & stack
+    pil_images = [Image.open(io.BytesIO(x)).convert('RGB') for x in images]
+    pil_images = [Image.fromarray(np.asarray(x, dtype=np.uint8)) for x in pil_images]
+    pil_images = [x.resize([image_size, image_size]) for x in pil_images]
+    return np.asarray([np.asarray(x) for x in pil_images])
+
+
+def time_it(fn, *args, repeats=3):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return (best, out)
+
+
+def run(num_images, width, height, image_size, repeats):
+    utils = DatasetUtils()
+    for format in ['JPEG', 'PNG']:
+        images = make_images(num_images, width, height, format)
+        print('{} {} images of {}x{}, resized to {}x{}:'.format(num_images, format, width, height, image_size, image_size))
+
+        paths = [
+            ('sequential', lambda: load_images_sequential(images, image_size)),
+            ('load_images + transform_images',
+             lambda: utils.transform_images(utils.load_images(images), image_size=image_size)[0]),
+            ('load_images_as_array', lambda: utils.load_images_as_array(images, image_size))
+        ]
+        for (name, fn) in paths:
+            (secs, out) = time_it(fn, repeats=repeats)
+            print('{:>32}: {:10.1f} images/sec, output {}'.format(name, num_images / secs, out.shape))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=256, help='No. of images per batch')
+    parser.add_argument('--width', type=int, default=640, help='Width of images')
+    parser.add_argument('--height', type=int, default=480, help='Height of images')
+    parser.add_argument('--image_size', type=int, default=224, help='Width & height to resize images to')
+    parser.add_argument('--repeats', type=int, default=3, help='No. of runs, best is reported')
+    args = parser.parse_args()
+    run(args.images, args.width, args.height, args.image_size, args.repeats)
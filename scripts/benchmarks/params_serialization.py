@@ -0,0 +1,79 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+'''
+    Compares the binary params format against the legacy msgpack-of-lists format,
+    for serialization & deserialization of model parameters.
+
+    Usage: python scripts/benchmarks/params_serialization.py [--params 10000000] [--arrays 20]
+'''
+
+import argparse
+import time
+import numpy as np
+
+from singa_auto.param_store.serialization import serialize_params, deserialize_params, \
+    serialize_params_msgpack, deserialize_params_msgpack
+
+
+def make_params(num_params, num_arrays):
+    size = num_params // num_arrays
+    params = {
+        'layer_{}'.format(i): np.random.rand(size).astype(np.float32)
+        for i in range(num_arrays)
+    }
+    params['train_params'] = '{"epochs": 10}'
+    params['step'] = 100
+    return params
+
+
+def time_it(fn, *args, repeats=3):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return (best, out)
+
+
+def run(num_params, num_arrays, repeats):
+    params = make_params(num_params, num_arrays)
+    model_mb = sum(x.nbytes for x in params.values() if isinstance(x, np.ndarray)) / 1e6
+    print('Params: {} float32 values in {} arrays ({:.1f} MB)'.format(num_params, num_arrays, model_mb))
+
+    formats = [
+        ('msgpack-of-lists', serialize_params_msgpack, deserialize_params_msgpack),
+        ('binary', serialize_params, deserialize_params)
+    ]
+    for (name, serialize, deserialize) in formats:
+        (ser_secs, params_bytes) = time_it(serialize, params, repeats=repeats)
+        (de_secs, out) = time_it(deserialize, params_bytes, repeats=repeats)
+        dtype = out['layer_0'].dtype
+        print('{:>18}: serialize {:8.3f}s, deserialize {:8.3f}s, size {:8.1f} MB, dtype after load {}'.format(
+            name, ser_secs, de_secs, len(params_bytes) / 1e6, dtype))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--params', type=int, default=10000000, help='Total no. of float32 values')
+    parser.add_argument('--arrays', type=int, default=20, help='No. of arrays to split values into')
+    parser.add_argument('--repeats', type=int, default=3, help='No. of runs, best is reported')
+    args = parser.parse_args()
+    run(args.params, args.arrays, args.repeats)
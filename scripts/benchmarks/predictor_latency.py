@@ -0,0 +1,146 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+'''
+    Measures end-to-end prediction latency through the predictor, comparing the previous design
+    (a new consumer per query & worker, polled every 100ms) against the current ``QueryDispatcher``
+    (a single reply channel per predictor, demultiplexed into futures), with queries of each request
+    sent right away or coalesced with those of concurrent requests.
+
+    Runs against the in-process mock Kafka broker, with simulated inference workers.
+    As the mock has no consumer setup cost, ``--consumer-setup-ms`` is added to each consumer created
+    by the previous design, standing in for Kafka's connection & group join.
+
+    Usage: python scripts/benchmarks/predictor_latency.py [--workers 2] [--clients 4] [--requests 20]
+'''
+
+import argparse
+import time
+import uuid
+import threading
+from collections import defaultdict
+
+from singa_auto.kafka import InferenceCache as KafkaInferenceCache
+from singa_auto.predictor import Query, Prediction
+from singa_auto.predictor.dispatcher import QueryDispatcher
+from singa_auto.utils.metrics import Histogram
+
+PREVIOUS_PREDICT_LOOP_SLEEP_SECS = 0.1
+
+
+def run_worker(worker_id, stop_event, predict_secs):
+    # Mirrors the loop of ``InferenceWorker``, with a model that takes ``predict_secs`` per batch
+    cache = KafkaInferenceCache(hosts=None)
+    while not stop_event.is_set():
+        queries = cache.pop_queries_for_worker(worker_id, 32, timeout_secs=0.1)
+        if len(queries) == 0:
+            continue
+
+        time.sleep(predict_secs)
+        channel_to_predictions = defaultdict(list)
+        for query in queries:
+            channel_to_predictions[query.reply_to].append(Prediction(query.query, query.id, worker_id))
+        for (channel, predictions) in channel_to_predictions.items():
+            if channel is None:
+                cache.add_predictions_for_worker(worker_id, predictions)
+            else:
+                cache.add_replies(channel, predictions)
+
+
+def predict_previous(cache, queries, worker_ids, consumer_setup_secs):
+    pending_queries = set()
+    for worker_id in worker_ids:
+        cache.add_queries_for_worker(worker_id, queries)
+        pending_queries.update([(x.id, worker_id) for x in queries])
+
+    while len(pending_queries) > 0:
+        for (query_id, worker_id) in list(pending_queries):
+            time.sleep(consumer_setup_secs)
+            prediction = cache.take_prediction_for_worker(worker_id, query_id)
+            if prediction is not None:
+                pending_queries.remove((query_id, worker_id))
+        time.sleep(PREVIOUS_PREDICT_LOOP_SLEEP_SECS)
+
+
+def run_design(design, args):
+    worker_ids = ['{}_{}'.format(design, uuid.uuid4()) for _ in range(args.workers)]
+    stop_event = threading.Event()
+    workers = [
+        threading.Thread(target=run_worker, args=(x, stop_event, args.predict_ms / 1000))
+        for x in worker_ids
+    ]
+    for worker in workers:
+        worker.start()
+
+    cache = KafkaInferenceCache(hosts=None)
+    dispatcher = QueryDispatcher(cache, get_worker_ids=lambda: worker_ids) if design != 'previous' else None
+    latency_hist = Histogram('latency')
+
+    def client():
+        for _ in range(args.requests):
+            queries = [Query(i) for i in range(args.queries)]
+            start = time.monotonic()
+            if design == 'coalesced':
+                for future in dispatcher.submit(queries):
+                    future.result()
+            elif design == 'reply channel':
+                for future in dispatcher.dispatch(queries, worker_ids):
+                    future.result()
+            else:
+                predict_previous(cache, queries, worker_ids, args.consumer_setup_ms / 1000)
+            latency_hist.observe(time.monotonic() - start)
+
+    clients = [threading.Thread(target=client) for _ in range(args.clients)]
+    start = time.monotonic()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    total_secs = time.monotonic() - start
+
+    stop_event.set()
+    for worker in workers:
+        worker.join()
+    if dispatcher is not None:
+        dispatcher.stop()
+
+    return (total_secs, latency_hist.summary())
+
+
+def run(args):
+    print('{} workers, {} clients x {} requests of {} queries, model takes {}ms per batch'.format(
+        args.workers, args.clients, args.requests, args.queries, args.predict_ms))
+
+    for design in ['previous', 'reply channel', 'coalesced']:
+        (total_secs, latency) = run_design(design, args)
+        print('{:>14}: {:7.1f} requests/s, latency p50 {:7.1f}ms, p99 {:7.1f}ms'.format(
+            design, latency['count'] / total_secs, latency['p50'] * 1000, latency['p99'] * 1000))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=2, help='No. of inference workers')
+    parser.add_argument('--clients', type=int, default=4, help='No. of concurrent clients')
+    parser.add_argument('--requests', type=int, default=20, help='No. of requests per client')
+    parser.add_argument('--queries', type=int, default=4, help='No. of queries per request')
+    parser.add_argument('--predict-ms', type=float, default=5, help='Time taken by model per batch')
+    parser.add_argument('--consumer-setup-ms', type=float, default=20,
+                        help='Cost added to each consumer created by the previous design')
+    args = parser.parse_args()
+    run(args)
@@ -0,0 +1,115 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+'''
+    Measures contention on the Redis lock guarding the param cache, with many workers taking it concurrently,
+    comparing the previous spin-sleep lock against the current lock of ``RedisSession``.
+    Runs against the in-process mock Redis, so it measures the locking protocol rather than the network.
+
+    Usage: python scripts/benchmarks/redis_lock.py [--workers 16] [--ops 50] [--read-ratio 0.8] [--hold-ms 2]
+'''
+
+import argparse
+import time
+import uuid
+import random
+import threading
+
+from singa_auto.redis.redis import RedisSession
+from singa_auto.utils.metrics import Histogram
+
+SPIN_LOCK_SLEEP_SECONDS = 0.1
+
+
+class SpinLock():
+    '''
+        The previous lock: polls `SET NX` at a fixed interval, and releases with GET-then-DELETE.
+    '''
+
+    def __init__(self, session: RedisSession):
+        self._redis = session._redis
+        self._name = session._get_redis_name('spin_lock')
+        self._uid = str(uuid.uuid4())
+
+    def acquire(self, shared):
+        while not self._redis.set(self._name, self._uid, nx=True, ex=60):
+            time.sleep(SPIN_LOCK_SLEEP_SECONDS)
+
+    def release(self):
+        value = self._redis.get(self._name)
+        if value is not None and value.decode() == self._uid:
+            self._redis.delete(self._name)
+
+
+class SessionLock():
+
+    def __init__(self, session: RedisSession):
+        self._session = session
+
+    def acquire(self, shared):
+        self._session.acquire_lock(shared=shared)
+
+    def release(self):
+        self._session.release_lock()
+
+
+def run_workers(make_lock, num_workers, num_ops, read_ratio, hold_secs):
+    wait_hist = Histogram('wait')
+    namespace = 'benchmark:{}'.format(uuid.uuid4())
+
+    def work():
+        lock = make_lock(RedisSession(namespace))
+        for _ in range(num_ops):
+            shared = random.random() < read_ratio
+            start = time.monotonic()
+            lock.acquire(shared)
+            wait_hist.observe(time.monotonic() - start)
+            time.sleep(hold_secs)
+            lock.release()
+
+    threads = [threading.Thread(target=work) for _ in range(num_workers)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total_secs = time.monotonic() - start
+    return (total_secs, wait_hist.summary())
+
+
+def run(num_workers, num_ops, read_ratio, hold_ms):
+    print('{} workers x {} lock ops each, {:.0%} reads, lock held for {}ms'.format(
+        num_workers, num_ops, read_ratio, hold_ms))
+
+    locks = [('spin-sleep', SpinLock), ('backoff + read/write', SessionLock)]
+    for (name, make_lock) in locks:
+        (total_secs, wait) = run_workers(make_lock, num_workers, num_ops, read_ratio, hold_ms / 1000)
+        print('{:>22}: total {:7.2f}s, {:8.1f} ops/s, wait p50 {:7.1f}ms, p99 {:7.1f}ms, max {:7.1f}ms'.format(
+            name, total_secs, wait['count'] / total_secs, wait['p50'] * 1000, wait['p99'] * 1000,
+            wait['max'] * 1000))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=16, help='No. of concurrent workers')
+    parser.add_argument('--ops', type=int, default=50, help='No. of lock acquisitions per worker')
+    parser.add_argument('--read-ratio', type=float, default=0.8, help='Fraction of acquisitions for reading')
+    parser.add_argument('--hold-ms', type=float, default=2, help='Time the lock is held for on each acquisition')
+    args = parser.parse_args()
+    run(args.workers, args.ops, args.read_ratio, args.hold_ms)
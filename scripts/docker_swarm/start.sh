@@ -95,6 +95,7 @@ start_admin()
         -e HOST_WORKDIR_PATH=$HOST_WORKDIR_PATH \
         -e DATA_DIR_PATH=$DATA_DIR_PATH \
         -e PARAMS_DIR_PATH=$PARAMS_DIR_PATH \
+        -e PARAMS_STORE_TYPE=$PARAMS_STORE_TYPE \
         -e LOGS_DIR_PATH=$LOGS_DIR_PATH \
         -e APP_MODE=$APP_MODE \
         -e CONTAINER_MODE=$CONTAINER_MODE \
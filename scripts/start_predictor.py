@@ -23,7 +23,7 @@ import logging
 from singa_auto.utils.service import run_worker
 from singa_auto.meta_store import MetaStore
 from singa_auto.predictor.predictor import Predictor
-from singa_auto.predictor.app import app
+from singa_auto.predictor.app import app, get_predictor
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +34,7 @@ def start_worker(service_id, service_type, container_id):
     global global_predictor
 
     logger.info('Starting global predictor...')
-    global_predictor = Predictor(service_id)
+    global_predictor = get_predictor()
     global_predictor.start()
 
     app.run(host='0.0.0.0',
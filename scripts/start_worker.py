@@ -18,8 +18,15 @@
 #
 
 import os
+import json
 
 
+# Copy datasets to the node-local cache while dependencies are installed
+prefetch_datasets = json.loads(os.environ.get('WORKER_PREFETCH_DATASETS') or '[]')
+if len(prefetch_datasets) > 0:
+    from singa_auto.data_store import FileDataStore, CachedDataStore
+    CachedDataStore(FileDataStore()).prefetch(prefetch_datasets)
+
 # Run install command
 install_command = os.environ.get('WORKER_INSTALL_COMMAND', '')
 
@@ -19,20 +19,19 @@
 
 import os
 import logging
+import traceback
+import uuid
 import bcrypt
-import pandas as pd
 import zipfile
-import tempfile
-from collections import Counter
-from PIL import Image
-from singa_auto.constants import ServiceStatus, UserType, TrainJobStatus, ModelAccessRight, InferenceJobStatus, ModelType
+from singa_auto.constants import DatasetStatStatus, ServiceStatus, UserType, TrainJobStatus, ModelAccessRight, InferenceJobStatus, ModelType
 from singa_auto.config import SUPERADMIN_EMAIL, SUPERADMIN_PASSWORD
 from singa_auto.meta_store import MetaStore
 from singa_auto.model import LoggerUtils
 from singa_auto.container import DockerSwarmContainerManager
 from singa_auto.container import KubernetesContainerManager
 from singa_auto.data_store import FileDataStore, DataStore, Dataset
-from singa_auto.param_store import FileParamStore, ParamStore
+from .dataset_stats import submit_dataset_stat_job
+from singa_auto.param_store import ParamStore, make_param_store
 from .services_manager import ServicesManager
 from singa_auto.error_code import InvalidUserError, InvalidPasswordError, UserAlreadyBannedError, \
                               InvalidDatasetError, InvalidTrainJobError, NoModelsForTrainJobError, \
@@ -57,7 +56,7 @@ class Admin(object):
             container_manager = container_manager or KubernetesContainerManager()
 
         self._data_store: DataStore = data_store or FileDataStore()
-        self._param_store: ParamStore = param_store or FileParamStore()
+        self._param_store: ParamStore = param_store or make_param_store()
         self._base_worker_image = '{}:{}'.format(
             os.environ['SINGA_AUTO_IMAGE_WORKER'],
             os.environ['SINGA_AUTO_VERSION'])
@@ -74,6 +73,7 @@ class Admin(object):
     def seed(self):
         with self._meta_store:
             self._seed_superadmin()
+            self._resume_dataset_stat_jobs()
 
     ####################################
     # Users
@@ -140,128 +140,39 @@ class Admin(object):
     # Datasets
     ####################################
 
-    def create_dataset(self, user_id, name, task, data_file_path):
-        """ This function is to return statistics to frontend during dataset uploading process only, which is different from the dataset-reading methods during model training """
-        # Store dataset in data folder
-        print('begin saving to local path')
-        store_dataset = self._data_store.save(data_file_path)
-        # Get metadata for dataset. 'store_dataset' is a dictionary contains the following info only
+    def create_dataset(self, user_id, name, task, data_file_path=None, data_stream=None):
+        '''
+            Stores a dataset from either a file or a readable binary stream, returning as soon as it is durable.
+            Its stats (e.g. class counts & label ratios) are then computed in the background, with the status & progress of
+            the computation in its ``stat``.
+        '''
+        if data_stream is not None:
+            store_dataset = self._data_store.save_stream(data_stream)
+        else:
+            store_dataset = self._data_store.save(data_file_path)
         store_dataset_id = store_dataset.id
         size_bytes = store_dataset.size_bytes
-        stat = dict()
-        # ensure the uploaded dataset extension is .zip format, otherwise the below code hunk won't unzip it
-        # and ensure the zip file is correctly named, nor hidden zip file
-        if len(os.path.splitext(data_file_path)) == 2 and os.path.splitext(
-                data_file_path)[1] == '.zip':
-            dataset_zipfile = zipfile.ZipFile(data_file_path, 'r')
-            # when .zip file is a image dataset and contains images.csv as label file
-            # images.csv includes pairs of the image names and their labels
-            # if the dataset is not an "image dataset with images.csv", will skip to 'else'
-            # "image dataset without images.csv label file" won't be handled, and will skip to 'else'
-            if 'images.csv' in dataset_zipfile.namelist():
-
-                for fileName in dataset_zipfile.namelist():
-                    if fileName.endswith('.csv'):
-                        num_samples = len(dataset_zipfile.namelist()) - 1
-                        # create tempdir to store unziped csv and a sample image
-                        with tempfile.TemporaryDirectory() as dir_path:
-                            # read dataset zipfile  # data_file_path=os.path.join(os.getcwd(),name+'.zip')
-                            # obtain csv file
-                            # Extract a single file from zip
-                            csv_path = dataset_zipfile.extract(fileName,
-                                                               path=dir_path)
-                            # obtain a sample
-                            sample_name = pd.read_csv(csv_path,
-                                                      nrows=1).iloc[0][0]
-                            if task == 'IMAGE_CLASSIFICATION':
-                                img_path = dataset_zipfile.extract(
-                                    sample_name, path=dir_path)
-                                img = Image.open(img_path)
-                                img_size = str(img.size)
-                            # close dataset zipfile
-                            dataset_zipfile.close()
-                            csv = pd.read_csv(csv_path)
-
-                            # num_classes = len(labels)
-                            if len(csv.columns) == 2:
-                                class_count = csv[csv.columns[1]].value_counts()
-                            else:
-                                labels = pd.read_csv(
-                                    csv_path, nrows=0).columns[1::].to_list()
-                                class_count = (
-                                    csv[csv.columns[1::]] == 1).astype(int).sum(
-                                        axis=0)
-
-                        num_labeled_samples = len(csv[csv.columns[0]].unique())
-                        ratio = class_count / num_labeled_samples
-                        num_unlabeled_samples = num_samples - num_labeled_samples
-                        break
-            else:
-                # this is for question_answering_covid19 dataset, which does not have images.csv nor any labels
-                if task == 'question_answering_covid19':
-                    stat = {}
-                    dataset = self._meta_store.create_dataset(name, task, size_bytes,
-                                                              store_dataset_id, user_id,
-                                                              stat)
-                    self._meta_store.commit()
-
-                    return {
-                        'id': dataset.id,
-                        'name': dataset.name,
-                        'task': dataset.task,
-                        'size_bytes': dataset.size_bytes,
-                        'store_dataset_id': dataset.store_dataset_id,
-                        'owner_id': dataset.owner_id,
-                        'stat': dataset.stat,
-                    }
-                # if the dataset is not question_answering_covid19 dataset
-                # or if it is zipped "image dataset without images.csv label file"
-                # or other datasets whose labels are provided as folder names
-                with tempfile.TemporaryDirectory() as dir_path:
-                    num_labeled_samples = len(dataset_zipfile.namelist())
-                    num_unlabeled_samples = 0
-
-                    d_list = [
-                        x for x in dataset_zipfile.namelist()
-                        if x.endswith('/') == False
-                    ]
-                    # this is to count the labels
-                    # labels are provided as folder names
-                    labels = [os.path.dirname(x) for x in d_list]
-                    class_count = pd.DataFrame(list(Counter(labels).values()),
-                                               list(Counter(labels).keys()))
-
-                    ratio = class_count / num_labeled_samples
-                    sample_name = d_list[0]
-                    # if it is image dataset, this is to provide sample image size
-                    if task == 'IMAGE_CLASSIFICATION':
-                        img_path = dataset_zipfile.extract(sample_name,
-                                                           path=dir_path)
-                        img = Image.open(img_path)
-                        img_size = str(img.size)
-
-            stat = {
-                'num_labeled_samples': num_labeled_samples,
-                'num_unlabeled_samples': num_unlabeled_samples,
-                'class_count': class_count.to_json(),
-                'ratio': ratio.to_json()
-            }
-            # if it is image dataset, this is to add sample image size to stat, 
-            # later, stat would be return to front-end during the dataset uploading process
-            if task == 'IMAGE_CLASSIFICATION':
-                stat['img_size'] = img_size
+        dataset_path = self._data_store.load(store_dataset_id)
 
-        # if the uploaded dataset is not in .zip format
-        else:
+        # Ensure the uploaded dataset is a .zip file
+        if not zipfile.is_zipfile(dataset_path):
+            self._data_store.delete(store_dataset_id)
             raise InvalidDatasetError()
-        print('begin saving to db')
 
+        stat_job_id = str(uuid.uuid4())
+        stat = {
+            'status': DatasetStatStatus.RUNNING,
+            'progress': 0,
+            'checksum': store_dataset.checksum,
+            'job_id': stat_job_id
+        }
         dataset = self._meta_store.create_dataset(name, task, size_bytes,
                                                   store_dataset_id, user_id,
                                                   stat)
-
         self._meta_store.commit()
 
+        submit_dataset_stat_job(dataset.id, dataset_path, task, stat_job_id)
+
         return {
             'id': dataset.id,
             'name': dataset.name,
@@ -874,6 +785,7 @@ class Admin(object):
 
     def _on_sub_train_job_advisor_stopped(self, sub_train_job_id):
         self._services_manager.refresh_sub_train_job_status(sub_train_job_id)
+        self._collect_params_garbage()
 
     def _on_sub_train_job_budget_reached(self, sub_train_job_id):
         self._services_manager.stop_sub_train_job_services(sub_train_job_id)
@@ -896,6 +808,16 @@ class Admin(object):
     def _on_predictor_stopped(self, inference_job_id):
         self._services_manager.refresh_inference_job_status(inference_job_id)
 
+    # Delete params of the param store that no trial references, e.g. of trials that errored after saving params,
+    # so that arrays shared with them are freed
+    def _collect_params_garbage(self):
+        try:
+            used_params_ids = self._meta_store.get_store_params_ids()
+            self._param_store.collect_garbage(used_params_ids)
+        except Exception:
+            logger.error('Error while deleting unused params:')
+            logger.error(traceback.format_exc())
+
     ####################################
     # Models
     ####################################
@@ -1057,6 +979,23 @@ class Admin(object):
         except UserExistsError:
             logger.info('Skipping superadmin creation as it already exists...')
 
+    def _resume_dataset_stat_jobs(self):
+        # Restart computation of dataset stats interrupted by a restart of admin
+        # Each job is claimed first, so that only 1 of many admin processes starting together resumes it
+        for dataset in self._meta_store.get_all_datasets():
+            if (dataset.stat or {}).get('status') != DatasetStatStatus.RUNNING:
+                continue
+
+            stat_job_id = str(uuid.uuid4())
+            is_claimed = self._meta_store.claim_dataset_stat_job(dataset, stat_job_id)
+            self._meta_store.commit()
+            if not is_claimed:
+                continue
+
+            logger.info('Resuming computation of stats of dataset "{}"...'.format(dataset.id))
+            dataset_path = self._data_store.load(dataset.store_dataset_id)
+            submit_dataset_stat_job(dataset.id, dataset_path, dataset.task, stat_job_id)
+
     def _hash_password(self, password):
         password_hash = bcrypt.hashpw(password.encode('utf-8'),
                                       bcrypt.gensalt())
@@ -0,0 +1,145 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import io
+import os
+import time
+import logging
+import traceback
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from PIL import Image
+
+from singa_auto.constants import DatasetStatStatus
+from singa_auto.meta_store import MetaStore
+from singa_auto.datasets.zip_utils import ZipMemberReader
+from singa_auto.datasets.image_stats import compute_image_files_stat
+
+logger = logging.getLogger(__name__)
+
+DATASET_STAT_JOB_WORKERS = int(os.environ.get('DATASET_STAT_JOB_WORKERS', 1))
+DATASET_STAT_PROGRESS_INTERVAL_SECS = 5  # Min interval between updates of a job's progress in the metadata store
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def submit_dataset_stat_job(dataset_id, dataset_path, task, job_id=None, meta_store=None):
+    '''
+        Computes stats of a stored dataset in the background, saving them to ``Dataset.stat`` once done.
+        Until then, ``Dataset.stat`` has the job's ``status`` and ``progress`` (from 0 to 1).
+
+        :param job_id: ID of the job in ``Dataset.stat``; if given, the job stops updating ``Dataset.stat``
+            once another job has been claimed in its place
+    '''
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DATASET_STAT_JOB_WORKERS)
+
+    return _executor.submit(_run_dataset_stat_job, dataset_id, dataset_path, task, job_id,
+                            meta_store or MetaStore())
+
+
+def compute_dataset_stat(dataset_path, task, on_progress=None) -> dict:
+    '''
+        Computes stats of a zipped dataset for the frontend, e.g. class counts & label ratios,
+        and for training, e.g. per-channel means of images.
+
+        :param on_progress: Called with the fraction of the dataset processed so far
+    '''
+    zip_reader = ZipMemberReader(dataset_path)
+    namelist = zip_reader.namelist()
+    stat = {}
+
+    # Dataset of images with labels in images.csv
+    if 'images.csv' in namelist:
+        csv = pd.read_csv(io.BytesIO(zip_reader.read('images.csv')))
+        num_samples = len(namelist) - 1
+        sample_name = csv.iloc[0][0]
+        if len(csv.columns) == 2:
+            class_count = csv[csv.columns[1]].value_counts()
+        else:
+            class_count = (csv[csv.columns[1:]] == 1).astype(int).sum(axis=0)
+        num_labeled_samples = len(csv[csv.columns[0]].unique())
+        num_unlabeled_samples = num_samples - num_labeled_samples
+
+    # Dataset without labels, e.g. for question_answering_covid19
+    elif task == 'question_answering_covid19':
+        return stat
+
+    # Otherwise, labels are provided as folder names
+    else:
+        file_names = [x for x in namelist if not x.endswith('/')]
+        labels = Counter(os.path.dirname(x) for x in file_names)
+        class_count = pd.DataFrame(list(labels.values()), list(labels.keys()))
+        sample_name = file_names[0]
+        num_labeled_samples = len(namelist)
+        num_unlabeled_samples = 0
+
+    stat['num_labeled_samples'] = num_labeled_samples
+    stat['num_unlabeled_samples'] = num_unlabeled_samples
+    stat['class_count'] = class_count.to_json()
+    stat['ratio'] = (class_count / num_labeled_samples).to_json()
+
+    if task == 'IMAGE_CLASSIFICATION':
+        # Sample image size
+        img = Image.open(io.BytesIO(zip_reader.read(sample_name)))
+        stat['img_size'] = str(img.size)
+
+        # Stats of images for training, e.g. for normalization, so that they are computed only once
+        # They are of images preprocessed with default options, and are reused only by datasets loaded with these
+        stat['image_stat'] = compute_image_files_stat(dataset_path, on_progress=on_progress)
+
+    zip_reader.close()
+    return stat
+
+
+def _run_dataset_stat_job(dataset_id, dataset_path, task, job_id, meta_store):
+    logger.info('Computing stats of dataset "{}"...'.format(dataset_id))
+    last_update_time = time.time()
+
+    def on_progress(progress):
+        nonlocal last_update_time
+        if time.time() - last_update_time < DATASET_STAT_PROGRESS_INTERVAL_SECS:
+            return
+        _update_dataset_stat(meta_store, dataset_id, job_id, {'progress': round(progress, 4)})
+        last_update_time = time.time()
+
+    try:
+        stat = compute_dataset_stat(dataset_path, task, on_progress=on_progress)
+        _update_dataset_stat(meta_store, dataset_id, job_id, {**stat, 'status': DatasetStatStatus.COMPLETED, 'progress': 1})
+        logger.info('Computed stats of dataset "{}"'.format(dataset_id))
+    except Exception as e:
+        logger.error('Error while computing stats of dataset "{}":'.format(dataset_id))
+        logger.error(traceback.format_exc())
+        _update_dataset_stat(meta_store, dataset_id, job_id, {'status': DatasetStatStatus.ERRORED, 'error': str(e)})
+
+
+def _update_dataset_stat(meta_store, dataset_id, job_id, stat_update):
+    with meta_store:
+        dataset = meta_store.get_dataset(dataset_id)
+        if dataset is None:
+            return
+        if job_id is not None and (dataset.stat or {}).get('job_id') not in (None, job_id):
+            return
+        meta_store.update_dataset_stat(dataset, {**(dataset.stat or {}), **stat_update})
+        meta_store.commit()
@@ -50,6 +50,12 @@ ENVIRONMENT_VARIABLES_AUTOFORWARD = [
 
 ]
 
+# List of environment variables that will be auto-forwarded to services deployed, if they are set
+ENVIRONMENT_VARIABLES_AUTOFORWARD_OPTIONAL = [
+    'PARAMS_STORE_TYPE',
+    'DATASET_CACHE_DIR_PATH', 'DATASET_CACHE_MAX_BYTES',
+]
+
 DEFAULT_TRAIN_GPU_COUNT = 0
 DEFAULT_DIST_WORKERS = 0
 DEFAULT_INFERENCE_GPU_COUNT = 0
@@ -197,6 +203,9 @@ class ServicesManager(object):
         # number of worker used in distributed training (data parallelism)
         dist_workers = train_job.budget.get(BudgetOption.DIST_WORKERS, DEFAULT_DIST_WORKERS)
 
+        # Have workers copy datasets to their nodes' caches as soon as they start
+        prefetch_datasets = self._get_datasets_to_prefetch(train_job)
+
         # Try to create advisors & workers for each sub train job
         try:
             for (sub_train_job, gpus, cpus) in zip(sub_train_jobs, jobs_gpus,
@@ -206,11 +215,13 @@ class ServicesManager(object):
 
                 # 1 GPU per worker
                 for _ in range(gpus):
-                    self._create_train_job_worker(sub_train_job, dist_workers=dist_workers)
+                    self._create_train_job_worker(sub_train_job, dist_workers=dist_workers,
+                                                  prefetch_datasets=prefetch_datasets)
 
                 # CPU workers
                 for _ in range(cpus):
-                    self._create_train_job_worker(sub_train_job, dist_workers=dist_workers, gpus=0)
+                    self._create_train_job_worker(sub_train_job, dist_workers=dist_workers, gpus=0,
+                                                  prefetch_datasets=prefetch_datasets)
 
             return train_job
 
@@ -411,13 +422,14 @@ class ServicesManager(object):
 
         return service
 
-    def _create_train_job_worker(self, sub_train_job, dist_workers=0, gpus=1):
+    def _create_train_job_worker(self, sub_train_job, dist_workers=0, gpus=1, prefetch_datasets=None):
         model = self._meta_store.get_model(sub_train_job.model_id)
         service_type = ServiceType.TRAIN
         install_command = parse_model_install_command(model.dependencies,
                                                       enable_gpu=(gpus > 0))
         environment_vars = {
             'WORKER_INSTALL_COMMAND': install_command,
+            'WORKER_PREFETCH_DATASETS': json.dumps(prefetch_datasets or []),
         }
 
         service = self._create_service(service_type=service_type,
@@ -432,6 +444,13 @@ class ServicesManager(object):
 
         return service
 
+    def _get_datasets_to_prefetch(self, train_job):
+        # List of [<store dataset ID>, <size in bytes>, <checksum>] of datasets of train job
+        dataset_ids = [train_job.train_dataset_id, train_job.val_dataset_id, train_job.annotation_dataset_id]
+        datasets = [self._meta_store.get_dataset(x) for x in dataset_ids if x is not None]
+        return [[x.store_dataset_id, x.size_bytes or None, (x.stat or {}).get('checksum')]
+                for x in datasets if x is not None]
+
     def _create_advisor(self, sub_train_job):
         model = self._meta_store.get_model(sub_train_job.model_id)
         service_type = ServiceType.ADVISOR
@@ -500,6 +519,7 @@ class ServicesManager(object):
         environment_vars = {
             # Autofoward environment variables
             **{x: os.environ[x] for x in self._var_autoforward},
+            **{x: os.environ[x] for x in ENVIRONMENT_VARIABLES_AUTOFORWARD_OPTIONAL if x in os.environ},
             **environment_vars,
             'SINGA_AUTO_SERVICE_ID': service.id,
             'SINGA_AUTO_SERVICE_TYPE': service_type,
@@ -523,6 +543,10 @@ class ServicesManager(object):
                                  self._params_dir_path)
             }
 
+        # Mount node-local dataset cache, shared by services on the same node
+        if os.environ.get('DATASET_CACHE_DIR_PATH'):
+            mounts[os.environ['DATASET_CACHE_DIR_PATH']] = os.environ['DATASET_CACHE_DIR_PATH']
+
         # Expose container port if it exists
         publish_port = None
         ext_hostname = None
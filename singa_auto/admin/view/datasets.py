@@ -17,7 +17,7 @@
 # under the License.
 #
 
-import tempfile
+import requests
 from singa_auto.constants import UserType, RequestsParameters
 from flask import request, jsonify, Blueprint, g
 from singa_auto.utils.auth import auth
@@ -31,27 +31,26 @@ dataset_bp = Blueprint('datasets', __name__)
 @param_check(required_parameters=RequestsParameters.DATASET_POST)
 def create_dataset(auth, params):
     admin = g.admin
-    print('params', params)
-    # Temporarily store incoming dataset data as file
-    with tempfile.NamedTemporaryFile() as f:
-        if 'dataset' in request.files:
-            # Save dataset data in request body
-            file_storage = request.files['dataset']
-            file_storage.save(f.name)
-            file_storage.close()
-        else:
-            # Download dataset at URL and save it
-            assert 'dataset_url' in params
-            r = request.get(params['dataset_url'], allow_redirects=True)
-            f.write(r.content)
-            del params['dataset_url']
-
-        params['data_file_path'] = f.name
+    if 'dataset' in request.files:
+        # Stream dataset data in request body straight into the data store
+        file_storage = request.files['dataset']
+        data_stream = file_storage.stream
+    else:
+        # Stream dataset at URL straight into the data store
+        assert 'dataset_url' in params
+        r = requests.get(params['dataset_url'], allow_redirects=True, stream=True)
+        r.raise_for_status()
+        r.raw.decode_content = True
+        data_stream = r.raw
+        del params['dataset_url']
 
+    try:
         with admin:
             return jsonify(admin.create_dataset(user_id=auth['user_id'], name=params['name'],
                                                 task=params['task'],
-                                                data_file_path=params['data_file_path']))
+                                                data_stream=data_stream))
+    finally:
+        data_stream.close()
 
 
 @dataset_bp.route('', methods=['GET'])
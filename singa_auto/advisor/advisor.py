@@ -19,14 +19,15 @@
 
 import abc
 import random
-from typing import List, Type, Union
+from typing import List, Tuple, Type, Union
 from datetime import datetime, timedelta
 
 from singa_auto.constants import Budget, BudgetOption
 from singa_auto.model import IntegerKnob, CategoricalKnob, FloatKnob, ArchKnob, \
-                        FixedKnob, PolicyKnob, KnobConfig, BaseKnob
+                        FixedKnob, PolicyKnob, ResourceKnob, KnobConfig, BaseKnob
 
-from .constants import AdvisorType, Proposal, TrialResult
+from .constants import AdvisorType, Proposal, TrialResult, IntermediateResult
+from .pruning import MedianStoppingRule
 from singa_auto.error_code import UnsupportedKnobConfigError, UnsupportedKnobError
 
 DEFAULT_TRAIN_HOURS = 0.1
@@ -35,7 +36,7 @@ DEFAULT_MAX_TRIALS = -1
 
 # Advisor to use, in descending priority
 ADVISOR_TYPES = [
-    AdvisorType.FIXED, AdvisorType.BAYES_OPT_WITH_PARAM_SHARING,
+    AdvisorType.FIXED, AdvisorType.ASHA, AdvisorType.BAYES_OPT_WITH_PARAM_SHARING,
     AdvisorType.BAYES_OPT, AdvisorType.ENAS, AdvisorType.RANDOM
 ]
 
@@ -59,6 +60,9 @@ def _get_advisor_class_from_type(advisor_type):
     elif advisor_type == AdvisorType.BAYES_OPT_WITH_PARAM_SHARING:
         from .skopt import BayesOptWithParamSharingAdvisor
         return BayesOptWithParamSharingAdvisor
+    elif advisor_type == AdvisorType.ASHA:
+        from .asha import AshaAdvisor
+        return AshaAdvisor
     elif advisor_type == AdvisorType.RANDOM:
         return RandomAdvisor
     elif advisor_type == AdvisorType.FIXED:
@@ -97,6 +101,16 @@ class BaseAdvisor(abc.ABC):
         '''
         raise NotImplementedError()
 
+    def propose_many(self, worker_trials: List[Tuple[str, int]]) -> List[Union[Proposal, None]]:
+        '''
+        Returns proposals for several free workers at once, in the same order, where a proposal is None
+        if the tuning process is to be stopped. Advisors that can propose a batch more efficiently, or that
+        account for the other proposals of the batch, override this.
+
+        :param worker_trials: List of (<worker to make a proposal for>, <trial number associated with the proposal>)
+        '''
+        return [self.propose(worker_id, trial_no) for (worker_id, trial_no) in worker_trials]
+
     @abc.abstractmethod
     def feedback(self, worker_id: str, result: TrialResult):
         '''
@@ -104,6 +118,13 @@ class BaseAdvisor(abc.ABC):
         '''
         raise NotImplementedError()
 
+    def should_stop(self, worker_id: str, result: IntermediateResult) -> bool:
+        '''
+        Ingests an intermediate result of a running trial, returning whether the trial should be stopped early.
+        By default, trials are never stopped early.
+        '''
+        return False
+
     # Returns no. of hours left for training based on allocated budget
     def get_train_hours_left(self) -> float:
         time_left = self._stop_time - datetime.now()
@@ -172,6 +193,14 @@ class BaseAdvisor(abc.ABC):
         }
         return {**knobs, **policy_knobs}
 
+    # Merge resource knobs into `knobs`, at their max amount of resource
+    @staticmethod
+    def merge_resource_knobs(knobs, resource_knob_config):
+        return {
+            **knobs,
+            **{name: x.value_max for (name, x) in resource_knob_config.items()}
+        }
+
 
 class FixedAdvisor(BaseAdvisor):
     '''
@@ -180,18 +209,20 @@ class FixedAdvisor(BaseAdvisor):
 
     @staticmethod
     def is_compatible(knob_config, budget):
-        # Must only have fixed & policy knobs
+        # Must only have fixed, policy & resource knobs
         return BaseAdvisor.has_only_knob_types(knob_config,
-                                               [FixedKnob, PolicyKnob])
+                                               [FixedKnob, PolicyKnob, ResourceKnob])
 
     def propose(self, worker_id, trial_no):
         if trial_no > 1:
             return None
 
-        # Propose fixed knob values
-        knobs = {
-            name: knob.value.value for (name, knob) in self.knob_config.items()
-        }
+        # Propose fixed knob values, training with max resource
+        (fixed_knob_config, knob_config) = self.extract_knob_type(self.knob_config, FixedKnob)
+        (resource_knob_config, policy_knob_config) = self.extract_knob_type(knob_config, ResourceKnob)
+        knobs = self.merge_fixed_knobs({}, fixed_knob_config)
+        knobs = self.merge_resource_knobs(knobs, resource_knob_config)
+        knobs = self.merge_policy_knobs(knobs, policy_knob_config, [])
 
         proposal = Proposal(trial_no, knobs)
         return proposal
@@ -203,7 +234,7 @@ class FixedAdvisor(BaseAdvisor):
 
 class RandomAdvisor(BaseAdvisor):
     '''
-    Advisor that uniformly randomly chooses knobs.
+    Advisor that uniformly randomly chooses knobs, stopping trials early with the median stopping rule.
     '''
 
     @staticmethod
@@ -211,6 +242,10 @@ class RandomAdvisor(BaseAdvisor):
         # Compatible with all knobs
         return True
 
+    def __init__(self, knob_config, budget):
+        super().__init__(knob_config, budget)
+        self._stopping_rule = MedianStoppingRule()
+
     def propose(self, worker_id, trial_no):
         # If time's up, stop
         if self.get_train_hours_left() <= 0:
@@ -252,9 +287,14 @@ class RandomAdvisor(BaseAdvisor):
             return knob_value
         elif isinstance(knob, PolicyKnob):
             return False
+        elif isinstance(knob, ResourceKnob):
+            return knob.value_max
         else:
             raise UnsupportedKnobError(knob.__class__)
 
     def feedback(self, worker_id, result):
         # Ignore feedback - not relevant for a random advisor
         pass
+
+    def should_stop(self, worker_id, result):
+        return self._stopping_rule.should_stop(result)
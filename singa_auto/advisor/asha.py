@@ -0,0 +1,166 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import math
+import heapq
+import logging
+
+from singa_auto.model import PolicyKnob, ResourceKnob
+
+from .constants import ParamsType, Proposal
+from .advisor import BaseAdvisor, RandomAdvisor
+
+REDUCTION_FACTOR = 3  # Only the top 1/REDUCTION_FACTOR of a rung is promoted, with REDUCTION_FACTOR times more resource
+
+logger = logging.getLogger(__name__)
+
+
+class AshaAdvisor(RandomAdvisor):
+    '''
+        Performs hyperparameter tuning of models with Asynchronous Successive Halving (ASHA),
+        as in "A System for Massively Parallel Hyperparameter Tuning" (https://arxiv.org/abs/1810.05934).
+
+        Configurations of knobs are uniformly randomly sampled and first trained with the least amount of resource
+        of the model's ``ResourceKnob``. Resource grows geometrically, by at least ``REDUCTION_FACTOR`` times, across *rungs*,
+        up to the max amount of resource.
+        Whenever a worker is free, it trains a configuration in the top 1/``REDUCTION_FACTOR`` of a rung on the next rung,
+        if there is one yet to be promoted, or otherwise a newly sampled configuration.
+
+        With the ``SHARE_PARAMS`` policy, a promoted configuration resumes training from the parameters of its previous trial,
+        only for the additional amount of resource of its new rung, if these are the most recent parameters of the worker.
+        Workers are preferably given configurations they can resume.
+    '''
+
+    @staticmethod
+    def is_compatible(knob_config, budget):
+        # Must have exactly 1 resource knob
+        (resource_knob_config, _) = BaseAdvisor.extract_knob_type(knob_config, ResourceKnob)
+        return len(resource_knob_config) == 1
+
+    def __init__(self, knob_config, budget):
+        super().__init__(knob_config, budget)
+        (resource_knob_config,
+         knob_config) = self.extract_knob_type(knob_config, ResourceKnob)
+        (self._policy_knob_config,
+         self._search_knob_config) = self.extract_knob_type(knob_config, PolicyKnob)
+        ((self._resource_knob_name, resource_knob),) = resource_knob_config.items()
+        self._rung_resources = _get_rung_resources(resource_knob)
+        self._to_share_params = self.has_policies(self.knob_config, ['SHARE_PARAMS'])
+        self._configs = []  # Knobs of each sampled configuration, by config no.
+        self._rung_scores = [{} for _ in self._rung_resources]  # For each rung, scores of configurations trained on it
+        self._rung_promoted = [set() for _ in self._rung_resources]  # For each rung, configurations promoted from it
+        self._worker_params = {}  # For each worker, (<config no.>, <rung>) of its most recent params
+
+        logger.info('Training configurations with resources of {}'.format(self._rung_resources))
+
+        # Prefer having certain policies
+        if not self._to_share_params:
+            print(
+                'To resume promoted trials in successive halving instead of training them from scratch, having `SHARE_PARAMS` policy is preferred.'
+            )
+
+    def propose(self, worker_id, trial_no):
+        # If time's up, stop
+        if self.get_train_hours_left() <= 0:
+            return None
+
+        # If trial's up, stop
+        if self.get_trials_left(trial_no) <= 0:
+            return None
+
+        # Promote a configuration if possible, otherwise sample a new one
+        promotion = self._find_promotion(worker_id)
+        if promotion is not None:
+            (config_no, rung) = promotion
+            self._rung_promoted[rung - 1].add(config_no)
+        else:
+            (config_no, rung) = (len(self._configs), 0)
+            self._configs.append({
+                name: self._propose_knob(knob)
+                for (name, knob) in self._search_knob_config.items()
+            })
+
+        # Resume from params of configuration's previous trial if they are the worker's most recent params
+        to_resume = self._to_share_params and rung > 0 and \
+            self._worker_params.get(worker_id) == (config_no, rung - 1)
+        resource = self._rung_resources[rung]
+        if to_resume:
+            resource -= self._rung_resources[rung - 1]
+
+        knobs = {**self._configs[config_no], self._resource_knob_name: resource}
+        knobs = self.merge_policy_knobs(knobs, self._policy_knob_config,
+                                        ['SHARE_PARAMS'] if to_resume else [])
+        is_last_rung = (rung == len(self._rung_resources) - 1)
+        meta = {'proposal_type': 'SEARCH', 'config_no': config_no, 'rung': rung}
+        return Proposal(trial_no,
+                        knobs,
+                        params_type=ParamsType.LOCAL_RECENT if to_resume else ParamsType.NONE,
+                        to_cache_params=(self._to_share_params and not is_last_rung),
+                        meta=meta)
+
+    def feedback(self, worker_id, result):
+        proposal = result.proposal
+        config_no = proposal.meta.get('config_no')
+        rung = proposal.meta.get('rung')
+
+        # Errored trials are never promoted
+        if config_no is None or result.score is None:
+            return
+
+        self._rung_scores[rung][config_no] = result.score
+        if proposal.to_cache_params:
+            self._worker_params[worker_id] = (config_no, rung)
+
+    def should_stop(self, worker_id, result):
+        # Trials are already stopped early by successive halving
+        return False
+
+    def _find_promotion(self, worker_id):
+        # Returns (<config no.>, <rung to promote to>) of a configuration yet to be promoted, from the highest rung possible
+        for rung in reversed(range(len(self._rung_resources) - 1)):
+            scores = self._rung_scores[rung]
+            top_config_nos = heapq.nlargest(len(scores) // REDUCTION_FACTOR, scores, key=scores.get)
+            config_nos = [x for x in top_config_nos if x not in self._rung_promoted[rung]]
+            if len(config_nos) == 0:
+                continue
+
+            # Prefer configuration whose params are on the worker
+            if self._worker_params.get(worker_id) in [(x, rung) for x in config_nos]:
+                return (self._worker_params[worker_id][0], rung + 1)
+
+            return (config_nos[0], rung + 1)
+
+        return None
+
+
+def _get_rung_resources(knob: ResourceKnob):
+    # Resources grow geometrically, by at least REDUCTION_FACTOR times across rungs, from the min to the max resource
+    if knob.value_max <= knob.value_min:
+        return [knob.value_max]
+
+    ratio = knob.value_max / knob.value_min
+    num_rungs = max(int(math.floor(math.log(ratio) / math.log(REDUCTION_FACTOR) + 1e-9)) + 1, 2)
+    resources = [knob.value_min * ratio ** (i / (num_rungs - 1)) for i in range(num_rungs)]
+    (resources[0], resources[-1]) = (knob.value_min, knob.value_max)
+
+    if knob.value_type is int:
+        resources = [min(max(int(round(x)), knob.value_min), knob.value_max) for x in resources]
+        resources = sorted(set(resources))
+
+    return resources
@@ -51,6 +51,7 @@ class AdvisorType(Enum):
     BAYES_OPT = 'BAYES_OPT'
     RANDOM = 'RANDOM'
     ENAS = 'ENAS'
+    ASHA = 'ASHA'
 
 
 class ParamsType(Enum):
@@ -94,3 +95,17 @@ class TrialResult(Jsonable):
         self.proposal = proposal if isinstance(
             proposal, Proposal) else Proposal(**proposal)
         self.score = score
+
+
+class IntermediateResult(Jsonable):
+
+    def __init__(self,
+                 trial_no: int,  # Trial no. of the running trial
+                 trial_id: str,  # ID of the running trial
+                 step: int,  # Step of training the result is at, e.g. the epoch
+                 metrics: dict  # Metrics logged by the model at this step, as { <metric>: <value> }
+                ):
+        self.trial_no = trial_no
+        self.trial_id = trial_id
+        self.step = step
+        self.metrics = metrics
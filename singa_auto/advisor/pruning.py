@@ -0,0 +1,76 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+from typing import Union
+import numpy as np
+
+from .constants import IntermediateResult
+
+MEDIAN_STOPPING_MIN_TRIALS = 5  # Min no. of other trials at a step before any trial is stopped at that step
+MEDIAN_STOPPING_MIN_REPORTS = 3  # Min no. of intermediate results of a trial before it is stopped
+
+
+class MedianStoppingRule():
+    '''
+        Decides whether to stop running trials early with the median stopping rule, as in
+        "Google Vizier: A Service for Black-Box Optimization" (https://ai.google/research/pubs/pub46180):
+        a trial is stopped if its best objective so far is worse than the median of the best objectives
+        of other trials up to the same step.
+
+        The objective of an intermediate result is its ``score`` metric (higher is better), or otherwise
+        its ``loss`` metric (lower is better). Results without either are ignored.
+    '''
+
+    def __init__(self, min_trials=MEDIAN_STOPPING_MIN_TRIALS, min_reports=MEDIAN_STOPPING_MIN_REPORTS):
+        self._min_trials = min_trials
+        self._min_reports = min_reports
+        self._trial_bests = {}  # For each trial, (<no. of intermediate results>, <best objective so far>)
+        self._step_bests = {}  # For each step, { <trial no.>: <best objective up to step> }
+
+    def should_stop(self, result: IntermediateResult) -> bool:
+        objective = get_objective(result.metrics)
+        if objective is None:
+            return False
+
+        # Record trial's best objective up to this step
+        (num_reports, best) = self._trial_bests.get(result.trial_no, (0, objective))
+        (num_reports, best) = (num_reports + 1, max(best, objective))
+        self._trial_bests[result.trial_no] = (num_reports, best)
+        step_bests = self._step_bests.setdefault(result.step, {})
+        step_bests[result.trial_no] = best
+
+        if num_reports < self._min_reports:
+            return False
+
+        other_bests = [x for (trial_no, x) in step_bests.items() if trial_no != result.trial_no]
+        if len(other_bests) < self._min_trials:
+            return False
+
+        return best < np.median(other_bests)
+
+
+def get_objective(metrics: dict) -> Union[float, None]:
+    '''
+        Returns the objective of logged metrics to maximise, for comparing trials while they run.
+    '''
+    if 'score' in metrics:
+        return float(metrics['score'])
+    elif 'loss' in metrics:
+        return -float(metrics['loss'])
+    return None
@@ -19,16 +19,26 @@
 
 from skopt.space import Real, Integer, Categorical
 from skopt.optimizer import Optimizer
+from skopt.acquisition import gaussian_ei
+from sklearn.gaussian_process import GaussianProcessRegressor
 from collections import OrderedDict
 import math
+import logging
+import threading
+import traceback
 import numpy as np
 
 from singa_auto.model import CategoricalKnob, FixedKnob, IntegerKnob, FloatKnob, PolicyKnob
 
 from .constants import ParamsType, Proposal
 from .advisor import BaseAdvisor, UnsupportedKnobError
+from .pruning import MedianStoppingRule
 
 FINAL_TRAIN_HOURS = 1  # No. of hours to conduct final train trials
+N_INITIAL_POINTS = 10  # No. of random points to evaluate before fitting a model
+N_CANDIDATE_POINTS = 1000  # No. of random points the acquisition function is evaluated on to choose each proposal
+
+logger = logging.getLogger(__name__)
 
 
 class BayesOptAdvisor(BaseAdvisor):
@@ -52,6 +62,8 @@ class BayesOptAdvisor(BaseAdvisor):
         self._dimensions = self._get_dimensions(knob_config)
         self._optimizer = self._make_optimizer(self._dimensions)
         self._search_results: (float, Proposal) = []
+        self._stopping_rule = MedianStoppingRule()
+        self._final_train_trial_nos = set()
 
         # Prefer having certain policies
         if not self.has_policies(self.knob_config, ['EARLY_STOP']):
@@ -60,47 +72,65 @@ class BayesOptAdvisor(BaseAdvisor):
             )
 
     def propose(self, worker_id, trial_no):
-        proposal_type = self._get_proposal_type(trial_no)
-        meta = {'proposal_type': proposal_type}
-
-        if proposal_type == 'SEARCH':
-            knobs = self._propose_knobs(['EARLY_STOP'])
-            return Proposal(trial_no, knobs, meta=meta)
-        elif proposal_type == 'FINAL_TRAIN':
-            knobs = self._propose_search_knobs()
-            return Proposal(trial_no, knobs, meta=meta)
-        elif proposal_type is None:
-            return None
+        return self.propose_many([(worker_id, trial_no)])[0]
+
+    def propose_many(self, worker_trials):
+        proposal_types = [self._get_proposal_type(trial_no) for (_, trial_no) in worker_trials]
+
+        # Ask for all search trials' knobs at once, accounting for each other
+        search_trial_nos = [trial_no for ((_, trial_no), x) in zip(worker_trials, proposal_types) if x == 'SEARCH']
+        search_knobs = iter(self._propose_many_knobs(search_trial_nos, ['EARLY_STOP']))
+
+        proposals = []
+        for ((worker_id, trial_no), proposal_type) in zip(worker_trials, proposal_types):
+            meta = {'proposal_type': proposal_type}
+            if proposal_type == 'SEARCH':
+                proposals.append(Proposal(trial_no, next(search_knobs), meta=meta))
+            elif proposal_type == 'FINAL_TRAIN':
+                knobs = self._propose_search_knobs(trial_no)
+                self._final_train_trial_nos.add(trial_no)
+                proposals.append(Proposal(trial_no, knobs, meta=meta))
+            elif proposal_type is None:
+                proposals.append(None)
+
+        return proposals
 
     def feedback(self, worker_id, result):
         proposal = result.proposal
         score = result.score
         proposal_type = proposal.meta.get('proposal_type')
         knobs = proposal.knobs
-        if score is None:
-            return
 
         # Keep track of `SEARCH` trials' scores & proposals (for final train trials)
-        if proposal_type == 'SEARCH':
+        if proposal_type == 'SEARCH' and score is not None:
             self._search_results.append((score, proposal))
 
         point = [knobs[name] for name in self._dimensions.keys()]
-        self._optimizer.tell(point, -score)
+        self._optimizer.tell(proposal.trial_no, point, -score if score is not None else None)
+
+    def should_stop(self, worker_id, result):
+        # Only stop search trials early
+        if result.trial_no in self._final_train_trial_nos:
+            return False
+        return self._stopping_rule.should_stop(result)
 
     def _make_optimizer(self, dimensions):
-        n_initial_points = 10
-        return Optimizer(list(dimensions.values()),
-                         n_initial_points=n_initial_points,
-                         base_estimator='gp')
+        return BatchBayesOptimizer(list(dimensions.values()))
 
     def _get_dimensions(self, knob_config):
         dimensions = OrderedDict(
             {name: _knob_to_dimension(x) for (name, x) in knob_config.items()})
         return dimensions
 
-    def _propose_knobs(self, policies=None):
+    def _propose_many_knobs(self, trial_nos, policies=None):
+        if len(trial_nos) == 0:
+            return []
+
         # Ask skopt
-        point = self._optimizer.ask()
+        points = self._optimizer.ask(trial_nos)
+        return [self._point_to_knobs(point, policies) for point in points]
+
+    def _point_to_knobs(self, point, policies=None):
         knobs = {
             name: _simplify_value(value)
             for (name, value) in zip(self._dimensions.keys(), point)
@@ -113,11 +143,11 @@ class BayesOptAdvisor(BaseAdvisor):
 
         return knobs
 
-    def _propose_search_knobs(self, policies=None):
+    def _propose_search_knobs(self, trial_no, policies=None):
         search_results = self._search_results
         # If no more search results, propose from model
         if len(search_results) == 0:
-            return self._propose_knobs(policies)
+            return self._propose_many_knobs([trial_no], policies)[0]
 
         # Otherwise, determine best proposal and use it
         search_results.sort(key=lambda x: x[0])
@@ -172,6 +202,7 @@ class BayesOptWithParamSharingAdvisor(BaseAdvisor):
          knob_config) = self.extract_knob_type(knob_config, PolicyKnob)
         self._dimensions = self._get_dimensions(knob_config)
         self._optimizer = self._make_optimizer(self._dimensions)
+        self._stopping_rule = MedianStoppingRule()
 
         # Prefer having certain policies
         if not self.has_policies(self.knob_config, ['EARLY_STOP']):
@@ -180,40 +211,54 @@ class BayesOptWithParamSharingAdvisor(BaseAdvisor):
             )
 
     def propose(self, worker_id, trial_no):
-        proposal_type = self._get_proposal_type(trial_no)
-        meta = {'proposal_type': proposal_type}
-
-        if proposal_type == 'SEARCH':
-            param = self._propose_param()
-            knobs = self._propose_knobs(['SHARE_PARAMS', 'EARLY_STOP'])
-            return Proposal(trial_no, knobs, params_type=param, meta=meta)
-        elif proposal_type is None:
-            return None
+        return self.propose_many([(worker_id, trial_no)])[0]
+
+    def propose_many(self, worker_trials):
+        proposal_types = [self._get_proposal_type(trial_no) for (_, trial_no) in worker_trials]
+
+        # Ask for all search trials' knobs at once, accounting for each other
+        search_trial_nos = [trial_no for ((_, trial_no), x) in zip(worker_trials, proposal_types) if x == 'SEARCH']
+        search_knobs = iter(self._propose_many_knobs(search_trial_nos, ['SHARE_PARAMS', 'EARLY_STOP']))
+
+        proposals = []
+        for ((worker_id, trial_no), proposal_type) in zip(worker_trials, proposal_types):
+            meta = {'proposal_type': proposal_type}
+            if proposal_type == 'SEARCH':
+                param = self._propose_param()
+                proposals.append(Proposal(trial_no, next(search_knobs), params_type=param, meta=meta))
+            elif proposal_type is None:
+                proposals.append(None)
+
+        return proposals
 
     def feedback(self, worker_id, result):
         proposal = result.proposal
         score = result.score
         knobs = proposal.knobs
-        if score is None:
-            return
 
         point = [knobs[name] for name in self._dimensions.keys()]
-        self._optimizer.tell(point, -score)
+        self._optimizer.tell(proposal.trial_no, point, -score if score is not None else None)
+
+    def should_stop(self, worker_id, result):
+        return self._stopping_rule.should_stop(result)
 
     def _make_optimizer(self, dimensions):
-        n_initial_points = 10
-        return Optimizer(list(dimensions.values()),
-                         n_initial_points=n_initial_points,
-                         base_estimator='gp')
+        return BatchBayesOptimizer(list(dimensions.values()))
 
     def _get_dimensions(self, knob_config):
         dimensions = OrderedDict(
             {name: _knob_to_dimension(x) for (name, x) in knob_config.items()})
         return dimensions
 
-    def _propose_knobs(self, policies=None):
+    def _propose_many_knobs(self, trial_nos, policies=None):
+        if len(trial_nos) == 0:
+            return []
+
         # Ask skopt
-        point = self._optimizer.ask()
+        points = self._optimizer.ask(trial_nos)
+        return [self._point_to_knobs(point, policies) for point in points]
+
+    def _point_to_knobs(self, point, policies=None):
         knobs = {
             name: _simplify_value(value)
             for (name, value) in zip(self._dimensions.keys(), point)
@@ -244,6 +289,143 @@ class BayesOptWithParamSharingAdvisor(BaseAdvisor):
         return 'SEARCH'
 
 
+class BatchBayesOptimizer:
+    '''
+        Bayesian Optimization with Gaussian Processes that proposes points for several workers at once,
+        accounting for points still being evaluated by other workers.
+
+        Points still being evaluated are "pending", and are assumed to have the best objective value seen so far
+        (constant liar), so that points proposed together or while others are pending are spread out.
+        Each proposal is chosen by expected improvement over random candidate points, with a GP whose kernel
+        hyperparameters are fixed, refitted with the pending points at the cost of a single Cholesky decomposition.
+
+        Results are told to skopt's ``Optimizer`` in a background thread, which refits the GP & its hyperparameters
+        once per batch of results received, so that neither ``tell`` nor ``ask`` waits for a full refit.
+        Results not yet fitted are used at their actual values in the meantime.
+
+        :param dimensions: List of skopt dimensions to search over
+        :param bool background_fit: Whether results are fitted in a background thread, rather than in ``tell``
+    '''
+
+    def __init__(self, dimensions, n_initial_points=N_INITIAL_POINTS, n_candidates=N_CANDIDATE_POINTS,
+                 background_fit=True, random_state=None):
+        self._optimizer = Optimizer(dimensions,
+                                    n_initial_points=n_initial_points,
+                                    base_estimator='gp')
+        self._space = self._optimizer.space
+        self._n_candidates = n_candidates
+        self._rng = np.random.RandomState(random_state)
+        self._background_fit = background_fit
+        self._pending = {}  # { <key>: <point being evaluated> }
+        self._unfitted = []  # [(<point>, <objective value>)] of results not yet fitted
+        self._fitted = (None, [], [])  # (<GP>, <points>, <objective values>) as of the last fit
+        self._cond = threading.Condition()
+        self._fit_thread = None
+
+    def ask(self, keys) -> list:
+        '''
+            Returns a point for each key, e.g. trial no., marking the points as pending until they are told.
+        '''
+        with self._cond:
+            (model, xs, ys) = self._fitted
+            xs = xs + [x for (x, _) in self._unfitted]
+            ys = ys + [y for (_, y) in self._unfitted]
+            pending_xs = list(self._pending.values())
+
+        # Until there is a model, propose random points
+        if model is None:
+            points = self._space.rvs(n_samples=len(keys), random_state=self._rng)
+        else:
+            points = self._ask_with_model(model, xs, ys, pending_xs, len(keys))
+
+        with self._cond:
+            for (key, point) in zip(keys, points):
+                self._pending[key] = point
+
+        return points
+
+    def tell(self, key, point, y):
+        '''
+            Records the objective value of a point, to be minimized, or None if it wasn't evaluated,
+            and marks the point for ``key`` as no longer pending.
+        '''
+        with self._cond:
+            self._pending.pop(key, None)
+            if y is None:
+                return
+
+            self._unfitted.append((point, y))
+            if self._background_fit:
+                self._ensure_fit_thread()
+                self._cond.notify()
+                return
+
+        self._fit()
+
+    def _ask_with_model(self, model, xs, ys, pending_xs, n_points):
+        candidates = self._space.rvs(n_samples=self._n_candidates, random_state=self._rng)
+        candidates_t = self._space.transform(candidates)
+        chosen = np.zeros(len(candidates), dtype=bool)
+
+        # Constant liar: pending & chosen points are assumed to have the best objective value seen so far
+        y_lie = min(ys)
+        xs_t = list(self._space.transform(xs + pending_xs)) if len(xs + pending_xs) > 0 else []
+        ys = list(ys) + [y_lie] * len(pending_xs)
+        gp = _make_fixed_gp(model)
+
+        points = []
+        for _ in range(n_points):
+            # Kernel's noise component is zero after fitting, which is fine to take the log of
+            with np.errstate(divide='ignore'):
+                gp.fit(np.asarray(xs_t), np.asarray(ys))
+                ei = gaussian_ei(candidates_t, gp, y_opt=y_lie)
+            ei[chosen] = -np.inf
+            i = int(np.argmax(ei))
+            chosen[i] = True
+            points.append(candidates[i])
+            xs_t.append(candidates_t[i])
+            ys.append(y_lie)
+
+        return points
+
+    def _ensure_fit_thread(self):
+        if self._fit_thread is None:
+            self._fit_thread = threading.Thread(target=self._fit_loop, daemon=True)
+            self._fit_thread.start()
+
+    def _fit_loop(self):
+        while True:
+            with self._cond:
+                while len(self._unfitted) == 0:
+                    self._cond.wait()
+            try:
+                self._fit()
+            except Exception:
+                logger.error('Error while fitting results:')
+                logger.error(traceback.format_exc())
+
+    def _fit(self):
+        with self._cond:
+            results = list(self._unfitted)
+
+        # Fit all results received since the last fit at once
+        self._optimizer.tell([x for (x, _) in results], [y for (_, y) in results])
+        model = self._optimizer.models[-1] if len(self._optimizer.models) > 0 else None
+
+        with self._cond:
+            self._unfitted = self._unfitted[len(results):]
+            self._fitted = (model, list(self._optimizer.Xi), list(self._optimizer.yi))
+
+
+def _make_fixed_gp(model):
+    # GP with the fitted kernel hyperparameters & noise of ``model``, which is refitted without optimizing them
+    noise = getattr(model, 'noise_', None) or 0
+    return GaussianProcessRegressor(kernel=model.kernel_,
+                                    alpha=model.alpha + noise,
+                                    optimizer=None,
+                                    normalize_y=model.normalize_y)
+
+
 def _propose_exp_greedy_param(t, t_div):
     e = math.exp(-4 * t / t_div)  # e ^ (-4x) => 1 -> 0 exponential decay
     # No params with decreasing probability
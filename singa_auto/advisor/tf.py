@@ -20,7 +20,10 @@
 import tensorflow as tf
 import numpy as np
 import logging
-from collections import defaultdict
+import queue
+import threading
+import traceback
+from collections import defaultdict, deque
 
 from singa_auto.constants import BudgetOption
 from singa_auto.model import ArchKnob, FixedKnob, PolicyKnob
@@ -35,6 +38,8 @@ ENAS_NUM_EVAL_PER_CYCLE = 300
 ENAS_NUM_FINAL_EVALS = 10
 ENAS_FINAL_HOURS = 12  # Last X hours to conduct final evals & final trains
 ENAS_NUM_FINAL_TRAINS = 1
+ENAS_CONTROLLER_UNITS = 32  # No. of units in controller's LSTM
+ENAS_POOL_SIZE = 32  # No. of architectures sampled ahead of demand from the controller, after each update
 
 
 class EnasAdvisor(BaseAdvisor):
@@ -74,41 +79,58 @@ class EnasAdvisor(BaseAdvisor):
                                                     self._batch_size)
 
     def propose(self, worker_id, trial_no):
-        proposal_type = self._get_proposal_type(worker_id)
-        meta = {'proposal_type': proposal_type}
-
-        # Keep track of trial at each worker
-        self._worker_to_num_trials[worker_id] += 1
-
-        if proposal_type == 'TRAIN':
-            knobs = self._propose_knobs(['DOWNSCALE', 'EARLY_STOP'])
-            return Proposal(trial_no,
-                            knobs,
-                            params_type=ParamsType.LOCAL_RECENT,
-                            to_eval=False,
-                            to_cache_params=True,
-                            to_save_params=False,
-                            meta=meta)
-        elif proposal_type == 'EVAL':
-            knobs = self._propose_knobs(
-                ['DOWNSCALE', 'QUICK_EVAL', 'SKIP_TRAIN'])
-            return Proposal(trial_no,
-                            knobs,
-                            params_type=ParamsType.LOCAL_RECENT,
-                            to_save_params=False,
-                            meta=meta)
-        elif proposal_type == 'FINAL_EVAL':
-            knobs = self._propose_knobs(['DOWNSCALE', 'SKIP_TRAIN'])
-            return Proposal(trial_no,
-                            knobs,
-                            params_type=ParamsType.LOCAL_RECENT,
-                            meta=meta)
-        elif proposal_type == 'FINAL_TRAIN':
-            # Do standard model training from scratch with final knobs
-            knobs = self._propose_final_knobs()
-            return Proposal(trial_no, knobs, meta=meta)
-        elif proposal_type is None:
-            return None
+        return self.propose_many([(worker_id, trial_no)])[0]
+
+    def propose_many(self, worker_trials):
+        proposal_types = []
+        for (worker_id, _) in worker_trials:
+            proposal_types.append(self._get_proposal_type(worker_id))
+
+            # Keep track of trial at each worker
+            self._worker_to_num_trials[worker_id] += 1
+
+        # Sample architectures for all proposals at once
+        num_samples = len([x for x in proposal_types if x in ['TRAIN', 'EVAL', 'FINAL_EVAL']])
+        sampled_knobs = iter(self._propose_many_knobs(num_samples))
+
+        proposals = []
+        for ((_, trial_no), proposal_type) in zip(worker_trials, proposal_types):
+            meta = {'proposal_type': proposal_type}
+            if proposal_type == 'TRAIN':
+                knobs = self.merge_policy_knobs(next(sampled_knobs), self._policy_knob_config,
+                                                ['DOWNSCALE', 'EARLY_STOP'])
+                proposal = Proposal(trial_no,
+                                    knobs,
+                                    params_type=ParamsType.LOCAL_RECENT,
+                                    to_eval=False,
+                                    to_cache_params=True,
+                                    to_save_params=False,
+                                    meta=meta)
+            elif proposal_type == 'EVAL':
+                knobs = self.merge_policy_knobs(next(sampled_knobs), self._policy_knob_config,
+                                                ['DOWNSCALE', 'QUICK_EVAL', 'SKIP_TRAIN'])
+                proposal = Proposal(trial_no,
+                                    knobs,
+                                    params_type=ParamsType.LOCAL_RECENT,
+                                    to_save_params=False,
+                                    meta=meta)
+            elif proposal_type == 'FINAL_EVAL':
+                knobs = self.merge_policy_knobs(next(sampled_knobs), self._policy_knob_config,
+                                                ['DOWNSCALE', 'SKIP_TRAIN'])
+                proposal = Proposal(trial_no,
+                                    knobs,
+                                    params_type=ParamsType.LOCAL_RECENT,
+                                    meta=meta)
+            elif proposal_type == 'FINAL_TRAIN':
+                # Do standard model training from scratch with final knobs
+                knobs = self._propose_final_knobs()
+                proposal = Proposal(trial_no, knobs, meta=meta)
+            else:
+                proposal = None
+
+            proposals.append(proposal)
+
+        return proposals
 
     def feedback(self, worker_id, result):
         proposal = result.proposal
@@ -149,17 +171,27 @@ class EnasAdvisor(BaseAdvisor):
         return knobs
 
     def _propose_knobs(self, policies=None):
-        knobs = {}
-        for (name, list_knob_model) in self._list_knob_models.items():
-            knobs[name] = list_knob_model.propose()
+        (knobs,) = self._propose_many_knobs(1)
 
-        # Add fixed & policy knobs
-        knobs = self.merge_fixed_knobs(knobs, self._fixed_knob_config)
+        # Add policy knobs
         knobs = self.merge_policy_knobs(knobs, self._policy_knob_config,
                                         policies or [])
 
         return knobs
 
+    # Samples knobs of `n` proposals, with fixed knobs but without policy knobs
+    def _propose_many_knobs(self, n):
+        if n == 0:
+            return []
+
+        knobs_list = [{} for _ in range(n)]
+        for (name, list_knob_model) in self._list_knob_models.items():
+            for (knobs, items) in zip(knobs_list, list_knob_model.propose_many(n)):
+                knobs[name] = items
+
+        # Add fixed knobs
+        return [self.merge_fixed_knobs(knobs, self._fixed_knob_config) for knobs in knobs_list]
+
     def _build_models(self, knob_config, batch_size):
         list_knobs = [(name, knob) for (name, knob) in knob_config.items()]
 
@@ -205,70 +237,133 @@ class EnasAdvisor(BaseAdvisor):
 
 
 class EnasArchAdvisor():
+    '''
+    Controller of ENAS for an ``ArchKnob``, an LSTM that samples architectures item by item, trained with REINFORCE.
 
-    def __init__(self, knob, batch_size):
+    Architectures are sampled in batches, in a single forward pass of the controller. A pool of ``pool_size`` architectures
+    is sampled ahead of demand, in a background thread, and proposals are taken from the pool where possible.
+    Every ``batch_size`` results, the pool is discarded and the controller is trained in the background thread,
+    after which the pool is resampled from the updated controller.
+    '''
+
+    def __init__(self, knob, batch_size, pool_size=ENAS_POOL_SIZE):
         self._graph = tf.Graph()
         self._sess = tf.Session(graph=self._graph)
         self._knob = knob
         self._batch_size = batch_size
+        self._pool_size = pool_size
         self._items_batch = []  # A running batch of items for feedback
         self._scores_batch = [
         ]  # A running batch of corresponding scores for feedback
+        self._pool = deque()  # Architectures sampled ahead of demand, as lists of item indexes
+        self._is_pool_pending = True  # Whether the pool is yet to be resampled in the background
+        self._generation = 0  # No. of batches queued to train the controller on, i.e. version of controller to sample pool from
+        self._lock = threading.Lock()  # Guards the pool & running batch
+        self._tasks = queue.Queue()  # Tasks for background thread, as batches to train on, or None to only resample the pool
+        self._value_to_idx_by_item = []  # For each item, { <item value>: <index of value> }
+        for values in knob.items:
+            value_to_idx = {}
+            for (i, x) in enumerate(values):
+                value_to_idx.setdefault(x.value, i)
+            self._value_to_idx_by_item.append(value_to_idx)
 
         with self._graph.as_default():
-            (self._item_logits, self._out_item_idxs, self._train_op,
+            (self._num_samples_ph, self._out_item_idxs, self._train_op,
              self._losses, self._rewards, self._item_idxs_ph,
              self._scores_ph) = self._build_model(self._knob)
             self._start_session()
 
-    def propose(self):
-        items = self._predict_with_model()
-        return items
+        self._thread = threading.Thread(target=self._run_tasks, daemon=True)
+        self._thread.start()
+        self._tasks.put(None)
 
-    def feedback(self, items, score):
-        self._items_batch.append(items)
-        self._scores_batch.append(score)
+    def propose(self):
+        return self.propose_many(1)[0]
 
-        if len(self._items_batch) < self._batch_size:
-            return
+    def propose_many(self, n):
+        # Take architectures from pool first
+        with self._lock:
+            batch_item_idxs = [self._pool.popleft() for _ in range(min(n, len(self._pool)))]
+            to_resample = (len(self._pool) == 0 and not self._is_pool_pending)
+            if to_resample:
+                self._is_pool_pending = True
 
-        self._train_model(self._items_batch, self._scores_batch)
-        self._items_batch = []
-        self._scores_batch = []
+        if to_resample:
+            self._tasks.put(None)
 
-    def _predict_with_model(self):
-        knob_items = self._knob.items
-        out_item_idxs = self._out_item_idxs
+        # Sample the rest at once
+        if len(batch_item_idxs) < n:
+            batch_item_idxs += self._predict_with_model(n - len(batch_item_idxs))
 
-        with self._graph.as_default():
-            item_idxs_real = self._sess.run(out_item_idxs)
-            items = [
-                values[idx].value
-                for (values, idx) in zip(knob_items, item_idxs_real)
-            ]
-            return items
-
-    def _train_model(self, items_batch, batch_scores):
         knob_items = self._knob.items
+        return [[values[idx].value for (values, idx) in zip(knob_items, item_idxs)]
+                for item_idxs in batch_item_idxs]
 
+    def feedback(self, items, score):
         # Convert item values to indexes
-        batch_item_idxs = [[[x.value
-                             for x in values].index(value)
-                            for (values, value) in zip(knob_items, items)]
-                           for items in items_batch]
-
+        item_idxs = [value_to_idx[value] for (value_to_idx, value) in zip(self._value_to_idx_by_item, items)]
+
+        with self._lock:
+            self._items_batch.append(item_idxs)
+            self._scores_batch.append(score)
+
+            if len(self._items_batch) < self._batch_size:
+                return
+
+            task = (self._items_batch, self._scores_batch)
+            self._items_batch = []
+            self._scores_batch = []
+
+            # Discard architectures sampled from the controller before this batch,
+            # so that proposals follow the updated controller once it is trained
+            self._pool.clear()
+            self._is_pool_pending = True
+            self._generation += 1
+
+        # Train controller in the background
+        self._tasks.put(task)
+
+    def _run_tasks(self):
+        while True:
+            task = self._tasks.get()
+            with self._lock:
+                generation = self._generation
+            try:
+                if task is not None:
+                    self._train_model(*task)
+
+                # Resample pool from the latest controller
+                # Only keep the pool if no batch has been queued since, as the controller is then to be updated again
+                batch_item_idxs = self._predict_with_model(self._pool_size)
+                with self._lock:
+                    if generation == self._generation:
+                        self._pool = deque(batch_item_idxs)
+                        self._is_pool_pending = False
+            except:
+                logger.error('Error in background task of controller:')
+                logger.error(traceback.format_exc())
+                with self._lock:
+                    if generation == self._generation:
+                        self._is_pool_pending = False
+
+    def _predict_with_model(self, n):
+        # Sample a batch of architectures in a single forward pass
+        batch_item_idxs = self._sess.run(self._out_item_idxs,
+                                         feed_dict={self._num_samples_ph: n})
+        return batch_item_idxs.tolist()
+
+    def _train_model(self, batch_item_idxs, batch_scores):
         logger.info('Training controller...')
 
-        with self._graph.as_default():
-            (losses, rewards,
-             _) = self._sess.run([self._losses, self._rewards, self._train_op],
-                                 feed_dict={
-                                     self._item_idxs_ph: batch_item_idxs,
-                                     self._scores_ph: batch_scores
-                                 })
+        (losses, rewards,
+         _) = self._sess.run([self._losses, self._rewards, self._train_op],
+                             feed_dict={
+                                 self._item_idxs_ph: batch_item_idxs,
+                                 self._scores_ph: batch_scores
+                             })
 
-            # print('Rewards: {}'.format(rewards))
-            # print('Losses: {}'.format(losses))
+        # print('Rewards: {}'.format(rewards))
+        # print('Losses: {}'.format(losses))
 
     def _start_session(self):
         self._sess.run(tf.global_variables_initializer())
@@ -282,17 +377,29 @@ class EnasArchAdvisor():
         # Convert each item value to its value representation (for embeddings)
         (value_reps_by_item, K) = self._convert_values_to_reps(knob)
 
-        # Placeholders for item indexes and associated score
+        # Placeholders for no. of architectures to sample, and item indexes and associated score
+        num_samples_ph = tf.placeholder(dtype=tf.int32, shape=())
         item_idxs_ph = tf.placeholder(dtype=tf.int32, shape=(batch_size, N))
         scores_ph = tf.placeholder(dtype=tf.float32, shape=(batch_size,))
 
-        (item_logits, out_item_idxs) = self._forward(value_reps_by_item, K)
+        # Share controller's variables between sampling & training
+        with tf.variable_scope('controller', reuse=tf.AUTO_REUSE):
+            (lstm, initial_embed, embeds) = self._make_controller(K)
+
+            # Sample a batch of architectures
+            (_, out_item_idxs) = self._forward(value_reps_by_item, lstm, initial_embed, embeds,
+                                               num_samples_ph)
+
+            # Compute logits of the given batch of architectures, each conditioned on its own items
+            (item_logits, _) = self._forward(value_reps_by_item, lstm, initial_embed, embeds,
+                                             batch_size, item_idxs=item_idxs_ph)
+
         (train_op, losses,
          rewards) = self._make_train_op(item_logits, item_idxs_ph, scores_ph)
 
         model_params_count = self._count_model_parameters()
 
-        return (item_logits, out_item_idxs, train_op, losses, rewards,
+        return (num_samples_ph, out_item_idxs, train_op, losses, rewards,
                 item_idxs_ph, scores_ph)
 
     # Convert each item value to its value representation
@@ -359,13 +466,10 @@ class EnasArchAdvisor():
 
         return (train_op, losses, rewards)
 
-    def _forward(self, reps_by_item, K):
+    def _make_controller(self, K):
         # ``K`` = <no. of unique item value reps>
-        N = len(reps_by_item)  # Length of list
-        H = 32  # Number of units in LSTM
+        H = ENAS_CONTROLLER_UNITS
         lstm_num_layers = 2
-        temperature = 0
-        tanh_constant = 1.1
 
         # Build LSTM
         lstm = self._build_lstm(lstm_num_layers, H)
@@ -376,16 +480,28 @@ class EnasArchAdvisor():
         # Embedding for item values
         embeds = self._make_var('item_value_embeds', (K, H))
 
+        return (lstm, initial_embed, embeds)
+
+    def _forward(self, reps_by_item, lstm, initial_embed, embeds, num_samples, item_idxs=None):
+        '''
+        Runs the controller for a batch of ``num_samples`` architectures, sampling their items,
+        or taking them from ``item_idxs`` of shape (num_samples, N) if given
+        '''
+        N = len(reps_by_item)  # Length of list
+        H = ENAS_CONTROLLER_UNITS
+        temperature = 0
+        tanh_constant = 1.1
+
         # TODO: Add attention
 
         out_item_idxs = []
         item_logits = []
         lstm_states = [None]
-        item_embeds = [initial_embed]
+        item_embeds = [tf.tile(initial_embed, (num_samples, 1))]
 
         for i in range(N):
             L = len(reps_by_item[i])  # No. of candidate values for item
-            reps = tf.stack(reps_by_item[i])
+            reps = tf.constant(reps_by_item[i], dtype=tf.int32)
 
             with tf.variable_scope('item_{}'.format(i)):
                 # Run input through LSTM to get output
@@ -401,36 +517,33 @@ class EnasArchAdvisor():
                 logits = self._add_tanh_constant(logits, tanh_constant)
                 item_logits.append(logits)
 
-                # Draw and save item index from probability distribution from logits
-                item_idx = self._sample_from_logits(logits)
+                # Draw item indexes from probability distributions from logits, unless given
+                if item_idxs is None:
+                    item_idx = self._sample_from_logits(logits)
+                else:
+                    item_idx = item_idxs[:, i]
                 out_item_idxs.append(item_idx)
 
                 # If not the final item
                 if i < N - 1:
-                    # Run item value rep through embedding lookup
-                    rep = reps[item_idx]
-                    item_embed = tf.reshape(tf.nn.embedding_lookup(embeds, rep),
-                                            (1, -1))
+                    # Run item value reps through embedding lookup
+                    rep = tf.gather(reps, item_idx)
+                    item_embed = tf.nn.embedding_lookup(embeds, rep)
                     item_embeds.append(item_embed)
 
-        return (item_logits, out_item_idxs)
+        # Item indexes are of shape (num_samples, N)
+        return (item_logits, tf.stack(out_item_idxs, axis=1))
 
     def _compute_sample_log_probs(self, item_idxs, item_logits):
         N = len(item_logits)
         batch_size = tf.shape(item_idxs)[0]  # item_idxs is of shape (bs, N)
-
-        item_idxs = tf.transpose(item_idxs,
-                                 (1, 0))  # item_idxs is of shape (N, bs)
         sample_log_probs = tf.zeros((batch_size,),
                                     dtype=tf.float32,
                                     name='sample_log_probs')
 
         for i in range(N):
-            idxs = item_idxs[i]  # Indexes for item i in a batch
-            logits = item_logits[i]  # Logits for item i
-            logits = tf.reshape(tf.tile(logits, (batch_size, 1)),
-                                (batch_size, -1))
-            idxs = tf.reshape(idxs, (batch_size,))
+            idxs = item_idxs[:, i]  # Indexes for item i in a batch
+            logits = item_logits[i]  # Logits for item i in a batch, of shape (bs, L)
             log_probs = tf.nn.sparse_softmax_cross_entropy_with_logits(
                 logits=logits, labels=idxs)
             sample_log_probs += log_probs
@@ -439,17 +552,14 @@ class EnasArchAdvisor():
 
     def _compute_sample_entropy(self, item_logits):
         N = len(item_logits)
-        sample_entropy = tf.constant(0.,
-                                     dtype=tf.float32,
-                                     name='sample_entropy')
+        sample_entropy = 0.
 
         for i in range(N):
             logits = item_logits[i]
             entropy = tf.nn.softmax_cross_entropy_with_logits_v2(
-                logits=tf.reshape(logits, (1, -1)),
-                labels=tf.reshape(tf.nn.softmax(logits), (1, -1)))
+                logits=logits, labels=tf.nn.softmax(logits))
             entropy = tf.stop_gradient(entropy)
-            sample_entropy += entropy[0]
+            sample_entropy += entropy
 
         return sample_entropy
 
@@ -458,8 +568,9 @@ class EnasArchAdvisor():
     ####################################
 
     def _sample_from_logits(self, logits):
-        idx = tf.multinomial(tf.reshape(logits, (1, -1)), 1)[0][0]
-        return idx
+        # Draws an index for each row of logits
+        idxs = tf.multinomial(logits, 1)[:, 0]
+        return tf.cast(idxs, tf.int32)
 
     def _count_model_parameters(self):
         tf_trainable_vars = tf.trainable_variables()
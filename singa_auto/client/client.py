@@ -642,6 +642,9 @@ class Client:
         **Budget Option**             **Description**
         ---------------------       ---------------------
         ``GPU_COUNT``               No. of GPUs to allocate for inference, across all trials. Defaults to 0.
+        ``MAX_BATCH_SIZE``          Max. no. of queries each inference worker passes to its model at once. Defaults to 32.
+        ``MAX_QUEUE_DELAY_MS``      Max. time in milliseconds a query waits for its batch to fill under load.
+                                    Idle workers don't wait. Defaults to 10.
         =====================       =====================
         '''
 
@@ -685,6 +688,9 @@ class Client:
         **Budget Option**             **Description**
         ---------------------       ---------------------
         ``GPU_COUNT``               No. of GPUs to allocate for inference, across all trials. Defaults to 0.
+        ``MAX_BATCH_SIZE``          Max. no. of queries each inference worker passes to its model at once. Defaults to 32.
+        ``MAX_QUEUE_DELAY_MS``      Max. time in milliseconds a query waits for its batch to fill under load.
+                                    Idle workers don't wait. Defaults to 10.
         =====================       =====================
         '''
 
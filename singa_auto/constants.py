@@ -32,6 +32,8 @@ Budget = Dict[BudgetOption, Any]
 
 class InferenceBudgetOption:
     GPU_COUNT = 'GPU_COUNT'
+    MAX_BATCH_SIZE = 'MAX_BATCH_SIZE'
+    MAX_QUEUE_DELAY_MS = 'MAX_QUEUE_DELAY_MS'
 
 
 InferenceBudget = Dict[InferenceBudgetOption, Any]
@@ -73,6 +75,12 @@ class TrialStatus:
     COMPLETED = 'COMPLETED'
 
 
+class DatasetStatStatus:
+    RUNNING = 'RUNNING'
+    ERRORED = 'ERRORED'
+    COMPLETED = 'COMPLETED'
+
+
 class UserType:
     SUPERADMIN = 'SUPERADMIN'
     ADMIN = 'ADMIN'
@@ -18,4 +18,5 @@
 #
 
 from .data_store import Dataset, DataStore
-from .file import FileDataStore
\ No newline at end of file
+from .file import FileDataStore
+from .cached import CachedDataStore
@@ -0,0 +1,186 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import os
+import time
+import fcntl
+import hashlib
+import logging
+import threading
+import traceback
+
+from singa_auto.error_code import InvalidDatasetError
+from singa_auto.datasets.cache_utils import DATASET_CACHE_MAX_BYTES, get_dataset_cache_dir, \
+    lock_cache_entry_use, reserve_cache_space
+
+from .data_store import DataStore, Dataset
+from .file import DATA_STREAM_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class CachedDataStore(DataStore):
+    '''
+        Wraps a data store whose datasets are on a shared filesystem (e.g. an NFS mount), loading datasets from
+        a copy in a node-local cache directory, so that each dataset is read from the shared filesystem once per node.
+
+        Datasets are copied on first load, verified against their expected size & checksum, and evicted in order of
+        least recent use, together with caches derived from datasets, to keep the cache within ``max_bytes``.
+        Datasets in use by any process on the node are never evicted. If a dataset can't be cached, e.g. it is larger
+        than the cache, it is loaded from the wrapped store.
+
+        :param DataStore data_store: Data store to cache datasets of
+        :param str cache_dir: Node-local directory to cache datasets in, defaults to ``DATASET_CACHE_DIR_PATH``
+        :param int max_bytes: Max total size of datasets in the cache, where 0 disables caching
+    '''
+    '''
+        Internally, organises data into this layout in the cache directory:
+
+        datasets/<dataset_id>       | Copy of dataset, with the modification time of the original
+                                    | and the time it was last loaded as its access time
+        datasets/<dataset_id>.use   | Lock held shared by each process using the copy, and exclusively while evicting it
+        datasets/<dataset_id>.lock  | Lock held while checking or copying the copy
+        .lock                       | Lock guarding eviction across processes
+    '''
+
+    def __init__(self, data_store: DataStore, cache_dir=None, max_bytes=DATASET_CACHE_MAX_BYTES):
+        self._data_store = data_store
+        self._max_bytes = max_bytes
+        self._cache_dir = cache_dir or get_dataset_cache_dir()
+        self._datasets_dir = os.path.join(self._cache_dir, 'datasets')
+        self._entry_lock_files = {}  # Lock file on use of each dataset used by this process, kept open while it runs
+        self._thread_lock = threading.Lock()
+
+    def save(self, data_file_path) -> Dataset:
+        return self._data_store.save(data_file_path)
+
+    def save_stream(self, stream) -> Dataset:
+        return self._data_store.save_stream(stream)
+
+    def delete(self, dataset_id):
+        self._data_store.delete(dataset_id)
+
+    def load(self, dataset_id, size_bytes=None, checksum=None) -> str:
+        '''
+            Loads a persisted dataset, identified by ID, returning the file path to its copy in the node-local cache.
+
+            :param int size_bytes: Expected size of the dataset, if known
+            :param str checksum: Expected SHA-256 of the dataset's content, if known, verified as it is copied
+        '''
+        file_path = self._data_store.load(dataset_id)
+        if self._max_bytes <= 0:
+            return file_path
+
+        try:
+            with self._thread_lock:
+                return self._load_cached(dataset_id, file_path, size_bytes, checksum) or file_path
+        except InvalidDatasetError:
+            raise
+        except Exception:
+            logger.warning('Failed to cache dataset "{}", loading it from "{}" instead:'.format(dataset_id, file_path))
+            logger.warning(traceback.format_exc())
+            return file_path
+
+    def prefetch(self, datasets) -> threading.Thread:
+        '''
+            Copies datasets into the node-local cache in the background, so that they are cached by the time they are loaded.
+            A concurrent ``load`` of a dataset being copied waits for the copy to complete.
+
+            :param datasets: List of (<dataset ID>, <expected size in bytes or None>, <expected checksum or None>)
+            :returns: Thread copying the datasets
+        '''
+        def prefetch():
+            for (dataset_id, size_bytes, checksum) in datasets:
+                try:
+                    self.load(dataset_id, size_bytes=size_bytes, checksum=checksum)
+                except Exception:
+                    logger.error('Error while prefetching dataset "{}":'.format(dataset_id))
+                    logger.error(traceback.format_exc())
+
+        thread = threading.Thread(target=prefetch, daemon=True)
+        thread.start()
+        return thread
+
+    def _load_cached(self, dataset_id, file_path, size_bytes, checksum):
+        cache_path = os.path.join(self._datasets_dir, dataset_id)
+        os.makedirs(self._datasets_dir, exist_ok=True)
+
+        # Hold lock on use of dataset shared while this process runs, so that it isn't evicted
+        if dataset_id not in self._entry_lock_files:
+            self._entry_lock_files[dataset_id] = lock_cache_entry_use(cache_path)
+
+        # Copy dataset under an exclusive lock if it isn't yet cached
+        with open('{}.lock'.format(cache_path), 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                src_stat = os.stat(file_path)
+                if size_bytes is not None and src_stat.st_size != size_bytes:
+                    raise InvalidDatasetError('Dataset "{}" is of {} bytes, but expected {} bytes'.format(
+                        dataset_id, src_stat.st_size, size_bytes))
+
+                if not self._is_cached(cache_path, src_stat):
+                    if not reserve_cache_space(src_stat.st_size, max_bytes=self._max_bytes, cache_dir=self._cache_dir):
+                        logger.warning('Not enough space to cache dataset "{}" of {} bytes'.format(
+                            dataset_id, src_stat.st_size))
+                        return None
+
+                    self._copy(dataset_id, file_path, cache_path, src_stat, checksum)
+
+                # Record use of the copy for eviction, keeping its modification time
+                os.utime(cache_path, (time.time(), src_stat.st_mtime))
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+        return cache_path
+
+    def _is_cached(self, cache_path, src_stat):
+        if not os.path.exists(cache_path):
+            return False
+
+        cache_stat = os.stat(cache_path)
+        return cache_stat.st_size == src_stat.st_size and cache_stat.st_mtime == src_stat.st_mtime
+
+    def _copy(self, dataset_id, file_path, cache_path, src_stat, checksum):
+        logger.info('Copying dataset "{}" of {} bytes to node-local cache...'.format(dataset_id, src_stat.st_size))
+        start_time = time.time()
+        tmp_file_path = '{}.tmp'.format(cache_path)
+        sha256 = hashlib.sha256()
+        try:
+            with open(file_path, 'rb') as src, open(tmp_file_path, 'wb') as dest:
+                while True:
+                    chunk = src.read(DATA_STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    sha256.update(chunk)
+
+            if checksum is not None and sha256.hexdigest() != checksum:
+                raise InvalidDatasetError('Dataset "{}" does not match its checksum'.format(dataset_id))
+
+            # Keep original modification time, so that caches derived from the dataset are shared with the original
+            os.utime(tmp_file_path, (time.time(), src_stat.st_mtime))
+
+            # Only make copy visible once it is complete & verified
+            os.replace(tmp_file_path, cache_path)
+        except:
+            if os.path.exists(tmp_file_path):
+                os.remove(tmp_file_path)
+            raise
+
+        logger.info('Copied dataset "{}" in {:.1f}s'.format(dataset_id, time.time() - start_time))
@@ -25,9 +25,10 @@ import os
 
 class Dataset():
 
-    def __init__(self, id: str, size_bytes: int):
+    def __init__(self, id: str, size_bytes: int, checksum: str = None):
         self.id = id
         self.size_bytes = size_bytes
+        self.checksum = checksum  # SHA-256 of the dataset's content
 
 
 class DataStore(abc.ABC):
@@ -42,6 +43,21 @@ class DataStore(abc.ABC):
         '''
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def save_stream(self, stream) -> Dataset:
+        '''
+            Persists a dataset read from a readable binary file-like object, in chunks as it is read,
+            returning a ``Dataset`` abstraction once the dataset is durable.
+        '''
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def delete(self, dataset_id: str):
+        '''
+            Deletes a persisted dataset, identified by ID.
+        '''
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def load(self, dataset_id: str) -> str:
         '''
@@ -19,10 +19,12 @@
 
 import os
 import uuid
-import shutil
+import hashlib
 
 from .data_store import DataStore, Dataset
 
+DATA_STREAM_CHUNK_SIZE = 4 * 1024 * 1024
+
 
 class FileDataStore(DataStore):
     '''
@@ -34,16 +36,43 @@ class FileDataStore(DataStore):
                                                   os.environ['DATA_DIR_PATH'])
 
     def save(self, data_file_path):
-        # Copy file to data dir
+        with open(data_file_path, 'rb') as f:
+            return self.save_stream(f)
+
+    def save_stream(self, stream):
         file_name = '{}.data'.format(uuid.uuid4())
         dest_file_path = os.path.join(self._data_dir, file_name)
-        shutil.copyfile(data_file_path, dest_file_path)
+        tmp_file_path = '{}.tmp'.format(dest_file_path)
+
+        # Write stream to data dir, computing its checksum & size along the way
+        sha256 = hashlib.sha256()
+        size_bytes = 0
+        try:
+            with open(tmp_file_path, 'wb') as f:
+                while True:
+                    chunk = stream.read(DATA_STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    sha256.update(chunk)
+                    size_bytes += len(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Only make dataset visible once it is complete & durable
+            os.replace(tmp_file_path, dest_file_path)
+        except:
+            if os.path.exists(tmp_file_path):
+                os.remove(tmp_file_path)
+            raise
 
-        # Get metadata for dataset
         dataset_id = file_name
-        size_bytes = self._get_size_bytes(dest_file_path)
+        return Dataset(dataset_id, size_bytes, checksum=sha256.hexdigest())
 
-        return Dataset(dataset_id, size_bytes)
+    def delete(self, dataset_id):
+        file_path = self.load(dataset_id)
+        if os.path.exists(file_path):
+            os.remove(file_path)
 
     def load(self, dataset_id):
         file_name = dataset_id
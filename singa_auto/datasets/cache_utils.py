@@ -0,0 +1,245 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import os
+import uuid
+import fcntl
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DATASET_CACHE_MAX_BYTES = int(os.environ.get('DATASET_CACHE_MAX_BYTES', 10 * 1024 * 1024 * 1024))
+DATASET_CACHE_SIDECAR_EXTS = ['.use', '.lock', '.tmp']
+
+# Lock file on use of each cache used by this process, kept open while it runs
+_use_lock_files = {}
+_use_lock_files_lock = threading.Lock()
+
+
+def get_dataset_cache_dir():
+    '''
+        Returns the node-local directory that datasets are cached in.
+    '''
+    return os.environ.get('DATASET_CACHE_DIR_PATH') or \
+        os.path.join(tempfile.gettempdir(), 'singa_auto', 'dataset_cache')
+
+
+def get_dataset_cache_key(dataset_path, *options):
+    '''
+        Returns a key identifying a dataset file (by its name, size & modification time) together with ``options``
+        for how it is processed.
+    '''
+    stat = os.stat(dataset_path)
+    return (os.path.basename(dataset_path), stat.st_size, stat.st_mtime, *options)
+
+
+def get_or_build_cache(cache_key, build, required=True, estimate_size=None, max_bytes=DATASET_CACHE_MAX_BYTES) -> str:
+    '''
+        Returns the path of the node-local cache directory for ``cache_key``, building it if it doesn't exist.
+
+        The cache is built once per node: ``build(tmp_path)`` is called with a temporary directory to write the cache to,
+        under a lock across processes, and the directory is only moved into place once ``build`` returns.
+        Other processes wait on the lock, then reuse the cache.
+
+        Caches count towards the ``max_bytes`` budget of the node-local dataset cache, shared with copies of datasets,
+        and least recently used entries not in use are evicted to make space for a newly built cache.
+        A cache is in use while any process that got it runs. If there isn't enough space, a cache that isn't ``required``
+        is discarded, raising ``OSError``; otherwise, it is kept anyway.
+
+        If given, ``estimate_size()`` returns an upper bound of the size of the cache in bytes, for space to be reserved
+        before the cache is built, so that a cache that isn't ``required`` is not built at all if it won't fit.
+    '''
+    cache_dir = get_dataset_cache_dir()
+    key = hashlib.sha1(repr(cache_key).encode()).hexdigest()
+    cache_path = os.path.join(cache_dir, key)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Hold lock on use of cache shared while this process runs, so that it isn't evicted
+    with _use_lock_files_lock:
+        if cache_path not in _use_lock_files:
+            _use_lock_files[cache_path] = lock_cache_entry_use(cache_path)
+
+    with open('{}.lock'.format(cache_path), 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            if not os.path.exists(cache_path):
+                # Reserve space for the estimated size of the cache before building it
+                if estimate_size is not None:
+                    _reserve_cache_space_for(estimate_size(), required, max_bytes, cache_dir)
+
+                logger.info('Building dataset cache at "{}"...'.format(cache_path))
+                tmp_path = '{}.{}.tmp'.format(cache_path, uuid.uuid4())
+                os.makedirs(tmp_path)
+                try:
+                    build(tmp_path)
+                    if estimate_size is None:
+                        _reserve_cache_space_for(get_cache_entry_size(tmp_path), required, max_bytes, cache_dir)
+
+                    # Make cache visible to other processes only when complete
+                    os.replace(tmp_path, cache_path)
+                except:
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                    raise
+
+            # Record use of cache for eviction
+            os.utime(cache_path)
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    return cache_path
+
+
+def _reserve_cache_space_for(size_bytes, required, max_bytes, cache_dir):
+    if reserve_cache_space(size_bytes, max_bytes=max_bytes, cache_dir=cache_dir):
+        return
+
+    if not required:
+        raise OSError('Not enough space in dataset cache for {} bytes'.format(size_bytes))
+    logger.warning('Dataset cache of {} bytes exceeds space in dataset cache'.format(size_bytes))
+
+
+def lock_cache_entry_use(entry_path):
+    '''
+        Opens & locks the lock file on use of an entry of the node-local dataset cache shared,
+        returning the file, which keeps the entry from being evicted until it is closed.
+    '''
+    # Lock file on use is deleted when the entry is evicted, so retry if it was deleted while waiting for the lock
+    while True:
+        use_lock_file = open('{}.use'.format(entry_path), 'a')
+        fcntl.flock(use_lock_file.fileno(), fcntl.LOCK_SH)
+        try:
+            if os.stat(use_lock_file.name).st_ino == os.fstat(use_lock_file.fileno()).st_ino:
+                return use_lock_file
+        except FileNotFoundError:
+            pass
+        use_lock_file.close()
+
+
+def reserve_cache_space(size_bytes, max_bytes=DATASET_CACHE_MAX_BYTES, cache_dir=None) -> bool:
+    '''
+        Evicts least recently used entries of the node-local dataset cache that aren't in use, i.e. copies of datasets
+        and caches derived from them, until there is space for ``size_bytes`` more bytes within ``max_bytes``
+        and on disk. Returns whether there is enough space.
+    '''
+    if size_bytes > max_bytes:
+        return False
+
+    cache_dir = cache_dir or get_dataset_cache_dir()
+    with _eviction_lock(cache_dir):
+        entries = []
+        for entry_path in _list_cache_entries(cache_dir):
+            try:
+                entries.append((os.stat(entry_path).st_atime, entry_path, get_cache_entry_size(entry_path)))
+            except FileNotFoundError:
+                continue
+
+        total_bytes = sum(x[2] for x in entries)
+        free_bytes = shutil.disk_usage(cache_dir).free
+        for (_, entry_path, entry_size) in sorted(entries):
+            if total_bytes + size_bytes <= max_bytes and size_bytes <= free_bytes:
+                break
+            if _try_evict(entry_path):
+                total_bytes -= entry_size
+                free_bytes += entry_size
+
+        return total_bytes + size_bytes <= max_bytes and size_bytes <= free_bytes
+
+
+def get_cache_entry_size(entry_path) -> int:
+    '''
+        Returns the size in bytes of an entry of the node-local dataset cache, as a file or a directory.
+    '''
+    if not os.path.isdir(entry_path):
+        return os.path.getsize(entry_path)
+
+    return sum(
+        os.path.getsize(os.path.join(dir_path, name))
+        for (dir_path, _, names) in os.walk(entry_path)
+        for name in names
+    )
+
+
+def _list_cache_entries(cache_dir):
+    # Entries are caches at the root of the cache directory, and copies of datasets in ``datasets/``
+    for entries_dir in [cache_dir, os.path.join(cache_dir, 'datasets')]:
+        if not os.path.isdir(entries_dir):
+            continue
+        for name in os.listdir(entries_dir):
+            if name.startswith('.') or os.path.splitext(name)[1] in DATASET_CACHE_SIDECAR_EXTS:
+                continue
+            if entries_dir == cache_dir and name == 'datasets':
+                continue
+            yield os.path.join(entries_dir, name)
+
+
+def _try_evict(entry_path):
+    with open('{}.use'.format(entry_path), 'a') as lock_file:
+        # Entry is in use (or being built) by a process if its lock on use is held
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+
+        try:
+            logger.info('Evicting "{}" from node-local dataset cache...'.format(entry_path))
+            if os.path.isdir(entry_path):
+                shutil.rmtree(entry_path)
+            else:
+                os.remove(entry_path)
+            # Nobody else holds the lock on building while the lock on use is held exclusively
+            for lock_file_path in ['{}.lock'.format(entry_path), lock_file.name]:
+                if os.path.exists(lock_file_path):
+                    os.remove(lock_file_path)
+            return True
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def _eviction_lock(cache_dir):
+    with open(os.path.join(cache_dir, '.lock'), 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def encode_strs(strs):
+    '''
+        Encodes a list of strings as (<UTF-8 bytes of strings concatenated, as uint8 array>, <int64 offsets of strings>),
+        to be saved as numpy arrays without pickling.
+    '''
+    strs_bytes = [x.encode('utf-8') for x in strs]
+    offsets = np.concatenate([[0], np.cumsum([len(x) for x in strs_bytes])]).astype(np.int64)
+    return (np.frombuffer(b''.join(strs_bytes), dtype=np.uint8), offsets)
+
+
+def decode_strs(strs_bytes, offsets):
+    '''
+        Decodes a list of strings encoded with ``encode_strs``.
+    '''
+    strs_bytes = strs_bytes.tobytes()
+    return [strs_bytes[lo:hi].decode('utf-8') for (lo, hi) in zip(offsets[:-1], offsets[1:])]
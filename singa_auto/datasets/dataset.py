@@ -16,19 +16,21 @@
 # specific language governing permissions and limitations
 # under the License.
 #
-from functools import singledispatch
 import PIL
 from PIL import Image
 import numpy as np
 from typing import List, Any
 import os
+import queue
+import threading
 import traceback
 import zipfile
 import io
-import csv
 import pandas
-import tempfile
-from singa_auto.datasets.dataset_base import ModelDataset, _load_pil_image
+from singa_auto.datasets.dataset_base import ModelDataset
+from singa_auto.datasets.image_batch import open_image, transform_image, map_images, map_images_to_array
+from singa_auto.datasets.cache_utils import get_or_build_cache, get_dataset_cache_key, encode_strs, decode_strs
+from singa_auto.datasets.zip_utils import ZipMemberReader
 from singa_auto.error_code import InvalidDatasetFormatException
 
 
@@ -64,12 +66,26 @@ class DatasetUtils:
         '''
         return CorpusDataset(dataset_path, tags or ['tag'], split_by)
 
+    def load_tabular_dataset(self, dataset_path, index_col=None):
+        '''
+            Loads a tabular dataset from a CSV file, e.g. for the tasks ``TABULAR_CLASSIFICATION`` & ``TABULAR_REGRESSION``.
+            The CSV file is converted once per node to a columnar format, which is then read through memory maps,
+            with categorical columns already encoded.
+
+            :param str dataset_path: File path of the dataset
+            :param index_col: Column to use as the index of the dataframes read, as for ``pandas.read_csv``
+            :returns: An instance of ``TabularDataset``
+        '''
+        from singa_auto.datasets.tabular_dataset import TabularDataset
+        return TabularDataset.get_or_build(dataset_path, index_col=index_col)
+
     def load_dataset_of_image_files(self,
                                     dataset_path,
                                     min_image_size=None,
                                     max_image_size=None,
                                     mode='RGB',
-                                    if_shuffle=False
+                                    if_shuffle=False,
+                                    use_cache=True
                                     ):
         '''
             Loads dataset for the task ``IMAGE_CLASSIFICATION``.
@@ -78,6 +94,7 @@ class DatasetUtils:
             :param int max_image_size: maximum width *and* height to resize all images to
             :param str mode: Pillow image mode. Refer to https://pillow.readthedocs.io/en/3.1.x/handbook/concepts.html#concept-modes
             :param bool if_shuffle: Whether to shuffle the dataset
+            :param bool use_cache: Whether to cache preprocessed images on disk on this node, to be reused by later loads
             :returns: An instance of ``ImageFilesDataset``
         '''
         from singa_auto.datasets.image_classification_dataset import ImageDataset4Clf
@@ -86,7 +103,8 @@ class DatasetUtils:
              min_image_size=min_image_size,
              max_image_size=max_image_size,
              mode=mode,
-             if_shuffle=if_shuffle)
+             if_shuffle=if_shuffle,
+             use_cache=use_cache)
 
     def load_img_detection_datasets(self,
                                     dataset_path,
@@ -154,56 +172,40 @@ class DatasetUtils:
 
     def transform_images(self, images, image_size=None, mode=None):
         '''
-            Resize or convert a list of N images to another size and/or mode
+            Resize or convert a list of N images to another size and/or mode, across a pool of threads
 
-            :param images: (N x width x height x channels) array-like of images to resize
+            :param images: (N x width x height x channels) array-like of images to resize, or list of <class 'PIL.Image.Image'>
             :param int image_size: width *and* height to resize all images to
             :param str mode: Pillow image mode to convert all images to. Refer to https://pillow.readthedocs.io/en/3.1.x/handbook/concepts.html#concept-modes
-            :returns: output images as a (N x width x height x channels) numpy array
+            :returns: (output images as a (N x width x height x channels) numpy array, output images as a list of <class 'PIL.Image.Image'>)
         '''
-        images = [
-            Image.fromarray(np.asarray(x, dtype=np.uint8)) for x in images
-        ]
-
-        if image_size is not None:
-            images = [x.resize([image_size, image_size]) for x in images]
-
-        if mode is not None:
-            images = [x.convert(mode) for x in images]
+        return map_images_to_array(lambda x: transform_image(x, image_size=image_size, mode=mode), list(images))
 
-        return np.asarray([np.asarray(x) for x in images]), images
-
-    def load_images(self, image_paths: List[Any],  mode: str = 'RGB') -> List[PIL.Image.Image]:
+    def load_images(self, image_paths: List[Any], mode: str = 'RGB', image_size: int = None) -> List[PIL.Image.Image]:
         '''
-             Loads multiple images from the local filesystem or image bytes.
-             Assumes that images are of the same dimensions.
+             Loads multiple images from the local filesystem or image bytes, decoding them across a pool of threads.
 
-             :param images: Paths to images
+             :param images: Paths to images, or their encoded bytes
              :param str mode: Pillow image mode to convert all images to. Refer to https://pillow.readthedocs.io/en/3.1.x/handbook/concepts.html#concept-modes
-             :returns: Pillow images as a (N x width x height x channels) numpy array
+             :param int image_size: If set, width *and* height to resize all images to, with JPEG images decoded directly at a reduced scale
+             :returns: List of <class 'PIL.Image.Image'>
          '''
+        assert isinstance(image_paths, list)
+        return map_images(lambda x: open_image(x, mode=mode, image_size=image_size), image_paths)
 
-        @singledispatch
-        def load(image_path):
-            raise Exception("Un-support img type {}".format(image_path.__class__))
-
-        @load.register(str)
-        def _(image_path):
-            pil_image = _load_pil_image(image_path, mode=mode)
-            return pil_image
-
-        @load.register(bytes)
-        def _(image_bytes):
-            encoded = io.BytesIO(image_bytes)
-            pil_image = Image.open(encoded).convert(mode)
-            return pil_image
+    def load_images_as_array(self, image_paths: List[Any], image_size: int, mode: str = 'RGB') -> np.ndarray:
+        '''
+             Loads multiple images from the local filesystem or image bytes, decoding & resizing them across a pool of threads
+             directly into a single array.
 
+             :param images: Paths to images, or their encoded bytes
+             :param int image_size: width *and* height to resize all images to, with JPEG images decoded directly at a reduced scale
+             :param str mode: Pillow image mode to convert all images to. Refer to https://pillow.readthedocs.io/en/3.1.x/handbook/concepts.html#concept-modes
+             :returns: Images as a (N x width x height x channels) numpy array
+         '''
         assert isinstance(image_paths, list)
-        pil_images = []
-        for image_path in image_paths:
-            pil_images.append(load(image_path))
-
-        return pil_images
+        (images, _) = map_images_to_array(lambda x: open_image(x, mode=mode, image_size=image_size), image_paths)
+        return images
 
 
 class CorpusDataset(ModelDataset):
@@ -217,67 +219,159 @@ class CorpusDataset(ModelDataset):
     Each dataset sample is [[token, <tag_1>, <tag_2>, ..., <tag_k>]] where each token is a string,
     each ``tag_i`` is an integer from 0 to (k_i - 1) as each token's corresponding class for that tag,
     with tags appearing in the same order as ``tags``.
+
+    The corpus is held compactly as arrays: ``vocab`` is the list of unique tokens in order of first appearance,
+    and tokens are stored as int32 IDs into ``vocab``, with their tags as int32, and sentences as offsets into them.
+    These arrays are built once per node, and cached in a ``.npz`` file in the node-local dataset cache.
+    Use ``iter_batches`` to iterate over padded batches of token IDs & tags.
+    '''
+    '''
+        Internally, the cache file holds these arrays:
+
+        token_ids       | (no. of tokens) int32 ID of each token in vocab
+        token_tags      | (no. of tokens x no. of tags) int32 tags of each token
+        sent_offsets    | (no. of sentences + 1) int64 index of each sentence's first token, with no. of tokens appended
+        vocab_bytes     | UTF-8 bytes of tokens in vocab, concatenated
+        vocab_offsets   | (size of vocab + 1) int64 offset of each token of vocab in ``vocab_bytes``
     '''
 
     def __init__(self, dataset_path, tags, split_by):
         self.tags = tags
-        (self.size, self.tag_num_classes, self.max_token_len, self.max_sent_len, self._sents) = \
+        (self.vocab, self._token_ids, self._token_tags, self._sent_offsets) = \
             self._load(dataset_path, self.tags, split_by)
+        self.size = len(self._sent_offsets) - 1
+        self.tag_num_classes = [int(x) + 1 for x in self._token_tags.max(axis=0)] \
+            if len(self._token_tags) > 0 else [0 for _ in tags]
+        self.max_token_len = max([len(x) for x in self.vocab] or [0])
+        sent_lens = np.diff(self._sent_offsets)
+        self.max_sent_len = int(sent_lens.max()) if len(sent_lens) > 0 else 0
+
+    def __len__(self):
+        return self.size
 
     def __getitem__(self, index):
-        return self._sents[index]
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.size))]
+        if index < 0:
+            index += self.size
+        if index < 0 or index >= self.size:
+            raise IndexError('Sentence index out of range')
+
+        (lo, hi) = self._sent_offsets[index:index + 2]
+        vocab = self.vocab
+        return [[vocab[token_id], *token_tags]
+                for (token_id, token_tags) in zip(self._token_ids[lo:hi].tolist(), self._token_tags[lo:hi].tolist())]
+
+    def get_sent(self, index):
+        '''
+            Returns the token IDs & tags of a sentence, as arrays of shape (sentence length,) & (sentence length x no. of tags).
+        '''
+        (lo, hi) = self._sent_offsets[index:index + 2]
+        return (self._token_ids[lo:hi], self._token_tags[lo:hi])
+
+    def iter_batches(self, batch_size, shuffle=False, pad_value=-1, prefetch=2):
+        '''
+            Iterates over the corpus in batches of sentences, padded to the length of the longest sentence in the batch.
+            Batches are prepared in a background thread, up to ``prefetch`` batches ahead.
+
+            Each batch is (token IDs, tags, sentence lengths) as arrays of shapes (N x W), (N x W x no. of tags) & (N,),
+            where positions past the end of a sentence have the value ``pad_value``.
+        '''
+        indices = np.random.permutation(self.size) if shuffle else np.arange(self.size)
+        batches = (indices[i:i + batch_size] for i in range(0, self.size, batch_size))
+        make_batch = lambda batch_indices: self._make_batch(batch_indices, pad_value)
+        return _prefetch(map(make_batch, batches), prefetch)
+
+    def _make_batch(self, batch_indices, pad_value):
+        starts = self._sent_offsets[batch_indices]
+        lens = self._sent_offsets[batch_indices + 1] - starts
+        max_len = int(lens.max()) if len(lens) > 0 else 0
+
+        # Gather tokens of all sentences at once, with a mask of positions within each sentence
+        positions = np.arange(max_len)
+        mask = positions[None, :] < lens[:, None]
+        token_indices = (starts[:, None] + positions[None, :])[mask]
+        token_ids = np.full((len(batch_indices), max_len), pad_value, dtype=np.int32)
+        token_ids[mask] = self._token_ids[token_indices]
+        token_tags = np.full((len(batch_indices), max_len, len(self.tags)), pad_value, dtype=np.int32)
+        token_tags[mask] = self._token_tags[token_indices]
+        return (token_ids, token_tags, lens)
 
     def _load(self, dataset_path, tags, split_by):
-        sents = []
-        tag_num_classes = [0 for _ in range(len(tags))]
-        max_token_len = 0
-        max_sent_len = 0
-
-        with tempfile.TemporaryDirectory() as d:
-            dataset_zipfile = zipfile.ZipFile(dataset_path, 'r')
-            dataset_zipfile.extractall(path=d)
-            dataset_zipfile.close()
-
-            # Read corpus.tsv, read token by token, and merge them into sentences
-            corpus_tsv_path = os.path.join(d, 'corpus.tsv')
-            try:
-                with open(corpus_tsv_path, mode='r') as f:
-                    reader = csv.DictReader(f, dialect='excel-tab')
-
-                    # Read full corpus into memory token by token
-                    sent = []
-                    for row in reader:
-                        token = row['token']
-                        del row['token']
-
-                        # Start new sentence upon encountering delimiter
-                        if token == split_by:
-                            sents.append(sent)
-                            sent = []
-                            continue
-
-                        token_tags = [int(row[x]) for x in tags]
-                        sent.append([token, *token_tags])
-
-                        # Maintain max classes of tags
-                        tag_num_classes = [
-                            max(x + 1, m)
-                            for (x, m) in zip(token_tags, tag_num_classes)
-                        ]
-
-                        # Maintain max token length
-                        max_token_len = max(len(token), max_token_len)
-
-                    # Maintain max sent length
-                    max_sent_len = max(len(sent), max_sent_len)
-
-            except:
-                traceback.print_stack()
-                raise InvalidDatasetFormatException()
-
-        size = len(sents)
-
-        return (size, tag_num_classes, max_token_len, max_sent_len, sents)
+        # Reuse arrays cached on this node, if they were built for the same dataset file & options
+        cache_key = ('corpus', *get_dataset_cache_key(dataset_path, tuple(tags), split_by))
+        try:
+            cache_path = get_or_build_cache(cache_key,
+                                            lambda tmp_path: self._build_cache(dataset_path, tags, split_by, tmp_path),
+                                            required=False)
+        except OSError:
+            traceback.print_exc()
+            return self._read_corpus(dataset_path, tags, split_by)
+
+        with np.load(os.path.join(cache_path, 'corpus.npz')) as arrays:
+            vocab = decode_strs(arrays['vocab_bytes'], arrays['vocab_offsets'])
+            return (vocab, arrays['token_ids'], arrays['token_tags'], arrays['sent_offsets'])
+
+    def _build_cache(self, dataset_path, tags, split_by, cache_path):
+        (vocab, token_ids, token_tags, sent_offsets) = self._read_corpus(dataset_path, tags, split_by)
+        (vocab_bytes, vocab_offsets) = encode_strs(vocab)
+        np.savez(os.path.join(cache_path, 'corpus.npz'), token_ids=token_ids, token_tags=token_tags,
+                 sent_offsets=sent_offsets, vocab_bytes=vocab_bytes, vocab_offsets=vocab_offsets)
+
+    def _read_corpus(self, dataset_path, tags, split_by):
+        try:
+            # Read corpus.tsv straight from the zip, as columns
+            zip_reader = ZipMemberReader(dataset_path)
+            corpus_bytes = zip_reader.read('corpus.tsv')
+            zip_reader.close()
+            df = pandas.read_csv(io.BytesIO(corpus_bytes), sep='\t', dtype={'token': str},
+                                 keep_default_na=False, na_filter=False)
+            tokens = df['token'].values
+            tags_values = df[tags].values
+        except:
+            traceback.print_stack()
+            raise InvalidDatasetFormatException()
+
+        # Split tokens into sentences by delimiter, dropping tokens after the last delimiter
+        # The k-th delimiter ends a sentence after (<position of delimiter> - k) tokens
+        is_delim = tokens == split_by
+        delim_positions = np.flatnonzero(is_delim)
+        sent_offsets = np.concatenate([[0], delim_positions - np.arange(len(delim_positions))]).astype(np.int64)
+        is_token = ~is_delim
+        is_token[(delim_positions[-1] if len(delim_positions) > 0 else 0):] = False
+
+        # Parse tags of tokens only, as delimiters have no tags
+        try:
+            token_tags = tags_values[is_token].astype(np.int32).reshape((-1, len(tags)))
+        except:
+            traceback.print_stack()
+            raise InvalidDatasetFormatException()
+
+        (token_ids, vocab) = pandas.factorize(tokens[is_token])
+        return (list(vocab), token_ids.astype(np.int32), token_tags, sent_offsets)
+
+
+def _prefetch(iterator, size):
+    # Runs ``iterator`` in a background thread, up to ``size`` items ahead
+    items = queue.Queue(maxsize=max(size, 1))
+    end = object()
+
+    def produce():
+        try:
+            for item in iterator:
+                items.put(item)
+            items.put(end)
+        except BaseException as e:
+            items.put(e)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = items.get()
+        if item is end:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
 
 
 class AudioFilesDataset(ModelDataset):
@@ -1,8 +1,11 @@
 import abc
+import os
 from typing import Tuple, Generic, TypeVar
 import PIL
 from PIL import Image
 import io
+import numpy as np
+import pandas as pd
 
 
 def _load_pil_image(image_path, mode='RGB'):
@@ -12,8 +15,7 @@ def _load_pil_image(image_path, mode='RGB'):
 
     try:
         with open(image_path, 'rb') as f:
-            encoded = io.BytesIO(f.read())
-            pil_image = Image.open(encoded).convert(mode)
+            pil_image = _load_pil_image_from_bytes(f.read(), mode=mode)
     except:
         print('error accurs when handling : ', image_path)
         raise
@@ -21,6 +23,76 @@ def _load_pil_image(image_path, mode='RGB'):
     return pil_image
 
 
+def _load_pil_image_from_bytes(image_bytes, mode='RGB'):
+    """
+    load one image from its encoded bytes
+    """
+
+    encoded = io.BytesIO(image_bytes)
+    pil_image = Image.open(encoded).convert(mode)
+    return pil_image
+
+
+def _crop_and_resize_pil_image(pil_image, min_image_size=None, max_image_size=None):
+    """
+    crop an image into a centered square, then resize it to adhere to min/max image size
+    returns (image, image size)
+    """
+
+    (width, height) = pil_image.size
+    # crop rectangular image into square
+    left = (width - min(width, height)) / 2
+    right = (width + min(width, height)) / 2
+    top = (height - min(width, height)) / 2
+    bottom = (height + min(width, height)) / 2
+    crop_pil_image = pil_image.crop((left, top, right, bottom))
+
+    # Decide on image size, adhering to min/max, making it square and trying not to stretch it
+    image_size = max(min([width, height, max_image_size or width]),
+                     min_image_size or 0)
+
+    # Resize all images
+    images = crop_pil_image.resize([image_size, image_size])
+
+    return (images, image_size)
+
+
+def _read_image_files_index(zip_reader):
+    """
+    list the images & their classes in a zipped dataset of image files,
+    with classes either in images.csv or as the images' folder names, without reading any images
+    returns (image paths, image classes, no. of samples, no. of classes, class names)
+    """
+
+    namelist = zip_reader.namelist()
+    if 'images.csv' in namelist:
+        # Read csv to obtain paths/classes/numbers only,
+        # no actual images would be read
+        images_csv_name = [x for x in namelist if x.endswith('.csv')][0]
+        csv = pd.read_csv(io.BytesIO(zip_reader.read(images_csv_name)))
+        image_classes = csv[csv.columns[1:]]
+        image_paths = csv[csv.columns[0]]
+        num_classes = len(csv[csv.columns[1]].unique())
+        num_labeled_samples = len(csv[csv.columns[0]].unique())
+        image_classes = tuple(np.array(image_classes).squeeze().tolist())
+        image_paths = tuple(image_paths)
+        str_labels_set = None
+
+    else:
+        # make image name list and remove dir from list
+        image_paths = [
+            x for x in namelist
+            if x.endswith('/') == False
+        ]
+        num_labeled_samples = len(image_paths)
+        str_labels = [os.path.dirname(x) for x in image_paths]
+        str_labels_set = list(set(str_labels))
+        num_classes = len(str_labels_set)
+        image_classes = [str_labels_set.index(x) for x in str_labels]
+
+    return (image_paths, image_classes, num_labeled_samples, num_classes, str_labels_set)
+
+
 T = TypeVar('T')
 K = TypeVar('K')
 
@@ -0,0 +1,135 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import PIL
+from PIL import Image
+
+# No. of threads decoding & resizing images; Pillow releases the GIL while decoding, converting & resizing
+IMAGE_BATCH_THREADS = int(os.environ.get('IMAGE_BATCH_THREADS', os.cpu_count() or 1))
+IMAGE_BATCH_MIN_SIZE = 4  # Min no. of images for a batch to be processed across threads
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def open_image(image, mode='RGB', image_size=None) -> PIL.Image.Image:
+    '''
+        Decodes an image from its file path or encoded bytes, converting it to ``mode``.
+
+        If ``image_size`` is set, the image is also resized to ``image_size`` x ``image_size``. JPEG images are then
+        decoded directly at a reduced scale no smaller than ``image_size`` with ``draft``, which is much faster
+        than decoding them fully before resizing.
+    '''
+    if isinstance(image, bytes):
+        pil_image = Image.open(io.BytesIO(image))
+    elif isinstance(image, str):
+        with open(image, 'rb') as f:
+            pil_image = Image.open(io.BytesIO(f.read()))
+    else:
+        raise Exception("Un-support img type {}".format(image.__class__))
+
+    if image_size is not None and pil_image.format == 'JPEG':
+        pil_image.draft(mode, (image_size, image_size))
+
+    pil_image = pil_image.convert(mode)
+    if image_size is not None and pil_image.size != (image_size, image_size):
+        pil_image = pil_image.resize([image_size, image_size])
+
+    return pil_image
+
+
+def transform_image(image, image_size=None, mode=None) -> PIL.Image.Image:
+    '''
+        Resizes an image, as a Pillow image or (height x width [x channels]) array, to ``image_size`` x ``image_size``
+        and/or converts it to ``mode``.
+    '''
+    if not isinstance(image, PIL.Image.Image):
+        image = Image.fromarray(np.asarray(image, dtype=np.uint8))
+
+    if image_size is not None:
+        image = image.resize([image_size, image_size])
+
+    if mode is not None:
+        image = image.convert(mode)
+
+    return image
+
+
+def map_images(fn, images) -> list:
+    '''
+        Applies ``fn`` to each image, across a shared pool of threads for large enough batches, in order.
+    '''
+    if len(images) < IMAGE_BATCH_MIN_SIZE or IMAGE_BATCH_THREADS <= 1:
+        return [fn(x) for x in images]
+
+    return list(_get_executor().map(fn, images))
+
+
+def map_images_to_array(fn, images) -> (np.ndarray, list):
+    '''
+        Applies ``fn`` to each image, where ``fn`` returns a Pillow image, across a shared pool of threads,
+        writing the resulting images directly into a preallocated (N x height x width [x channels]) uint8 array.
+        If the resulting images are not all of the same shape, they are instead returned as a 1D array of objects,
+        each an image array.
+
+        :returns: (<array of images>, <list of resulting Pillow images>)
+    '''
+    if len(images) == 0:
+        return (np.zeros((0,), dtype=np.uint8), [])
+
+    # Allocate output from the shape of the first image
+    first_image = fn(images[0])
+    first_array = np.asarray(first_image)
+    out = np.empty((len(images), *first_array.shape), dtype=first_array.dtype)
+    out[0] = first_array
+
+    is_uniform = True
+
+    def write(i):
+        nonlocal is_uniform
+        pil_image = fn(images[i])
+        array = np.asarray(pil_image)
+        if array.shape == first_array.shape:
+            out[i] = array
+        else:
+            is_uniform = False
+        return pil_image
+
+    pil_images = [first_image] + map_images(write, list(range(1, len(images))))
+    if not is_uniform:
+        # Ragged arrays can't be stacked with ``np.asarray``, so assign images into an array of objects
+        out = np.empty(len(pil_images), dtype=object)
+        for (i, pil_image) in enumerate(pil_images):
+            out[i] = np.asarray(pil_image)
+        return (out, pil_images)
+
+    return (out, pil_images)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_BATCH_THREADS)
+    return _executor
@@ -0,0 +1,172 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import os
+import shutil
+import logging
+import traceback
+from multiprocessing import Pool
+import numpy as np
+
+from singa_auto.datasets.cache_utils import get_or_build_cache
+
+logger = logging.getLogger(__name__)
+
+# Pillow image modes whose images can be cached, as 8-bit channels
+CACHEABLE_IMAGE_MODES = ['L', 'RGB', 'RGBA']
+CACHE_BUILD_CHUNK_SIZE = 1024
+
+
+class PreprocessedImageCache:
+    '''
+        Node-local, on-disk cache of the preprocessed images & classes of an image dataset, read through memory maps.
+
+        The cache is keyed by the dataset file (i.e. the ID of the dataset in the data store, together with its size &
+        modification time) and the preprocessing options, and is built once per node. Other processes on the node
+        (e.g. other train workers) wait for it to be built, then reuse it. The cache counts towards the budget of the
+        node-local dataset cache, and is evicted once it is the least recently used & no process uses it.
+
+        Images are stored back-to-back as uint8 (height x width x channels) arrays. If all images are of the same size,
+        ``images`` is the cache as a single N x H x W x C array.
+    '''
+    '''
+        Internally, organises data into this layout in the cache directory:
+
+        <key>/images.npy        | All images, flattened & concatenated, as uint8
+        <key>/offsets.npy       | Start of each image in ``images.npy``, with end of the last image appended
+        <key>/shapes.npy        | Shape of each image as (height, width, channels)
+        <key>/classes.npy       | Class of each image
+        <key>.use               | Lock held shared by each process using the cache, and exclusively while evicting it
+        <key>.lock              | Lock file guarding the building of the cache across processes
+    '''
+
+    def __init__(self, cache_path):
+        self._cache_path = cache_path
+        self._flat_images = np.load(os.path.join(cache_path, 'images.npy'), mmap_mode='r')
+        self._offsets = np.load(os.path.join(cache_path, 'offsets.npy'))
+        self._shapes = np.load(os.path.join(cache_path, 'shapes.npy'))
+        self.classes = np.load(os.path.join(cache_path, 'classes.npy'))
+
+    def __len__(self):
+        return len(self._shapes)
+
+    def __getitem__(self, index):
+        return (self.get_image(index), self.classes[index])
+
+    def __getstate__(self):
+        # Pickle only the path, so that other processes map the cache themselves
+        return {'cache_path': self._cache_path}
+
+    def __setstate__(self, state):
+        self.__init__(state['cache_path'])
+
+    def get_image(self, index) -> np.ndarray:
+        (start, end) = self._offsets[index:index + 2]
+        return self._flat_images[start:end].reshape(self._shapes[index])
+
+    @property
+    def images(self):
+        if len(self) == 0 or (self._shapes != self._shapes[0]).any():
+            return None
+
+        return self._flat_images.reshape((len(self), *self._shapes[0]))
+
+    @staticmethod
+    def get_or_build(dataset, item_names, item_classes, cache_key, estimate_size=None, processes=None):
+        '''
+            Gets the cache of preprocessed images for a dataset, building it if it doesn't exist on this node.
+            Returns None if the cache can't be built, e.g. if there isn't enough space in the node-local dataset cache.
+
+            :param dataset: Dataset with a ``_load_image(item_name)`` method returning (<PIL image>, <image size>)
+            :param item_names: Names of the dataset's items, in the order they are to be cached
+            :param item_classes: Classes of the dataset's items
+            :param cache_key: Identifies the dataset & its preprocessing
+            :param estimate_size: Returns an upper bound of the size of the preprocessed images in bytes, to check for
+                space in the node-local dataset cache before any image is preprocessed
+            :param int processes: No. of processes to build the cache with, defaults to the no. of CPUs
+        '''
+        try:
+            cache_path = get_or_build_cache(
+                cache_key,
+                lambda tmp_path: _build_cache(dataset, item_names, item_classes, tmp_path, processes),
+                required=False,
+                estimate_size=estimate_size)
+            return PreprocessedImageCache(cache_path)
+
+        except OSError as e:
+            logger.warning('Not caching preprocessed images: {}'.format(e))
+            return None
+
+        except:
+            logger.warning('Not caching preprocessed images, as building cache failed:')
+            logger.warning(traceback.format_exc())
+            return None
+
+
+def _build_cache(dataset, item_names, item_classes, cache_path, processes):
+    # Preprocess images in chunks, in parallel, to temporary files
+    chunks = [
+        (dataset, item_names[i:i + CACHE_BUILD_CHUNK_SIZE], os.path.join(cache_path, 'chunk_{}.npy'.format(i)))
+        for i in range(0, len(item_names), CACHE_BUILD_CHUNK_SIZE)
+    ]
+    processes = processes or os.cpu_count() or 1
+    if processes > 1 and len(chunks) > 1:
+        with Pool(min(processes, len(chunks))) as pool:
+            chunk_shapes = pool.map(_build_chunk, chunks)
+    else:
+        chunk_shapes = [_build_chunk(x) for x in chunks]
+
+    # Concatenate chunks into a single array of images
+    shapes = np.array([x for shapes in chunk_shapes for x in shapes], dtype=np.int64).reshape(-1, 3)
+    offsets = np.concatenate([[0], np.cumsum(np.prod(shapes, axis=1))]).astype(np.int64)
+    if offsets[-1] > shutil.disk_usage(cache_path).free:
+        raise OSError('Not enough disk space for {} bytes of images'.format(offsets[-1]))
+
+    images = np.lib.format.open_memmap(os.path.join(cache_path, 'images.npy'),
+                                       mode='w+',
+                                       dtype=np.uint8,
+                                       shape=(int(offsets[-1]),))
+    pos = 0
+    for (_, _, chunk_path) in chunks:
+        chunk = np.load(chunk_path, mmap_mode='r')
+        images[pos:pos + len(chunk)] = chunk
+        pos += len(chunk)
+        del chunk
+        os.remove(chunk_path)
+    images.flush()
+    del images
+
+    np.save(os.path.join(cache_path, 'offsets.npy'), offsets)
+    np.save(os.path.join(cache_path, 'shapes.npy'), shapes)
+    np.save(os.path.join(cache_path, 'classes.npy'), np.asarray(item_classes))
+
+
+def _build_chunk(args):
+    (dataset, item_names, chunk_path) = args
+    images = []
+    shapes = []
+    for item_name in item_names:
+        (pil_image, _) = dataset._load_image(item_name)
+        image = np.asarray(pil_image, dtype=np.uint8)
+        image = image.reshape((image.shape[0], image.shape[1], -1))
+        images.append(image.reshape(-1))
+        shapes.append(image.shape)
+
+    np.save(chunk_path, np.concatenate(images) if len(images) > 0 else np.empty(0, dtype=np.uint8))
+    return shapes
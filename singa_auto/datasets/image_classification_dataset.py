@@ -1,14 +1,23 @@
+import io
 import random
 import os
+import logging
 import traceback
-import zipfile
-import tempfile
 import torch
 from torch.utils.data import Dataset
 import torchvision.transforms as transforms
 import numpy as np
-from singa_auto.datasets.dataset_base import _load_pil_image, ClfModelDataset
-import pandas as pd
+from singa_auto.datasets.dataset_base import _load_pil_image_from_bytes, _crop_and_resize_pil_image, _read_image_files_index, \
+    ClfModelDataset
+from singa_auto.datasets.zip_utils import ZipMemberReader
+from singa_auto.datasets.cache_utils import get_dataset_cache_key
+from singa_auto.datasets.image_cache import PreprocessedImageCache, CACHEABLE_IMAGE_MODES
+from singa_auto.datasets.image_stats import compute_image_stats, get_dataset_stat, set_dataset_stat, \
+    make_image_stat_options
+from singa_auto.datasets.self_paced_sampler import SelfPacedSampler
+from PIL import Image
+
+logger = logging.getLogger(__name__)
 
 
 class ImageDataset4Clf(ClfModelDataset):
@@ -18,6 +27,9 @@ class ImageDataset4Clf(ClfModelDataset):
     Each dataset example is (image, class) where:
         - Each image is a 3D numpy array (width x height x channels)
         - Each class is an integer from 0 to (k - 1)
+
+    If ``use_cache`` is set, preprocessed images are cached on disk on this node on first load,
+    and read from the cache by later loads of the same dataset with the same options.
     '''
 
     def __init__(self,
@@ -25,28 +37,35 @@ class ImageDataset4Clf(ClfModelDataset):
                  min_image_size=None,
                  max_image_size=None,
                  mode='RGB',
-                 if_shuffle=False):
+                 if_shuffle=False,
+                 use_cache=True):
         self.mode = mode
         self.path = dataset_path
-        self.dataset_zipfile = None
+        self._zip_reader = ZipMemberReader(dataset_path)
         (self._image_names, self._image_classes, self.size, self.classes) = self._extract_zip(self.path)
         self.min_image_size = min_image_size
         self.max_image_size = max_image_size
         self.label_mapper = dict()
         self.image_size = None
+        self._cache = self._get_cache() if use_cache and mode in CACHEABLE_IMAGE_MODES else None
+        self._cache_indices = list(range(self.size))  # Index in cache of each item
         if if_shuffle:
             (self._image_names,
-             self._image_classes) = self._shuffle(self._image_names,
-                                                  self._image_classes)
+             self._image_classes,
+             self._cache_indices) = self._shuffle(self._image_names,
+                                                  self._image_classes,
+                                                  self._cache_indices)
 
     def __getitem__(self, index):
         if index >= self.size:
             raise StopIteration
         try:
-            pil_image = self._extract_item(item_path=self._image_names[index])
-            (image, image_size) = self._preprocess(pil_image,
-                                                   self.min_image_size,
-                                                   self.max_image_size)
+            if self._cache is not None:
+                image = self._cache.get_image(self._cache_indices[index])
+                image_size = image.shape[0]
+                image = Image.fromarray(image[:, :, 0] if image.shape[2] == 1 else image)
+            else:
+                (image, image_size) = self._load_image(self._image_names[index])
             if self.image_size is None:
                 self.image_size = image_size
             image_class = self._image_classes[index]
@@ -55,108 +74,102 @@ class ImageDataset4Clf(ClfModelDataset):
         except:
             raise
 
-    def _preprocess(self, pil_image, min_image_size, max_image_size):
-        (width, height) = pil_image.size
-        # crop rectangular image into square
-        left = (width - min(width, height)) / 2
-        right = (width + min(width, height)) / 2
-        top = (height - min(width, height)) / 2
-        bottom = (height + min(width, height)) / 2
-        crop_pil_image = pil_image.crop((left, top, right, bottom))
-
-        # Decide on image size, adhering to min/max, making it square and trying not to stretch it
-        image_size = max(min([width, height, max_image_size or width]),
-                         min_image_size or 0)
-
-        # Resize all images
-        images = crop_pil_image.resize([image_size, image_size])
+    def _load_image(self, item_path):
+        pil_image = self._extract_item(item_path=item_path)
+        return self._preprocess(pil_image, self.min_image_size, self.max_image_size)
+
+    def _get_cache(self):
+        # Cache is specific to the dataset file & preprocessing options
+        cache_key = get_dataset_cache_key(self.path, self.min_image_size, self.max_image_size, self.mode)
+        return PreprocessedImageCache.get_or_build(self, self._image_names, self._image_classes, cache_key,
+                                                   estimate_size=self._estimate_cache_size)
+
+    def _estimate_cache_size(self):
+        # Upper bound of the size of preprocessed images as uint8, with 1 byte per channel
+        channels = len(Image.new(self.mode, (1, 1)).getbands())
+        if self.max_image_size is not None:
+            image_size = max(self.max_image_size, self.min_image_size or 0)
+            return self.size * image_size * image_size * channels
+
+        # Otherwise, read the sizes of images from their headers, without decoding them
+        num_bytes = 0
+        for image_name in self._image_names:
+            (width, height) = Image.open(io.BytesIO(self._zip_reader.read(image_name))).size
+            image_size = max(min(width, height), self.min_image_size or 0)
+            num_bytes += image_size * image_size * channels
+        return num_bytes
 
-        return (images, image_size)
+    def _preprocess(self, pil_image, min_image_size, max_image_size):
+        return _crop_and_resize_pil_image(pil_image, min_image_size, max_image_size)
 
     def _extract_item(self, item_path):
-        # Create temp directory to unzip to extract 1 item
-        with tempfile.TemporaryDirectory() as d:
-            extracted_item_path = self.dataset_zipfile.extract(item_path,
-                                                               path=d)
-            pil_image = _load_pil_image(extracted_item_path, mode=self.mode)
+        # Decode item straight from the zip, without extracting it to disk
+        image_bytes = self._zip_reader.read(item_path)
+        pil_image = _load_pil_image_from_bytes(image_bytes, mode=self.mode)
 
         return pil_image
 
     def _extract_zip(self, dataset_path):
-        self.dataset_zipfile = zipfile.ZipFile(dataset_path, 'r')
-        if 'images.csv' in self.dataset_zipfile.namelist():
-            # Create temp directory to unzip to extract paths/classes/numbers only,
-            # no actual images would be extracted
-            with tempfile.TemporaryDirectory() as d:
-                # obtain csv file
-                for fileName in self.dataset_zipfile.namelist():
-                    if fileName.endswith('.csv'):
-                        # Extract a single csv file from zip
-                        images_csv_path = self.dataset_zipfile.extract(fileName,
-                                                                       path=d)
-                        break
-                try:
-                    csv = pd.read_csv(images_csv_path)
-                    image_classes = csv[csv.columns[1:]]
-                    image_paths = csv[csv.columns[0]]
-                except:
-                    traceback.print_stack()
-                    raise
-            num_classes = len(csv[csv.columns[1]].unique())
-            num_labeled_samples = len(csv[csv.columns[0]].unique())
-            image_classes = tuple(np.array(image_classes).squeeze().tolist())
-            image_paths = tuple(image_paths)
-
-        else:
-            # make image name list and remove dir from list
-            image_paths = [
-                x for x in self.dataset_zipfile.namelist()
-                if x.endswith('/') == False
-            ]
-            num_labeled_samples = len(image_paths)
-            str_labels = [os.path.dirname(x) for x in image_paths]
-            self.str_labels_set = list(set(str_labels))
-            num_classes = len(self.str_labels_set)
-            image_classes = [self.str_labels_set.index(x) for x in str_labels]
+        try:
+            (image_paths, image_classes, num_labeled_samples, num_classes,
+             str_labels_set) = _read_image_files_index(self._zip_reader)
+        except:
+            traceback.print_stack()
+            raise
+        if str_labels_set is not None:
+            self.str_labels_set = str_labels_set
         return (image_paths, image_classes, num_labeled_samples, num_classes)
 
-    def _shuffle(self, images, classes):
-        zipped = list(zip(images, classes))
+    def _shuffle(self, images, classes, cache_indices):
+        zipped = list(zip(images, classes, cache_indices))
         random.shuffle(zipped)
-        (images, classes) = zip(*zipped)
-        return (images, classes)
+        (images, classes, cache_indices) = zip(*zipped)
+        return (images, classes, cache_indices)
 
     def get_item(self, index):
         return self.__getitem__(index)
 
     def get_stat(self):
-        x = 0
-        for i in range(self.size):
-            try:
-                image = np.asarray(self.get_item(i)[0])
-                mu_i = np.mean(image, axis=(0, 1))
-                mu_i = np.expand_dims(mu_i, axis=0)
-
-                if i == 0:
-                    x = mu_i
-                else:
-                    x = np.concatenate((x, mu_i), axis=0)
-                if i % 10000 == 0:
-                    print(i)
-
-            except Exception as e:
-                import traceback
-                traceback.print_exc()
-                pass
-        x = x / 255
-        mu = np.mean(x, axis=0)
-        std = np.std(x, axis=0)
-        return mu, std
+        '''
+            Returns the per-channel mean & standard deviation of the dataset's pixel values, scaled to [0, 1].
+
+            The standard deviation is that of all pixels of all images, which differs from the mean of the
+            standard deviations of each image, as returned by earlier versions.
+        '''
+        image_stat = self.compute_stat()
+        return (np.array(image_stat['mean']), np.array(image_stat['std']))
+
+    def compute_stat(self, processes=None) -> dict:
+        '''
+            Returns stats of the dataset's images, i.e. per-channel mean & standard deviation of pixel values,
+            counts of images per class and counts of images per size.
+
+            Stats are of images as preprocessed, i.e. cropped & resized with this dataset's options.
+            Stats persisted with the dataset in ``Dataset.stat`` are reused if they were computed with the same options;
+            otherwise, they are computed in a single pass across ``processes`` processes, and kept for later calls in this process.
+        '''
+        options = make_image_stat_options(self.mode, self.min_image_size, self.max_image_size)
+        dataset_stat = get_dataset_stat(self.path) or {}
+        image_stat = dataset_stat.get('image_stat')
+        if image_stat is not None and all(image_stat.get(k) == v for (k, v) in options.items()):
+            return image_stat
+
+        if self._cache is not None:
+            stats = compute_image_stats(self._cache, self.size, processes=processes)
+        else:
+            stats = compute_image_stats(self, self.size, processes=processes)
+        image_stat = {**options, **stats.to_json()}
+        set_dataset_stat(self.path, {**dataset_stat, 'image_stat': image_stat})
+        return image_stat
 
 
 class TorchImageDataset(torch.utils.data.Dataset):
     """
     A Pytorch-type encapsulation to support training/evaluation
+
+    Self-paced Learning (SPL) is done by ``sampler``, which yields the RAW indices of only the effective data samples.
+    For SPL to take effect, the sampler MUST be passed to the DataLoader, i.e.
+    ``DataLoader(dataset, sampler=dataset.sampler, ...)``, and ``set_epoch`` called before each epoch.
     """
 
     def __init__(self,
@@ -164,7 +177,8 @@ class TorchImageDataset(torch.utils.data.Dataset):
                  image_scale_size,
                  norm_mean,
                  norm_std,
-                 is_train=False):
+                 is_train=False,
+                 spl_schedule=None):
         self.dataset = dataset
         if is_train:
             self._transform = transforms.Compose([
@@ -181,38 +195,25 @@ class TorchImageDataset(torch.utils.data.Dataset):
                 transforms.Normalize(norm_mean, norm_std)
             ])
 
-        # initialize parameters for Self-paced Learning (SPL) module
-        self._scores = np.zeros(self.dataset.size)
-        self._loss_threshold = -0.00001
-        # No threshold means all data samples are effective
-        self._effective_dataset_size = self.dataset.size
-        # equivalent mapping in default i.e.
-        # 0 - 0
-        # 1 - 1
-        # ...
-        # N - N
-        self._indice_mapping = np.linspace(start=0,
-                                           stop=self.dataset.size - 1,
-                                           num=self.dataset.size).astype(np.int32)
+        # Self-paced Learning (SPL) module, which samples only the effective data samples
+        # ``spl_schedule`` optionally gives the fraction of samples to use for each epoch, e.g. ``linear_schedule``
+        self.sampler = SelfPacedSampler(self.dataset.size, schedule=spl_schedule, shuffle=is_train)
 
     def __len__(self):
-        return self._effective_dataset_size
+        return self.dataset.size
 
     def __getitem__(self, idx):
         """
         return datasample by given idx
 
         parameters:
-            idx: integer number in range [0 .. self._effective_data_size - 1]
+            idx: RAW datasample index [0 .. self.dataset.size - 1], as yielded by ``self.sampler``
 
         returns:
             NOTE: being different from the standard procedure, the function returns
             tuple that contains RAW datasample index [0 .. self.dataset.size - 1] as
             the first element
         """
-        # translate the index to raw index in singa-auto dataset
-        idx = self._indice_mapping[idx]
-
         image, image_class = self.dataset.get_item(idx)
         image_class = torch.tensor(image_class)
         if self._transform:
@@ -222,24 +223,24 @@ class TorchImageDataset(torch.utils.data.Dataset):
 
         return (idx, image, image_class)
 
+    def set_epoch(self, epoch):
+        """
+        set the epoch before iterating through it, for shuffling & the SPL schedule
+        """
+        self.sampler.set_epoch(epoch)
+
     def update_sample_score(self, indices, scores):
         """
-        update the scores for datasamples
+        update the scores for datasamples, applied together when the sampler next samples
 
         parameters:
             indices: RAW indices for self.dataset
             scores: scores for corresponding data samples
         """
-        self._scores[indices] = scores
+        self.sampler.update_scores(indices, scores)
 
     def update_score_threshold(self, threshold):
-        self._loss_threshold = threshold
-        effective_data_mask = self._scores > self._loss_threshold
-
-        self._indice_mapping = np.linspace(
-            start=0, stop=self.dataset.size - 1,
-            num=self.dataset.size)[effective_data_mask].astype(np.int32)
-
-        self._effective_dataset_size = len(self._indice_mapping)
-        print("dataset threshold = {}, the effective sized = {}".format(
-            threshold, self._effective_dataset_size))
+        self.sampler.set_threshold(threshold)
+        logger.info('Dataset threshold = {}, the effective size = {}'.format(threshold, len(self.sampler)))
+        if self.sampler.num_iters == 0:
+            logger.warning('Score threshold has no effect unless `sampler=dataset.sampler` is passed to the DataLoader')
@@ -1,13 +1,15 @@
-import copy
-import numpy as np
+import io
 import os
-import zipfile
-import tempfile
+import json
+import numpy as np
 from singa_auto.datasets.dataset_base import DetectionModelDataset
+from singa_auto.datasets.cache_utils import get_or_build_cache, get_dataset_cache_key, encode_strs, decode_strs
+from singa_auto.datasets.zip_utils import ZipMemberReader
 import torch
 import torch.utils.data
 from PIL import Image
 from pycocotools.coco import COCO
+import pycocotools.mask as mask_utils
 from singa_auto.datasets.torch_utils import get_transform
 
 COCO_INSTANCE_CATEGORY_NAMES = [
@@ -26,64 +28,132 @@ COCO_INSTANCE_CATEGORY_NAMES = [
 ]
 
 
+class DetectionIndex:
+    '''
+        Compact index of the images of a detection dataset & their targets, built once per node.
+
+        Each image's objects are a range of rows of per-object arrays, and each object's mask is RLE-encoded,
+        so targets are read without decoding annotations or mask images.
+    '''
+    '''
+        Internally, organises data into this layout in the cache directory:
+
+        <key>/index.npz     | Arrays:
+                            |   image_names_bytes, image_names_offsets: Names of images in the dataset zip (see ``encode_strs``)
+                            |   image_ids: (N) ID of each image
+                            |   image_sizes: (N x 2) (height, width) of each image
+                            |   obj_offsets: (N + 1) Index of each image's first object, with no. of objects appended
+                            |   boxes: (M x 4) (xmin, ymin, xmax, ymax) of each object
+                            |   labels, areas, iscrowd: (M) Label, area & crowd flag of each object
+                            |   rles_bytes, rles_offsets: RLE counts of each object's mask (see ``encode_strs``)
+    '''
+
+    def __init__(self, cache_path):
+        with np.load(os.path.join(cache_path, 'index.npz')) as arrays:
+            self.image_names = decode_strs(arrays['image_names_bytes'], arrays['image_names_offsets'])
+            self.image_ids = arrays['image_ids']
+            self.image_sizes = arrays['image_sizes']
+            self.obj_offsets = arrays['obj_offsets']
+            self.boxes = arrays['boxes']
+            self.labels = arrays['labels']
+            self.areas = arrays['areas']
+            self.iscrowd = arrays['iscrowd']
+            self._rles_bytes = arrays['rles_bytes'].tobytes()
+            self._rles_offsets = arrays['rles_offsets']
+
+    def __len__(self):
+        return len(self.image_names)
+
+    def get_target(self, index):
+        (lo, hi) = self.obj_offsets[index:index + 2]
+        (height, width) = self.image_sizes[index].tolist()
+
+        # Decode masks of all objects of the image at once
+        rles = [{
+            'size': [height, width],
+            'counts': self._rles_bytes[self._rles_offsets[i]:self._rles_offsets[i + 1]]
+        } for i in range(lo, hi)]
+        if len(rles) > 0:
+            masks = np.transpose(mask_utils.decode(rles), (2, 0, 1))
+        else:
+            masks = np.zeros((0, height, width), dtype=np.uint8)
+
+        target = {}
+        target["boxes"] = torch.as_tensor(self.boxes[lo:hi], dtype=torch.float32)
+        target["labels"] = torch.as_tensor(self.labels[lo:hi], dtype=torch.int64)
+        target["masks"] = torch.as_tensor(masks, dtype=torch.uint8)
+        target["image_id"] = torch.tensor([int(self.image_ids[index])])
+        target["area"] = torch.as_tensor(self.areas[lo:hi], dtype=torch.float32)
+        target["iscrowd"] = torch.as_tensor(self.iscrowd[lo:hi], dtype=torch.int64)
+        return target
+
+    @staticmethod
+    def get_or_build(cache_key, iter_images) -> 'DetectionIndex':
+        '''
+            Gets the index for ``cache_key``, building it if it doesn't exist on this node.
+
+            :param iter_images: Returns an iterable of (image name, image ID, (height, width), objects) for the dataset,
+                where objects is a list of (box, label, area, iscrowd, RLE)
+        '''
+        cache_path = get_or_build_cache(cache_key, lambda tmp_path: _build_detection_index(iter_images(), tmp_path))
+        return DetectionIndex(cache_path)
+
+
+def _build_detection_index(images, cache_path):
+    image_names = []
+    image_ids = []
+    image_sizes = []
+    obj_offsets = [0]
+    (boxes, labels, areas, iscrowd, rles) = ([], [], [], [], [])
+    for (image_name, image_id, image_size, objs) in images:
+        image_names.append(image_name)
+        image_ids.append(image_id)
+        image_sizes.append(image_size)
+        for (box, label, area, obj_iscrowd, rle) in objs:
+            boxes.append(box)
+            labels.append(label)
+            areas.append(area)
+            iscrowd.append(obj_iscrowd)
+            counts = rle['counts']
+            rles.append(counts.decode('ascii') if isinstance(counts, bytes) else counts)
+        obj_offsets.append(len(boxes))
+
+    (image_names_bytes, image_names_offsets) = encode_strs(image_names)
+    (rles_bytes, rles_offsets) = encode_strs(rles)
+    np.savez(os.path.join(cache_path, 'index.npz'),
+             image_names_bytes=image_names_bytes,
+             image_names_offsets=image_names_offsets,
+             image_ids=np.array(image_ids, dtype=np.int64),
+             image_sizes=np.array(image_sizes, dtype=np.int64).reshape((-1, 2)),
+             obj_offsets=np.array(obj_offsets, dtype=np.int64),
+             boxes=np.array(boxes, dtype=np.float32).reshape((-1, 4)),
+             labels=np.array(labels, dtype=np.int64),
+             areas=np.array(areas, dtype=np.float32),
+             iscrowd=np.array(iscrowd, dtype=np.int64),
+             rles_bytes=rles_bytes,
+             rles_offsets=rles_offsets)
+
+
 class PennFudanDataset(DetectionModelDataset, torch.utils.data.Dataset):
+    '''
+        Images are read lazily from the dataset zip, and targets from a ``DetectionIndex`` built from its masks.
+    '''
+
     def __init__(self, dataset_path, is_train):
-        self.root_path = None
         self.transforms = get_transform(is_train)
+        self._zip_reader = ZipMemberReader(dataset_path)
 
         # load all image files, sorting them to
         # ensure that they are aligned
-        self.imgs, self.masks = self._extract_zip(dataset_path)
+        self.imgs, self.masks = self._list_zip(self._zip_reader)
+        self._index = DetectionIndex.get_or_build(('pennfudan', *get_dataset_cache_key(dataset_path)),
+                                                  self._iter_index_images)
 
     def __getitem__(self, idx):
-        # load images ad masks
-
-        img_path = os.path.join(self.root_path.name, "PennFudanPed", "PNGImages", self.imgs[idx])
-        mask_path = os.path.join(self.root_path.name, "PennFudanPed", "PedMasks", self.masks[idx])
-        img = Image.open(img_path).convert("RGB")
-        # note that we haven't converted the mask to RGB,
-        # because each color corresponds to a different instance
-        # with 0 being background
-        mask = Image.open(mask_path)
-
-        mask = np.array(mask)
-        # instances are encoded as different colors
-        obj_ids = np.unique(mask)
-        # first id is the background, so remove it
-        obj_ids = obj_ids[1:]
-
-        # split the color-encoded mask into a set
-        # of binary masks
-        masks = mask == obj_ids[:, None, None]
-
-        # get bounding box coordinates for each mask
-        num_objs = len(obj_ids)
-        boxes = []
-        for i in range(num_objs):
-            pos = np.where(masks[i])
-            xmin = np.min(pos[1])
-            xmax = np.max(pos[1])
-            ymin = np.min(pos[0])
-            ymax = np.max(pos[0])
-            boxes.append([xmin, ymin, xmax, ymax])
-
-        boxes = torch.as_tensor(boxes, dtype=torch.float32)
-        # there is only one class in this dataset
-        labels = torch.ones((num_objs,), dtype=torch.int64)
-        masks = torch.as_tensor(masks, dtype=torch.uint8)
-
-        image_id = torch.tensor([idx])
-        area = (boxes[:, 3] - boxes[:, 1]) * (boxes[:, 2] - boxes[:, 0])
-        # suppose all instances are not crowd
-        iscrowd = torch.zeros((num_objs,), dtype=torch.int64)
-
-        target = {}
-        target["boxes"] = boxes
-        target["labels"] = labels
-        target["masks"] = masks
-        target["image_id"] = image_id
-        target["area"] = area
-        target["iscrowd"] = iscrowd
+        # load images lazily from the zip, with targets from the index
+        img_bytes = self._zip_reader.read(self._index.image_names[idx])
+        img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
+        target = self._index.get_target(idx)
 
         if self.transforms is not None:
             img, target = self.transforms(img, target)
@@ -93,23 +163,59 @@ class PennFudanDataset(DetectionModelDataset, torch.utils.data.Dataset):
     def __len__(self):
         return len(self.imgs)
 
-    def _extract_zip(self, dataset_path):
-        dataset_zipfile = zipfile.ZipFile(dataset_path, 'r')
-        self.root_path = tempfile.TemporaryDirectory()
-        dataset_zipfile.extractall(path=self.root_path.name)
-        imgs = list(sorted(os.listdir(os.path.join(self.root_path.name, "PennFudanPed", "PNGImages"))))
-        masks = list(sorted(os.listdir(os.path.join(self.root_path.name, "PennFudanPed", "PedMasks"))))
-
+    def _list_zip(self, zip_reader):
+        namelist = zip_reader.namelist()
+        imgs = list(sorted(self._list_zip_dir(namelist, "PennFudanPed/PNGImages/")))
+        masks = list(sorted(self._list_zip_dir(namelist, "PennFudanPed/PedMasks/")))
         return imgs, masks
 
+    def _list_zip_dir(self, namelist, dir_path):
+        return [x[len(dir_path):] for x in namelist if x.startswith(dir_path) and len(x) > len(dir_path)]
+
+    def _iter_index_images(self):
+        for (idx, (img_name, mask_name)) in enumerate(zip(self.imgs, self.masks)):
+            # note that we haven't converted the mask to RGB,
+            # because each color corresponds to a different instance
+            # with 0 being background
+            mask_bytes = self._zip_reader.read("PennFudanPed/PedMasks/" + mask_name)
+            mask = np.array(Image.open(io.BytesIO(mask_bytes)))
+            # instances are encoded as different colors
+            obj_ids = np.unique(mask)
+            # first id is the background, so remove it
+            obj_ids = obj_ids[1:]
+
+            # split the color-encoded mask into a set
+            # of binary masks
+            masks = mask == obj_ids[:, None, None]
+
+            # get bounding box coordinates for each mask
+            objs = []
+            for i in range(len(obj_ids)):
+                pos = np.where(masks[i])
+                (xmin, xmax) = (np.min(pos[1]), np.max(pos[1]))
+                (ymin, ymax) = (np.min(pos[0]), np.max(pos[0]))
+                box = [float(xmin), float(ymin), float(xmax), float(ymax)]
+                area = (box[3] - box[1]) * (box[2] - box[0])
+                rle = mask_utils.encode(np.asfortranarray(masks[i].astype(np.uint8)))
+                # there is only one class in this dataset, and suppose all instances are not crowd
+                objs.append((box, 1, area, 0, rle))
+
+            yield ("PennFudanPed/PNGImages/" + img_name, idx, mask.shape[:2], objs)
+
 
 class CocoDataset(DetectionModelDataset, torch.utils.data.Dataset):
+    '''
+        Images are read lazily from the dataset zip, and targets from a ``DetectionIndex`` built from the annotations.
+        The annotations are only parsed when the index is built, or when ``coco`` is accessed.
+    '''
+
     def __init__(self, dataset_path, annotation_dataset_path, filter_classes, dataset_name, is_train):
 
         self.dataset_path = dataset_path
+        self.annotation_dataset_path = annotation_dataset_path
         self.transforms = get_transform(is_train)
-
-        self.root_path = None
+        self.filter_classes = filter_classes
+        self._coco = None
 
         year = dataset_name[-4:]
         if is_train:
@@ -119,69 +225,37 @@ class CocoDataset(DetectionModelDataset, torch.utils.data.Dataset):
             self.img_folder_name = "val{}".format(year)
             self.annotation_file_name = "instances_val{}.json".format(year)
 
-        self.imgs, self.annotation_file = self._extract_zip(dataset_path, annotation_dataset_path)
-        self.coco = COCO(self.annotation_file)
+        self._zip_reader = ZipMemberReader(dataset_path)
+        cache_key = ('coco', *get_dataset_cache_key(dataset_path), *get_dataset_cache_key(annotation_dataset_path),
+                     self.img_folder_name, self.annotation_file_name, tuple(filter_classes))
+        self._index = DetectionIndex.get_or_build(cache_key, self._iter_index_images)
+        self.ids = self._index.image_ids.tolist()
+
+    @property
+    def coco(self):
+        if self._coco is None:
+            annotation_zip_reader = ZipMemberReader(self.annotation_dataset_path)
+            annotation_bytes = annotation_zip_reader.read("annotations/" + self.annotation_file_name)
+            annotation_zip_reader.close()
+            self._coco = COCO()
+            self._coco.dataset = json.loads(annotation_bytes.decode('utf-8'))
+            self._coco.createIndex()
+        return self._coco
+
+    @property
+    def cat_ids(self):
         # eg: filter_classes: ['person', 'dog']
-        self.cat_ids = self.coco.getCatIds(catNms=filter_classes)
-        self.ids = self.coco.getImgIds(catIds=self.cat_ids)
-        # self.ids = self.getCombinedImgIds(catIds=self.cat_ids)
-        self.label_mapper = {v: key+1 for key, v in enumerate(self.cat_ids)}
+        return self.coco.getCatIds(catNms=self.filter_classes)
+
+    @property
+    def label_mapper(self):
+        return {v: key + 1 for key, v in enumerate(self.cat_ids)}
 
     def __getitem__(self, index):
-        coco = self.coco
-        # Image ID
-        img_id = self.ids[index]
-        # List: get annotation id from coco
-        ann_ids = coco.getAnnIds(imgIds=img_id)
-        # Dictionary: target coco_annotation file for an image
-        coco_annotation = coco.loadAnns(ann_ids)
-        # path for input image
-
-        img_file_name = coco.loadImgs(img_id)[0]['file_name']
-        # open the input image
-        img = Image.open(os.path.join(self.root_path.name, self.img_folder_name, img_file_name))
-
-        # number of objects in the image
-        num_objs = len(coco_annotation)
-
-        # Bounding boxes for objects
-        # In coco format, bbox = [xmin, ymin, width, height]
-        # In pytorch, the input should be [xmin, ymin, xmax, ymax]
-        boxes = []
-        masks = list()
-        labels = []
-        areas = []
-        for i in range(num_objs):
-            if coco_annotation[i]['category_id'] not in self.cat_ids:
-                continue
-
-            xmin = coco_annotation[i]['bbox'][0]
-            ymin = coco_annotation[i]['bbox'][1]
-            xmax = xmin + coco_annotation[i]['bbox'][2]
-            ymax = ymin + coco_annotation[i]['bbox'][3]
-            boxes.append([xmin, ymin, xmax, ymax])
-
-            masks.append(coco.annToMask(coco_annotation[i]))
-
-            labels.append(self.label_mapper[coco_annotation[i]["category_id"]])
-            areas.append(coco_annotation[i]['area'])
-
-        boxes = torch.as_tensor(boxes, dtype=torch.float32)
-        labels = torch.as_tensor(labels, dtype=torch.int64)
-        img_id = torch.tensor([img_id])
-        # Size of bbox (Rectangular)
-        areas = torch.as_tensor(areas, dtype=torch.float32)
-        iscrowd = torch.zeros((num_objs,), dtype=torch.int64)
-        masks = torch.as_tensor(np.array(masks), dtype=torch.uint8)
-
-        # Annotation is in dictionary format
-        target = dict()
-        target["boxes"] = boxes
-        target["labels"] = labels
-        target["masks"] = masks
-        target["image_id"] = img_id
-        target["area"] = areas
-        target["iscrowd"] = iscrowd
+        # open the input image lazily from the zip, with its target from the index
+        img_bytes = self._zip_reader.read(self._index.image_names[index])
+        img = Image.open(io.BytesIO(img_bytes))
+        target = self._index.get_target(index)
 
         if self.transforms is not None:
             img, target = self.transforms(img, target)
@@ -191,17 +265,37 @@ class CocoDataset(DetectionModelDataset, torch.utils.data.Dataset):
     def __len__(self):
         return len(self.ids)
 
-    def _extract_zip(self, dataset_path, annotation_dataset_path):
-        dataset_zipfile = zipfile.ZipFile(dataset_path, 'r')
-        annotation_zipfile = zipfile.ZipFile(annotation_dataset_path, 'r')
-        # create temp dir
-        self.root_path = tempfile.TemporaryDirectory()
-        # extract images and annotations
-        dataset_zipfile.extractall(path=self.root_path.name)
-        annotation_zipfile.extractall(path=self.root_path.name)
-        imgs = list(sorted(os.listdir(os.path.join(self.root_path.name, self.img_folder_name))))
-        annotation_file = os.path.join(self.root_path.name, "annotations", self.annotation_file_name)
-        return imgs, annotation_file
+    def __getstate__(self):
+        # Annotations are not sent to other processes, e.g. DataLoader workers
+        state = dict(self.__dict__)
+        state['_coco'] = None
+        return state
+
+    def _iter_index_images(self):
+        coco = self.coco
+        cat_ids = self.cat_ids
+        label_mapper = self.label_mapper
+
+        for img_id in coco.getImgIds(catIds=cat_ids):
+            img_info = coco.loadImgs(img_id)[0]
+            # Dictionary: target coco_annotation file for an image
+            coco_annotation = coco.loadAnns(coco.getAnnIds(imgIds=img_id))
+
+            # Bounding boxes for objects
+            # In coco format, bbox = [xmin, ymin, width, height]
+            # In pytorch, the input should be [xmin, ymin, xmax, ymax]
+            objs = []
+            for ann in coco_annotation:
+                if ann['category_id'] not in cat_ids:
+                    continue
+
+                (xmin, ymin, width, height) = ann['bbox']
+                box = [xmin, ymin, xmin + width, ymin + height]
+                rle = coco.annToRLE(ann)
+                objs.append((box, label_mapper[ann['category_id']], ann['area'], 0, rle))
+
+            yield ("{}/{}".format(self.img_folder_name, img_info['file_name']), img_id,
+                   (img_info['height'], img_info['width']), objs)
 
     def getCombinedImgIds(self, imgIds=[], catIds=[]):
         ids = set(imgIds)
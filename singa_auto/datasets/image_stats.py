@@ -0,0 +1,249 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import os
+import logging
+from collections import Counter
+import multiprocessing
+import numpy as np
+
+from singa_auto.datasets.dataset_base import _load_pil_image_from_bytes, _crop_and_resize_pil_image, \
+    _read_image_files_index
+from singa_auto.datasets.zip_utils import ZipMemberReader
+
+logger = logging.getLogger(__name__)
+
+IMAGE_STATS_CHUNK_SIZE = 1024  # No. of images per task sent to a process
+IMAGE_STATS_BATCH_SIZE = 64  # Max no. of images of the same shape whose moments are computed together
+
+# Stats of datasets as persisted in the metadata store, by path of the dataset file on this node
+_dataset_stats = {}
+
+
+def set_dataset_stat(dataset_path, stat):
+    '''
+        Makes the stats of a dataset, as persisted in ``Dataset.stat``, available to code loading the dataset
+        in this process, so that they are not recomputed.
+    '''
+    _dataset_stats[os.path.realpath(dataset_path)] = stat or {}
+
+
+def get_dataset_stat(dataset_path) -> dict:
+    '''
+        Returns the stats set for a dataset with ``set_dataset_stat``, or None.
+    '''
+    return _dataset_stats.get(os.path.realpath(dataset_path))
+
+
+def make_image_stat_options(mode='RGB', min_image_size=None, max_image_size=None) -> dict:
+    '''
+        Returns the preprocessing options that image stats are computed with, as saved with the stats,
+        so that stats are only reused for images preprocessed the same way.
+    '''
+    return {'mode': mode, 'min_image_size': min_image_size, 'max_image_size': max_image_size}
+
+
+class ImageStats:
+    '''
+        Streaming statistics of a set of images & their classes, computed in a single pass:
+        per-channel mean & standard deviation of pixel values, counts of images per class and per image size.
+
+        Channel moments are accumulated with Welford's algorithm, and stats of disjoint sets of images
+        can be combined with ``merge``, e.g. across processes, without losing precision.
+    '''
+
+    def __init__(self):
+        self.num_images = 0
+        self.num_pixels = 0
+        self._mean = None  # Per channel
+        self._m2 = None  # Per channel sum of squared differences from mean
+        self.class_counts = Counter()
+        self.size_counts = Counter()
+
+    def add_images(self, images: np.ndarray, image_classes):
+        '''
+            Adds a batch of images of the same shape, as an (N x H x W x C) array.
+        '''
+        (num_images, height, width) = images.shape[:3]
+        if num_images == 0:
+            return
+
+        pixels = images.reshape((num_images * height * width, -1)).astype(np.float64)
+        mean = pixels.mean(axis=0)
+        m2 = np.square(pixels - mean).sum(axis=0)
+        self._merge_moments(len(pixels), mean, m2)
+
+        self.num_images += num_images
+        self.size_counts['{}x{}'.format(width, height)] += num_images
+        for image_class in image_classes:
+            self._count_class(image_class)
+
+    def merge(self, other):
+        '''
+            Adds the stats of another, disjoint set of images.
+        '''
+        if other.num_pixels > 0:
+            self._merge_moments(other.num_pixels, other._mean, other._m2)
+        self.num_images += other.num_images
+        self.class_counts.update(other.class_counts)
+        self.size_counts.update(other.size_counts)
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self._mean
+
+    @property
+    def std(self) -> np.ndarray:
+        if self._m2 is None:
+            return None
+        return np.sqrt(self._m2 / self.num_pixels)
+
+    def to_json(self, scale=255) -> dict:
+        '''
+            Returns the stats as a JSON-serializable dict, with pixel values divided by ``scale``.
+        '''
+        return {
+            'num_images': self.num_images,
+            'mean': [] if self.mean is None else (self.mean / scale).tolist(),
+            'std': [] if self.std is None else (self.std / scale).tolist(),
+            'class_count': dict(self.class_counts),
+            'image_size_count': dict(self.size_counts)
+        }
+
+    def _merge_moments(self, count, mean, m2):
+        # Combine moments of 2 disjoint sets (Chan et al.)
+        if self._mean is None:
+            (self.num_pixels, self._mean, self._m2) = (count, mean, m2)
+            return
+
+        total = self.num_pixels + count
+        delta = mean - self._mean
+        self._mean = self._mean + delta * (count / total)
+        self._m2 = self._m2 + m2 + np.square(delta) * (self.num_pixels * count / total)
+        self.num_pixels = total
+
+    def _count_class(self, image_class):
+        # Multi-label classes are lists of 0/1 per label
+        if isinstance(image_class, (list, tuple)):
+            for (label, value) in enumerate(image_class):
+                if value == 1:
+                    self.class_counts[str(label)] += 1
+        else:
+            self.class_counts[str(image_class)] += 1
+
+
+class ZippedImageFiles:
+    '''
+        Minimal reader of a zipped dataset of image files, yielding (<PIL image>, <class>),
+        with images preprocessed as by ``ImageDataset4Clf``, i.e. cropped & resized.
+
+        :param str dataset_path: Path to the dataset's .zip file
+        :param str mode: Pillow image mode to convert images to
+    '''
+
+    def __init__(self, dataset_path, mode='RGB', min_image_size=None, max_image_size=None):
+        self.mode = mode
+        self.min_image_size = min_image_size
+        self.max_image_size = max_image_size
+        self._zip_reader = ZipMemberReader(dataset_path)
+        (self._image_names, self._image_classes, self.size, _, _) = _read_image_files_index(self._zip_reader)
+
+    def __getitem__(self, index):
+        image_bytes = self._zip_reader.read(self._image_names[index])
+        pil_image = _load_pil_image_from_bytes(image_bytes, mode=self.mode)
+        (pil_image, _) = _crop_and_resize_pil_image(pil_image, self.min_image_size, self.max_image_size)
+        return (pil_image, self._image_classes[index])
+
+
+def compute_image_stats(dataset, size, processes=None, on_progress=None, mp_context=None) -> ImageStats:
+    '''
+        Computes ``ImageStats`` of a dataset in a single pass, in chunks of images across a pool of processes.
+
+        :param dataset: Picklable dataset where ``dataset[i]`` is (<image as PIL image or (H x W x C) array>, <class>)
+        :param int size: No. of images in the dataset
+        :param int processes: No. of processes to use, defaults to the no. of CPUs
+        :param on_progress: Called with the fraction of images processed, after each chunk of images
+        :param mp_context: ``multiprocessing`` context to start processes with, defaults to the platform's default
+    '''
+    chunks = [(i, min(i + IMAGE_STATS_CHUNK_SIZE, size)) for i in range(0, size, IMAGE_STATS_CHUNK_SIZE)]
+    processes = min(processes or os.cpu_count() or 1, len(chunks))
+    stats = ImageStats()
+
+    # Send dataset to each process once, rather than with each chunk
+    if processes > 1:
+        with (mp_context or multiprocessing).Pool(processes, initializer=_init_process, initargs=(dataset,)) as pool:
+            for chunk_stats in pool.imap(_compute_chunk_stats, chunks):
+                stats.merge(chunk_stats)
+                logger.info('Computed stats of {}/{} images'.format(stats.num_images, size))
+                if on_progress is not None:
+                    on_progress(stats.num_images / size)
+    else:
+        _init_process(dataset)
+        for chunk in chunks:
+            stats.merge(_compute_chunk_stats(chunk))
+            if on_progress is not None:
+                on_progress(stats.num_images / size)
+
+    return stats
+
+
+def compute_image_files_stat(dataset_path, mode='RGB', min_image_size=None, max_image_size=None,
+                             processes=None, on_progress=None) -> dict:
+    '''
+        Computes stats of a zipped dataset of image files, preprocessed with the given options as by ``ImageDataset4Clf``,
+        as a JSON-serializable dict to be persisted in ``Dataset.stat``, along with the options.
+
+        Processes are spawned rather than forked, as this runs on a thread of admin, and a process forked
+        while other threads hold locks (e.g. of logging) can deadlock.
+    '''
+    dataset = ZippedImageFiles(dataset_path, mode=mode, min_image_size=min_image_size, max_image_size=max_image_size)
+    stats = compute_image_stats(dataset, dataset.size, processes=processes, on_progress=on_progress,
+                                mp_context=multiprocessing.get_context('spawn'))
+    return {**make_image_stat_options(mode, min_image_size, max_image_size), **stats.to_json()}
+
+
+_process_dataset = None
+
+
+def _init_process(dataset):
+    global _process_dataset
+    _process_dataset = dataset
+
+
+def _compute_chunk_stats(chunk):
+    (start, end) = chunk
+    stats = ImageStats()
+
+    # Batch consecutive images of the same shape
+    batch = []
+    batch_classes = []
+    for i in range(start, end):
+        (image, image_class) = _process_dataset[i]
+        image = np.asarray(image)
+        image = image.reshape((image.shape[0], image.shape[1], -1))
+        if len(batch) > 0 and (image.shape != batch[0].shape or len(batch) >= IMAGE_STATS_BATCH_SIZE):
+            stats.add_images(np.stack(batch), batch_classes)
+            (batch, batch_classes) = ([], [])
+        batch.append(image)
+        batch_classes.append(image_class)
+
+    if len(batch) > 0:
+        stats.add_images(np.stack(batch), batch_classes)
+
+    return stats
@@ -0,0 +1,194 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import math
+import logging
+import numpy as np
+import torch.utils.data
+
+logger = logging.getLogger(__name__)
+
+
+class SelfPacedSampler(torch.utils.data.Sampler):
+    '''
+        Sampler for self-paced learning (SPL), yielding indices of only the effective samples of a dataset each epoch.
+
+        Each sample has a score, and the effective samples are either those with scores above a threshold
+        (``set_threshold``), or a fraction of samples with the highest scores (``set_fraction``), e.g. as given
+        by a curriculum ``schedule`` for each epoch (see ``linear_schedule`` & ``root_schedule``).
+        Initially, all samples are effective.
+
+        Scores are kept in a float32 array, and updates to scores are buffered, then applied together.
+        Samples are kept sorted by score, so that the effective set is a slice of the sorted samples, found with
+        a binary search when the threshold or fraction changes. When scores change, only the changed samples are
+        re-sorted and merged back into place.
+        As the sampler only yields effective indices, the dataset & DataLoader workers need not be recreated when the
+        effective set changes.
+
+        :param int num_samples: No. of samples in the dataset
+        :param schedule: Called with the epoch number in ``set_epoch``, returning the fraction of samples to use
+        :param float momentum: Weight of a sample's previous score when updating it, for a moving average of scores
+        :param bool shuffle: Whether effective indices are yielded in random order
+        :param int seed: Seed for shuffling, combined with the epoch number
+    '''
+
+    def __init__(self, num_samples, schedule=None, momentum=0.0, shuffle=True, seed=0):
+        self.num_samples = num_samples
+        self.schedule = schedule
+        self.momentum = momentum
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.num_iters = 0  # No. of times the sampler has been iterated through, e.g. by a DataLoader
+        self._scores = np.zeros(num_samples, dtype=np.float32)
+        self._has_score = np.zeros(num_samples, dtype=bool)
+        self._pending_indices = []
+        self._pending_scores = []
+        self._order = np.arange(num_samples)  # Indices of samples by ascending score
+        self._sorted_scores = self._scores.copy()
+        self._changed_indices = []  # Indices of samples whose scores changed since they were last sorted
+        self._threshold = None
+        self._fraction = 1.0
+
+    @property
+    def scores(self) -> np.ndarray:
+        self._apply_pending_scores()
+        return self._scores
+
+    def update_scores(self, indices, scores):
+        '''
+            Updates the scores of samples, e.g. after a training step on them.
+
+            :param indices: Indices of samples in the dataset
+            :param scores: Scores of corresponding samples
+        '''
+        self._pending_indices.append(np.asarray(indices, dtype=np.int64).reshape(-1))
+        self._pending_scores.append(np.asarray(scores, dtype=np.float32).reshape(-1))
+
+    def set_threshold(self, threshold):
+        '''
+            Makes samples with scores above ``threshold`` effective.
+        '''
+        self._threshold = threshold
+        self._fraction = None
+
+    def set_fraction(self, fraction):
+        '''
+            Makes the fraction of samples with the highest scores effective.
+        '''
+        self._fraction = min(max(fraction, 0.0), 1.0)
+        self._threshold = None
+
+    def set_epoch(self, epoch):
+        '''
+            Sets the epoch, for shuffling & the curriculum schedule, before iterating through an epoch.
+        '''
+        self.epoch = epoch
+        if self.schedule is not None:
+            self.set_fraction(self.schedule(epoch))
+
+    def get_effective_indices(self) -> np.ndarray:
+        '''
+            Returns the indices of effective samples, by ascending score.
+        '''
+        self._sort()
+        if self._threshold is not None:
+            start = np.searchsorted(self._sorted_scores, self._threshold, side='right')
+        else:
+            start = self.num_samples - int(round(self._fraction * self.num_samples))
+        return self._order[start:]
+
+    def __iter__(self):
+        self.num_iters += 1
+        indices = self.get_effective_indices()
+        logger.info('Sampling {}/{} effective samples for epoch {}'.format(len(indices), self.num_samples, self.epoch))
+        if self.shuffle:
+            indices = np.random.RandomState(self.seed + self.epoch).permutation(indices)
+        return iter(indices.tolist())
+
+    def __len__(self):
+        return len(self.get_effective_indices())
+
+    def _apply_pending_scores(self):
+        if len(self._pending_indices) == 0:
+            return
+
+        indices = np.concatenate(self._pending_indices)
+        scores = np.concatenate(self._pending_scores)
+        (self._pending_indices, self._pending_scores) = ([], [])
+
+        # For repeated indices, the last score is kept
+        (indices, last) = np.unique(indices[::-1], return_index=True)
+        scores = scores[::-1][last]
+
+        if self.momentum > 0:
+            prev_scores = self._scores[indices]
+            scores = np.where(self._has_score[indices], self.momentum * prev_scores + (1 - self.momentum) * scores, scores)
+
+        self._scores[indices] = scores
+        self._has_score[indices] = True
+        self._changed_indices.append(indices)
+
+    def _sort(self):
+        self._apply_pending_scores()
+        if len(self._changed_indices) == 0:
+            return
+
+        changed = np.unique(np.concatenate(self._changed_indices))
+        self._changed_indices = []
+
+        # If most scores changed, sort all samples, starting from the previous order so that ties keep their order
+        if len(changed) > self.num_samples // 2:
+            order = self._order[np.argsort(self._scores[self._order], kind='mergesort')]
+            self._order = order
+            self._sorted_scores = self._scores[order]
+            return
+
+        # Otherwise, take changed samples out of the sorted samples, sort them, then merge them back in
+        is_changed = np.zeros(self.num_samples, dtype=bool)
+        is_changed[changed] = True
+        to_keep = ~is_changed[self._order]
+        order = self._order[to_keep]
+        sorted_scores = self._sorted_scores[to_keep]
+        changed = changed[np.argsort(self._scores[changed], kind='mergesort')]
+        changed_scores = self._scores[changed]
+        positions = np.searchsorted(sorted_scores, changed_scores, side='right')
+        self._order = np.insert(order, positions, changed)
+        self._sorted_scores = np.insert(sorted_scores, positions, changed_scores)
+
+
+def linear_schedule(start_fraction, num_epochs):
+    '''
+        Curriculum schedule that grows the fraction of samples used linearly from ``start_fraction``
+        to all samples over ``num_epochs`` epochs.
+    '''
+    def schedule(epoch):
+        return min(1.0, start_fraction + (1.0 - start_fraction) * epoch / max(num_epochs, 1))
+    return schedule
+
+
+def root_schedule(start_fraction, num_epochs):
+    '''
+        Curriculum schedule that grows the fraction of samples used from ``start_fraction`` to all samples
+        over ``num_epochs`` epochs, quickly at first, as the square root of the epoch.
+    '''
+    def schedule(epoch):
+        progress = min(1.0, epoch / max(num_epochs, 1))
+        return math.sqrt(start_fraction ** 2 + (1.0 - start_fraction ** 2) * progress)
+    return schedule
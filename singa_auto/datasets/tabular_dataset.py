@@ -0,0 +1,195 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import os
+import json
+import logging
+from typing import List
+import numpy as np
+import pandas
+
+from singa_auto.datasets.cache_utils import get_or_build_cache, get_dataset_cache_key
+
+logger = logging.getLogger(__name__)
+
+TABULAR_CHUNK_ROWS = 100000  # No. of rows of the CSV parsed at a time when converting it
+
+
+class TabularDataset:
+    '''
+        Tabular dataset in a node-local, columnar format, converted once from a CSV file.
+
+        Each column is stored as its own typed numpy array, read through a memory map only when the column is accessed.
+        Categorical (i.e. non-numeric) columns are stored dictionary-encoded, as codes into their sorted categories,
+        with -1 for missing values. The codes are the same as those of ``<column>.astype('category').cat.codes`` on the
+        column as read by ``pandas.read_csv``.
+
+        ``columns`` is the list of column names, and ``size`` is the number of rows.
+    '''
+    '''
+        Internally, organises data into this layout in the cache directory:
+
+        <key>/meta.json             | { size, index_col, columns: [{ name, kind: numeric|categorical, categories }] }
+        <key>/<i>.npy               | Values of the i-th column, or codes if categorical
+    '''
+
+    def __init__(self, cache_path):
+        self._cache_path = cache_path
+        with open(os.path.join(cache_path, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        self.size = meta['size']
+        self._index_col = meta['index_col']
+        self._column_metas = {x['name']: dict(x, index=i) for (i, x) in enumerate(meta['columns'])}
+        self.columns = [x['name'] for x in meta['columns'] if x['name'] != self._index_col]
+
+    def __len__(self):
+        return self.size
+
+    def is_categorical(self, column) -> bool:
+        return self._column_metas[column]['kind'] == 'categorical'
+
+    def get_categories(self, column) -> list:
+        '''
+            Returns the sorted categories of a categorical column.
+        '''
+        return self._column_metas[column]['categories']
+
+    def get_encoding(self, column) -> dict:
+        '''
+            Returns the mapping of each category of a categorical column to its code.
+        '''
+        return {cat: code for (code, cat) in enumerate(self.get_categories(column))}
+
+    def get_column(self, column) -> np.ndarray:
+        '''
+            Returns the values of a column as a read-only, memory-mapped array, or its codes if it is categorical.
+        '''
+        column_meta = self._column_metas[column]
+        return np.load(os.path.join(self._cache_path, '{}.npy'.format(column_meta['index'])), mmap_mode='r')
+
+    def to_dataframe(self, columns: List[str] = None, encode_categoricals=False) -> pandas.DataFrame:
+        '''
+            Reads columns into a ``pandas.DataFrame``.
+
+            :param columns: Names of the columns to read, in order; defaults to all columns
+            :param bool encode_categoricals: Whether categorical columns are returned as codes (with NaN for missing values)
+                rather than as their categories
+        '''
+        columns = self.columns if columns is None else columns
+        data = {}
+        for column in columns:
+            values = self.get_column(column)
+            if self.is_categorical(column):
+                values = self._encode(values) if encode_categoricals else self._decode(column, values)
+            data[column] = values
+
+        index = None
+        if self._index_col is not None:
+            index = pandas.Index(self._decode_column(self._index_col), name=self._index_col)
+
+        return pandas.DataFrame(data, columns=columns, index=index)
+
+    def _decode_column(self, column):
+        values = self.get_column(column)
+        return self._decode(column, values) if self.is_categorical(column) else values
+
+    def _decode(self, column, codes):
+        # Code -1 (missing value) maps to the last element, NaN
+        categories = np.array(self.get_categories(column) + [np.nan], dtype=object)
+        return categories[codes]
+
+    def _encode(self, codes):
+        if (codes < 0).any():
+            return np.where(codes < 0, np.nan, codes)
+        return np.array(codes)
+
+    @staticmethod
+    def get_or_build(dataset_path, index_col=None) -> 'TabularDataset':
+        '''
+            Gets the columnar format of a CSV file, converting the file if it isn't yet converted on this node.
+
+            :param str dataset_path: Path to the CSV file
+            :param index_col: Column to use as the index of the dataframes read, as for ``pandas.read_csv``
+        '''
+        cache_key = ('tabular', *get_dataset_cache_key(dataset_path, index_col))
+        cache_path = get_or_build_cache(cache_key, lambda tmp_path: _convert_csv(dataset_path, index_col, tmp_path))
+        return TabularDataset(cache_path)
+
+
+def _convert_csv(csv_path, index_col, cache_path):
+    column_names = None
+    column_chunks = None
+    categories = None  # For each categorical column, map of category to code, in order of appearance
+
+    # Parse CSV in chunks, dictionary-encoding columns of strings as they are read
+    for df in pandas.read_csv(csv_path, chunksize=TABULAR_CHUNK_ROWS):
+        if column_names is None:
+            column_names = [str(x) for x in df.columns]
+            column_chunks = [[] for _ in column_names]
+            categories = [None for _ in column_names]
+
+        for (i, column) in enumerate(df.columns):
+            values = df[column]
+            if not pandas.api.types.is_numeric_dtype(values) and categories[i] is None:
+                # Column turns out to be categorical, so previous chunks are encoded as strings
+                categories[i] = {}
+                column_chunks[i] = [_encode_chunk(x.astype(object), categories[i]) for x in column_chunks[i]]
+
+            if categories[i] is not None:
+                column_chunks[i].append(_encode_chunk(values, categories[i]))
+            else:
+                column_chunks[i].append(values.values)
+
+    if column_names is None:
+        raise ValueError('CSV file "{}" has no columns'.format(csv_path))
+    if index_col is not None and not isinstance(index_col, str):
+        index_col = column_names[index_col]
+
+    size = 0
+    column_metas = []
+    for (i, name) in enumerate(column_names):
+        values = np.concatenate(column_chunks[i]) if column_chunks[i] else np.empty(0)
+        column_chunks[i] = None
+        size = len(values)
+
+        if categories[i] is not None:
+            # Re-map codes so that categories are sorted
+            sorted_categories = sorted(categories[i].keys())
+            remap = np.empty(len(sorted_categories) + 1, dtype=np.int32)
+            remap[[categories[i][x] for x in sorted_categories]] = np.arange(len(sorted_categories), dtype=np.int32)
+            remap[-1] = -1
+            values = remap[values]
+            column_metas.append({'name': name, 'kind': 'categorical', 'categories': sorted_categories})
+        else:
+            column_metas.append({'name': name, 'kind': 'numeric'})
+
+        np.save(os.path.join(cache_path, '{}.npy'.format(i)), values)
+
+    with open(os.path.join(cache_path, 'meta.json'), 'w') as f:
+        json.dump({'size': size, 'index_col': index_col, 'columns': column_metas}, f)
+
+
+def _encode_chunk(values, categories):
+    # Encodes values as codes into ``categories``, adding new categories; missing values are -1
+    (codes, uniques) = pandas.factorize(values)
+    unique_codes = np.empty(len(uniques) + 1, dtype=np.int32)
+    for (j, value) in enumerate(uniques):
+        unique_codes[j] = categories.setdefault(str(value), len(categories))
+    unique_codes[-1] = -1
+    return unique_codes[codes]
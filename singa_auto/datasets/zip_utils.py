@@ -0,0 +1,95 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import os
+import mmap
+import zlib
+import struct
+import zipfile
+
+
+class ZipMemberReader:
+    '''
+        Reads members of a zip file from a memory map of it, without extracting them to disk.
+
+        The zip's central directory is only parsed once, when the reader is created.
+        Each process (e.g. each DataLoader worker) lazily maps the file on its first read, so that processes never share
+        a file handle. The reader can be pickled to be sent to other processes.
+
+        :param str zip_path: Path to the zip file
+    '''
+
+    def __init__(self, zip_path: str):
+        self.zip_path = zip_path
+        with zipfile.ZipFile(zip_path, 'r') as zip_file:
+            self._infos = {x.filename: x for x in zip_file.infolist()}
+        self._mmap = None
+        self._mmap_pid = None  # Process that mapped the file
+
+    def namelist(self):
+        return list(self._infos.keys())
+
+    def read(self, name: str) -> bytes:
+        '''
+            Reads the uncompressed bytes of a member, verifying its CRC.
+        '''
+        info = self._infos[name]
+
+        # Only stored & deflated members (i.e. nearly all zips) are read from the memory map
+        if info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED) or info.flag_bits & 0x1:
+            with zipfile.ZipFile(self.zip_path, 'r') as zip_file:
+                return zip_file.read(info)
+
+        buffer = self._get_mmap()
+        offset = info.header_offset
+        file_header = struct.unpack(zipfile.structFileHeader, buffer[offset:offset + zipfile.sizeFileHeader])
+        if file_header[zipfile._FH_SIGNATURE] != zipfile.stringFileHeader:
+            raise zipfile.BadZipFile('Bad magic number for file header of "{}"'.format(name))
+
+        data_start = offset + zipfile.sizeFileHeader + file_header[zipfile._FH_FILENAME_LENGTH] + \
+            file_header[zipfile._FH_EXTRA_FIELD_LENGTH]
+        data = buffer[data_start:data_start + info.compress_size]
+        if info.compress_type == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -zlib.MAX_WBITS)
+
+        if zlib.crc32(data) != info.CRC:
+            raise zipfile.BadZipFile('Bad CRC-32 for file "{}"'.format(name))
+
+        return data
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = None
+        self._mmap_pid = None
+
+    def _get_mmap(self):
+        # Map file again in a new process
+        if self._mmap is None or self._mmap_pid != os.getpid():
+            with open(self.zip_path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mmap_pid = os.getpid()
+
+        return self._mmap
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_mmap'] = None
+        state['_mmap_pid'] = None
+        return state
@@ -174,6 +174,10 @@ class InvalidDAGException(SingaAutoBaseException):
     def __init__(self, message="Invalid DAG error."):
         super(InvalidDAGException, self).__init__(error_code=8034, message=message) 
 
+class PredictionTimeoutError(SingaAutoBaseException):
+    def __init__(self, message="Prediction timed out."):
+        super(PredictionTimeoutError, self).__init__(error_code=8035, message=message)
+
 mapError = {
     0: ResultSuccess,
     500: SystemInternalError,
@@ -211,7 +215,8 @@ mapError = {
     8031: TokenError,
     8032: ServiceRequestError,
     8033: InvalidDatasetFormatException,
-    8034: InvalidDAGException
+    8034: InvalidDAGException,
+    8035: PredictionTimeoutError
 }
 
 def generate_error(error_code):
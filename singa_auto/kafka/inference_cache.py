@@ -19,13 +19,16 @@
 
 import os
 import time
+import threading
 import traceback
+from collections import namedtuple
 
 from kafka import KafkaConsumer
 from kafka import KafkaProducer
 from kafka.errors import KafkaError
 from kafka import TopicPartition
 import pickle
+import uuid
 import logging
 from typing import Union, List
 
@@ -42,20 +45,75 @@ API_VERSION = (0, 10, 1)
 class InferenceCache(object):
     '''
     Caches queries & predictions to facilitate communication between predictor & inference workers.
+
+    Predictions for queries with a ``reply_to`` channel are sent to that channel, which its predictor
+    reads from with a single long-lived consumer. Otherwise, each prediction is sent to a topic of its own.
+
+    If ``hosts`` is None, Kafka is mocked with an in-process broker.
     '''
 
     def __init__(self,
                  hosts=os.environ.get('KAFKA_HOST', 'localhost'),
                  ports=os.environ.get('KAFKA_PORT', 9092)):
-        hostlist = hosts.split(',')
-        portlist = ports.split(',')
-        self.connection_url = [
-            f'{host}:{port}' for host, port in zip(hostlist, portlist)
+        if hosts is not None:
+            hostlist = hosts.split(',')
+            portlist = str(ports).split(',')
+            self.connection_url = [
+                f'{host}:{port}' for host, port in zip(hostlist, portlist)
+            ]
+        else:
+            self.connection_url = None
+        self.producer = self._make_producer()
+        self._reply_consumers = {}  # { <channel>: <consumer> }
+        self._query_consumers = {}  # { <worker_id>: <consumer> }
+
+    ####################################
+    # Predictor
+    ####################################
+
+    def make_reply_channel(self, name: str) -> str:
+        '''
+            Creates a channel for predictions to be replied to, and starts consuming from it.
+            Pass the channel as ``reply_to`` of queries, and take their predictions with ``take_replies``.
+        '''
+        channel = f'{name}_{uuid.uuid4()}_predictions'
+
+        # Channel is unique, so all of its messages are for this consumer
+        self._reply_consumers[channel] = self._make_consumer(channel, auto_offset_reset='earliest')
+        logger.info(f'Created reply channel "{channel}"')
+        return channel
+
+    def take_replies(self, channel: str, timeout_secs: float) -> List[Prediction]:
+        '''
+            Takes predictions sent to a reply channel, waiting up to ``timeout_secs`` for any to arrive.
+        '''
+        consumer = self._reply_consumers[channel]
+        records = consumer.poll(timeout_ms=int(timeout_secs * 1000))
+        return [
+            pickle.loads(record.value)
+            for partition_records in records.values()
+            for record in partition_records
         ]
-        self.producer = KafkaProducer(api_version=API_VERSION,
-                                      bootstrap_servers=self.connection_url,
-                                      max_request_size=134217728,
-                                      buffer_memory=134217728)
+
+    def close_reply_channel(self, channel: str):
+        consumer = self._reply_consumers.pop(channel)
+        consumer.close()
+
+    ####################################
+    # Inference Worker
+    ####################################
+
+    def add_replies(self, channel: str, predictions: List[Prediction]):
+        '''
+            Sends predictions to the reply channel of their queries.
+        '''
+        logger.info(
+            f'Adding {len(predictions)} prediction(s) to channel "{channel}"')
+
+        key = channel.encode('utf-8')
+        for prediction in predictions:
+            self.producer.send(channel, key=key, value=pickle.dumps(prediction))
+        self.producer.flush()
 
     def add_predictions_for_worker(self, worker_id: str,
                                    predictions: List[Prediction]):
@@ -66,16 +124,14 @@ class InferenceCache(object):
             name = f'workers_{worker_id}_{prediction.query_id}_prediction'
             prediction = pickle.dumps(prediction)
             self.producer.send(name, key=name.encode('utf-8'), value=prediction)
-            self.producer.flush()
+        self.producer.flush()
 
     def take_prediction_for_worker(self, worker_id: str,
                                    query_id: str) -> Union[Prediction, None]:
         name = f'workers_{worker_id}_{query_id}_prediction'
 
-        prediction_consumer = KafkaConsumer(
+        prediction_consumer = self._make_consumer(
             name,
-            api_version=API_VERSION,
-            bootstrap_servers=self.connection_url,
             auto_offset_reset='earliest',
             group_id=PREDICTIONS_QUEUE)
         prediction = None
@@ -97,20 +153,50 @@ class InferenceCache(object):
             f'Adding {len(queries)} querie(s) for worker "{worker_id}"...')
         for query in queries:
             self.producer.send(name, key=name.encode('utf-8'), value=query)
-            self.producer.flush()
+        self.producer.flush()
 
     def pop_queries_for_worker(self, worker_id: str,
-                               batch_size: int) -> List[Query]:
-        name = f'workers_{worker_id}_queries'
+                               batch_size: int,
+                               timeout_secs: float = 0) -> List[Query]:
+        '''
+            Pops up to ``batch_size`` queries for the worker, waiting up to ``timeout_secs`` for any to arrive.
+            The worker's consumer is kept open across calls.
+        '''
+        query_consumer = self._get_query_consumer(worker_id)
+        try:
+            records = query_consumer.poll(timeout_ms=int(timeout_secs * 1000),
+                                          max_records=batch_size)
+            queries = [
+                record.value
+                for partition_records in records.values()
+                for record in partition_records
+            ]
+            if len(queries) > 0:
+                query_consumer.commit()
+        except KafkaError:
+            logger.error('Error while popping queries:')
+            logger.error(traceback.format_exc())
+            return []
 
+        queries = [pickle.loads(x) for x in queries]
+        if len(queries) > 0:
+            logger.info(
+                f'Popped {len(queries)} querie(s) for worker "{worker_id}"')
+        return queries
+
+    def _get_query_consumer(self, worker_id: str):
+        query_consumer = self._query_consumers.get(worker_id)
+        if query_consumer is not None:
+            return query_consumer
+
+        name = f'workers_{worker_id}_queries'
         RETRY_TIMES = 4
         while True:
             try:
-                query_consumer = KafkaConsumer(name,
-                                               api_version=API_VERSION,
-                                               bootstrap_servers=self.connection_url,
-                                               auto_offset_reset='earliest',
-                                               group_id=QUERIES_QUEUE)
+                query_consumer = self._make_consumer(name,
+                                                     auto_offset_reset='earliest',
+                                                     enable_auto_commit=False,
+                                                     group_id=QUERIES_QUEUE)
                 break
             except Exception as e:
                 logger.error('Kafka conn Error, retry: {}'.format(RETRY_TIMES))
@@ -120,32 +206,120 @@ class InferenceCache(object):
                 if RETRY_TIMES <= 0:
                     raise
 
-        partition = TopicPartition(name, 0)
-        partitiondic = query_consumer.end_offsets([partition])
-        offsetend = partitiondic.get(partition, None)
-        if offsetend == 0:
-            query_consumer.close()
-            return []
-        try:
-            queries = []
-            while True:
-                record = next(query_consumer)
-                queries.append(record.value)
-                query_consumer.commit()
-                if record.offset >= offsetend - 1 or len(queries) == batch_size:
-                    break
+        self._query_consumers[worker_id] = query_consumer
+        return query_consumer
 
-            queries = [pickle.loads(x) for x in queries]
-            query_consumer.close()
-            return queries
-        except KafkaError:
-            query_consumer.close()
-            return []
+    def _make_producer(self):
+        if self.connection_url is None:
+            return MockKafkaProducer()
+
+        return KafkaProducer(api_version=API_VERSION,
+                             bootstrap_servers=self.connection_url,
+                             max_request_size=134217728,
+                             buffer_memory=134217728)
+
+    def _make_consumer(self, *topics, **kwargs):
+        if self.connection_url is None:
+            return MockKafkaConsumer(*topics, **kwargs)
+
+        return KafkaConsumer(*topics,
+                             api_version=API_VERSION,
+                             bootstrap_servers=self.connection_url,
+                             **kwargs)
 
     def __del__(self):
+        for consumer in self._reply_consumers.values():
+            consumer.close()
+        for consumer in self._query_consumers.values():
+            consumer.close()
         self.producer.close()
 
 
+MockRecord = namedtuple('MockRecord', ['topic', 'partition', 'offset', 'key', 'value'])
+
+
+class MockKafkaBroker():
+    '''
+        In-process broker shared by mock producers & consumers, with a single partition per topic.
+    '''
+    topics = {}  # { <topic>: [<record>] }
+    group_offsets = {}  # { (<group_id>, <topic>): <committed offset> }
+    cond = threading.Condition()  # Notified on each new record
+
+
+class MockKafkaProducer():
+
+    def send(self, topic, key=None, value=None):
+        with MockKafkaBroker.cond:
+            records = MockKafkaBroker.topics.setdefault(topic, [])
+            records.append(MockRecord(topic, 0, len(records), key, value))
+            MockKafkaBroker.cond.notify_all()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class MockKafkaConsumer():
+
+    def __init__(self, *topics, group_id=None, auto_offset_reset='latest', **kwargs):
+        self._group_id = group_id
+        self._positions = {}  # { <topic>: <offset of next record> }
+        with MockKafkaBroker.cond:
+            for topic in topics:
+                committed = MockKafkaBroker.group_offsets.get((group_id, topic))
+                if committed is not None and group_id is not None:
+                    self._positions[topic] = committed
+                elif auto_offset_reset == 'earliest':
+                    self._positions[topic] = 0
+                else:
+                    self._positions[topic] = len(MockKafkaBroker.topics.get(topic, []))
+
+    def poll(self, timeout_ms=0, max_records=None):
+        deadline = time.monotonic() + timeout_ms / 1000
+        with MockKafkaBroker.cond:
+            while True:
+                records = self._take_records(max_records)
+                remaining_secs = deadline - time.monotonic()
+                if len(records) > 0 or remaining_secs <= 0:
+                    return records
+                MockKafkaBroker.cond.wait(remaining_secs)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # Blocks until a record is available
+        while True:
+            records = self.poll(timeout_ms=1000, max_records=1)
+            for partition_records in records.values():
+                return partition_records[0]
+
+    def commit(self):
+        if self._group_id is None:
+            return
+        with MockKafkaBroker.cond:
+            for (topic, position) in self._positions.items():
+                MockKafkaBroker.group_offsets[(self._group_id, topic)] = position
+
+    def close(self):
+        pass
+
+    # Must be called while holding the broker's condition
+    def _take_records(self, max_records):
+        records = {}
+        for (topic, position) in self._positions.items():
+            topic_records = MockKafkaBroker.topics.get(topic, [])[position:]
+            if max_records is not None:
+                topic_records = topic_records[:max_records - sum(len(x) for x in records.values())]
+            if len(topic_records) > 0:
+                records[TopicPartition(topic, 0)] = topic_records
+                self._positions[topic] = position + len(topic_records)
+        return records
+
+
 def testquery():
     batch_size = 10
     worker_id = 10001
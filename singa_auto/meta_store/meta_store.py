@@ -23,7 +23,7 @@ from sqlalchemy import create_engine, distinct, or_
 from sqlalchemy.orm import sessionmaker
 
 from singa_auto.constants import TrainJobStatus, UserType, \
-    TrialStatus, ServiceStatus, InferenceJobStatus, ModelAccessRight
+    TrialStatus, ServiceStatus, InferenceJobStatus, ModelAccessRight, DatasetStatStatus
 
 from singa_auto.meta_store.schema import Base, TrainJob, SubTrainJob, TrainJobWorker, \
     InferenceJob, Trial, Model, User, Service, InferenceJobWorker, \
@@ -129,6 +129,36 @@ class MetaStore(object):
         datasets = query.all()
         return datasets
 
+    def get_all_datasets(self):
+        datasets = self._session.query(Dataset).all()
+        return datasets
+
+    def update_dataset_stat(self, dataset, stat):
+        dataset.stat = stat
+        self._session.add(dataset)
+        return dataset
+
+    def claim_dataset_stat_job(self, dataset, job_id):
+        '''
+            Atomically replaces the ID of the job computing a dataset's stats with ``job_id``, if that job is still
+            running and is the one last read in ``dataset.stat``. Returns whether it was replaced.
+            The dataset's row stays locked until the next commit.
+        '''
+        prev_job_id = (dataset.stat or {}).get('job_id')
+        dataset = self._session.query(Dataset) \
+            .filter(Dataset.id == dataset.id) \
+            .populate_existing() \
+            .with_for_update() \
+            .first()
+
+        stat = (dataset.stat if dataset is not None else None) or {}
+        if stat.get('status') != DatasetStatStatus.RUNNING or stat.get('job_id') != prev_job_id:
+            return False
+
+        dataset.stat = {**stat, 'job_id': job_id}
+        self._session.add(dataset)
+        return True
+
     ####################################
     # Train Jobs
     ####################################
@@ -599,6 +629,11 @@ class MetaStore(object):
         self._session.add(trial)
         return trial
 
+    def get_store_params_ids(self):
+        rows = self._session.query(distinct(Trial.store_params_id)) \
+            .filter(Trial.store_params_id.isnot(None)).all()
+        return set(x[0] for x in rows)
+
     def add_trial_log(self, trial, line, level):
         trial_log = TrialLog(trial_id=trial.id, line=line, level=level)
         self._session.add(trial_log)
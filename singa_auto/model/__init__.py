@@ -23,7 +23,8 @@ from .object_detection import ObjtDetModel
 from .post_tagging import PosTagModel
 from .tabular_classification import TabularClfModel
 from .log import LoggerUtils
+from .trial import TrialUtils
 from .utils import utils, logger, dataset, load_model_class, parse_model_install_command, \
                     serialize_knob_config, deserialize_knob_config
 from .knob import BaseKnob, CategoricalKnob, IntegerKnob, FloatKnob, FixedKnob, ArchKnob, \
-                    KnobValue, CategoricalValue, PolicyKnob
+                    KnobValue, CategoricalValue, PolicyKnob, ResourceKnob
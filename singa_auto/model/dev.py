@@ -35,6 +35,8 @@ from singa_auto.redis import ParamCache, TrainCache, InferenceCache
 from .model import BaseModel, BaseKnob, Params
 from .utils import serialize_knob_config, deserialize_knob_config, parse_model_install_command, load_model_class
 
+LOCAL_WAIT_SECS = 1  # Max time to wait for a proposal or result, which are always already available when tuning locally
+
 
 def tune_model(
         py_model_class: Type[BaseModel],
@@ -89,13 +91,14 @@ def tune_model(
     while True:
         trial_no += 1
 
-        # Advisor checks free workers
-        worker_ids = train_cache.get_workers()
-        assert worker_id in worker_ids
+        # Advisor receives result of worker's previous trial, if any, and worker is free
+        (results, _) = train_cache.take_results(LOCAL_WAIT_SECS)
+        assert [x for (x, _) in results] == [worker_id]
 
-        # Advisor checks worker doesn't already have a proposal
-        proposal = train_cache.get_proposal(worker_id)
-        assert proposal is None
+        # Advisor ingests feedback
+        for (_, result) in results:
+            if result is not None:
+                advisor.feedback(worker_id, result)
 
         # Advisor sends a proposal to worker
         # Overriding knobs from args
@@ -107,7 +110,7 @@ def tune_model(
         train_cache.create_proposal(worker_id, proposal)
 
         # Worker receives proposal
-        proposal = train_cache.get_proposal(worker_id)
+        proposal = train_cache.wait_for_proposal(worker_id, LOCAL_WAIT_SECS)
         assert proposal is not None
 
         # Worker starts trial
@@ -167,14 +170,7 @@ def tune_model(
 
         # Worker sends result to advisor
         print('Giving feedback to advisor...')
-        train_cache.create_result(worker_id, result)
-        train_cache.delete_proposal(worker_id)
-
-        # Advisor receives result
-        # Advisor ingests feedback
-        result = train_cache.take_result(worker_id)
-        assert result is not None
-        advisor.feedback(worker_id, result)
+        train_cache.submit_result(worker_id, result)
 
         # Destroy model
         model_inst.destroy()
@@ -184,6 +180,7 @@ def tune_model(
 
     # Train worker tells advisor that it is no longer free
     train_cache.delete_worker(worker_id)
+    train_cache.clear_all()
 
     # Declare best model
     if best_proposal is not None:
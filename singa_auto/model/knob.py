@@ -153,6 +153,45 @@ class PolicyKnob(BaseKnob):
         return self._policy
 
 
+class ResourceKnob(BaseKnob):
+    '''
+    Knob type representing the amount of resource a model should train with in a trial, e.g. its no. of epochs,
+    within [``value_min``, ``value_max``], as an ``int`` or ``float``.
+    Offering this knob allows SINGA-Auto to tune the model with successive halving, training many configurations of knobs
+    with little resource and only the best-scoring ones with more resource. When resource is not tuned, it is realised as ``value_max``.
+
+    Refer to :ref:`tuning-with-asha` to understand how to use this knob type.
+    '''
+
+    def __init__(self, value_min: Union[int, float], value_max: Union[int, float]):
+        self._validate_values(value_min, value_max)
+        self._value_min = value_min
+        self._value_max = value_max
+
+    @property
+    def value_type(self):
+        return type(self._value_max)
+
+    @property
+    def value_min(self) -> Union[int, float]:
+        return self._value_min
+
+    @property
+    def value_max(self) -> Union[int, float]:
+        return self._value_max
+
+    @staticmethod
+    def _validate_values(value_min, value_max):
+        if type(value_min) not in (int, float) or type(value_min) is not type(value_max):
+            raise ValueError('`value_min` and `value_max` should both be an `int` or both be a `float`')
+
+        if value_min <= 0:
+            raise ValueError('`value_min` should be positive')
+
+        if value_min > value_max:
+            raise ValueError('`value_max` should be at least `value_min`')
+
+
 class IntegerKnob(BaseKnob):
     '''
     Knob type representing an ``int`` value within a specific interval [``value_min``, ``value_max``].
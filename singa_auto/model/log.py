@@ -111,6 +111,8 @@ class LoggerUtils():
 
         To visualize logged metrics on plots, a plot must be defined via :meth:`singa_auto.model.LoggerUtils.define_plot`.
 
+        Logged metrics are also reported to SINGA-Auto's tuning advisor, which can decide to stop the trial early (see :class:`singa_auto.model.TrialUtils`).
+
         Only call this method in :meth:`singa_auto.model.BaseModel.train` and :meth:`singa_auto.model.BaseModel.evaluate`.
 
         :param str msg: Message to be logged
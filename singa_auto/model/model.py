@@ -140,6 +140,9 @@ class BaseModel(abc.ABC):
         *This model instance's initialized knob values will match those during training*.
 
         Subsequently, the model is considered *trained*.
+
+        ``params`` may be a read-only, dict-like mapping whose arrays are memory-mapped from storage.
+        Copy arrays before modifying them in place.
         '''
         raise NotImplementedError()
 
@@ -0,0 +1,71 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+
+class TrialUtils():
+    '''
+    Allows models to be controlled by SINGA-Auto during the trial they are being trained in.
+
+    While a model trains on SINGA-Auto, metrics logged with :meth:`singa_auto.model.LoggerUtils.log`
+    are reported to SINGA-Auto's tuning advisor as intermediate results of the trial. Where the advisor decides that the trial
+    is hopeless compared to other trials, e.g. its ``score`` or ``loss`` so far is worse than the median of other trials' at the same ``epoch``,
+    the model is asked to stop training early.
+
+    This should NOT be initialized outside of the module. Instead,
+    import the global ``utils`` instance from the module ``singa_auto.model``
+    and use ``utils.trial``.
+
+    For example:
+
+    ::
+
+        from singa_auto.model import utils
+        ...
+        def train(self, dataset_path, **kwargs):
+            ...
+            for epoch in range(epochs):
+                ...
+                utils.logger.log(loss=loss, epoch=epoch)
+                if utils.trial.should_stop():
+                    utils.logger.log('Stopping training early...')
+                    break
+            ...
+
+    '''
+
+    def __init__(self):
+        self._should_stop = None
+
+    def should_stop(self) -> bool:
+        '''
+        Returns whether the model should stop training early, e.g. checked after each epoch in :meth:`singa_auto.model.BaseModel.train`.
+        The model should still be able to be evaluated & have its parameters dumped after stopping early.
+
+        Always returns ``False`` when the model is not being trained on SINGA-Auto.
+        '''
+        if self._should_stop is None:
+            return False
+
+        return self._should_stop()
+
+    # - INTERNAL METHOD -
+    # Set the check of whether the model should stop training early.
+    # During model training, this method will be called by SINGA-Auto to inject the check for an instance of model training.
+    def set_should_stop(self, should_stop):
+        self._should_stop = should_stop
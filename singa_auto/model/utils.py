@@ -34,6 +34,7 @@ from ..datasets import DatasetUtils
 
 
 from .log import LoggerUtils
+from .trial import TrialUtils
 from singa_auto.error_code import InvalidModelClassError
 
 
@@ -186,6 +187,7 @@ class ModelUtils():
         self._trial_id = None
         self.dataset = DatasetUtils()
         self.logger = LoggerUtils()
+        self.trial = TrialUtils()
 
 
 # Initialize a global instance
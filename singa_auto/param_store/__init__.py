@@ -17,5 +17,6 @@
 # under the License.
 #
 
-from .param_store import ParamStore
-from .file import FileParamStore
\ No newline at end of file
+from .param_store import ParamStore, ParamStoreType, make_param_store
+from .file import FileParamStore
+from .content_addressed import ContentAddressedParamStore
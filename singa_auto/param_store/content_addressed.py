@@ -0,0 +1,275 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import os
+import uuid
+import time
+import fcntl
+import hashlib
+import logging
+import traceback
+from contextlib import contextmanager
+import msgpack
+import numpy as np
+
+from singa_auto.error_code import InvalidParamsError, InvalidParamsFormatError
+
+from .param_store import ParamStore, Params
+from .file import FileParamStore
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE_EXT = 'manifest'
+PARAMS_GC_MIN_AGE_SECS = 60 * 60  # Min age of unused params before they are deleted by garbage collection
+
+
+class ContentAddressedParamStore(ParamStore):
+    '''
+        Stores parameters in the local filesystem, keeping each unique array only once.
+
+        Each array is stored under the hash of its content, and each set of parameters is stored as a manifest
+        pointing to the hashes of its arrays. Arrays are reference-counted across manifests,
+        and are removed once no manifest points to them.
+
+        Parameters saved by ``FileParamStore`` in the same directory can also be loaded.
+    '''
+    '''
+        Internally, organises data into this layout in the params directory:
+
+        manifests/<params_id>       | Manifest: { arrays: [{ name, hash, dtype, shape }], values: { <name>: <value> } }
+        tensors/<xx>/<hash>         | Raw buffer of array with content hash <hash>, where <xx> is its first 2 characters
+        tensors/<xx>/<hash>.refs    | No. of manifest entries pointing to the array
+        .lock                       | Lock file guarding reference counts across processes
+    '''
+
+    def __init__(self, params_dir=None, model_class=''):
+        self._params_dir = params_dir or os.path.join(
+            os.environ['WORKDIR_PATH'], os.environ['PARAMS_DIR_PATH'])
+        self.model_class = model_class
+        self._manifests_dir = os.path.join(self._params_dir, 'manifests')
+        self._tensors_dir = os.path.join(self._params_dir, 'tensors')
+        self._lock_file_path = os.path.join(self._params_dir, '.lock')
+        self._file_param_store = FileParamStore(self._params_dir)
+
+    def save(self, params: Params):
+        (manifest, arrays) = self._make_manifest(params)
+        params_id = '{}_{}.{}'.format(self.model_class, uuid.uuid4(), MANIFEST_FILE_EXT)
+
+        # Write arrays not yet in store to temp files first, outside of the lock
+        tmp_file_paths = {}
+        new_bytes = 0
+        for (array_meta, value) in zip(manifest['arrays'], arrays):
+            tensor_hash = array_meta['hash']
+            if tensor_hash in tmp_file_paths or os.path.exists(self._get_tensor_path(tensor_hash)):
+                continue
+            tmp_file_paths[tensor_hash] = self._write_tmp_tensor(tensor_hash, value)
+
+        try:
+            with self._lock():
+                # Take a reference to each array, moving its temp file into place if the array is (still) missing
+                for (array_meta, value) in zip(manifest['arrays'], arrays):
+                    tensor_hash = array_meta['hash']
+                    tensor_path = self._get_tensor_path(tensor_hash)
+                    if not os.path.exists(tensor_path):
+                        tmp_file_path = tmp_file_paths.pop(tensor_hash, None) or \
+                            self._write_tmp_tensor(tensor_hash, value)
+                        os.replace(tmp_file_path, tensor_path)
+                        new_bytes += value.nbytes
+                    self._add_ref(tensor_hash, 1)
+
+                self._write_manifest(params_id, manifest)
+        finally:
+            for tmp_file_path in tmp_file_paths.values():
+                os.remove(tmp_file_path)
+
+        logger.info('Saved params "{}" with {} array(s), writing {} new bytes'.format(
+            params_id, len(arrays), new_bytes))
+
+        return params_id
+
+    def load(self, params_id, mmap=False):
+        # Params not saved as a manifest are in the plain file format
+        if not params_id.endswith('.{}'.format(MANIFEST_FILE_EXT)):
+            return self._file_param_store.load(params_id, mmap=mmap)
+
+        manifest = self._read_manifest(params_id)
+        params = dict(manifest['values'])
+        for array_meta in manifest['arrays']:
+            params[array_meta['name']] = self._read_tensor(array_meta, mmap)
+
+        return params
+
+    def delete(self, params_id):
+        if not params_id.endswith('.{}'.format(MANIFEST_FILE_EXT)):
+            self._file_param_store.delete(params_id)
+            return
+
+        with self._lock():
+            manifest = self._read_manifest(params_id)
+            os.remove(self._get_manifest_path(params_id))
+
+            # Release references to arrays, freeing arrays that are no longer referenced
+            for array_meta in manifest['arrays']:
+                tensor_hash = array_meta['hash']
+                if self._add_ref(tensor_hash, -1) <= 0:
+                    logger.info('Freeing array "{}"...'.format(tensor_hash))
+                    os.remove(self._get_tensor_path(tensor_hash))
+                    os.remove(self._get_refs_path(tensor_hash))
+
+    def collect_garbage(self, used_params_ids, min_age_secs=PARAMS_GC_MIN_AGE_SECS):
+        if not os.path.exists(self._manifests_dir):
+            return 0
+
+        used_params_ids = set(used_params_ids)
+        min_mtime = time.time() - min_age_secs
+        count = 0
+        for params_id in os.listdir(self._manifests_dir):
+            if not params_id.endswith('.{}'.format(MANIFEST_FILE_EXT)) or params_id in used_params_ids:
+                continue
+
+            # Keep recently saved params, which might not be referenced yet
+            try:
+                if os.path.getmtime(self._get_manifest_path(params_id)) > min_mtime:
+                    continue
+                self.delete(params_id)
+                count += 1
+            except (OSError, InvalidParamsError):
+                # Deleted concurrently
+                continue
+
+        logger.info('Deleted {} unused params'.format(count))
+        return count
+
+    def get_ref_count(self, tensor_hash) -> int:
+        '''
+            Returns the no. of manifest entries pointing to the array with hash ``tensor_hash``.
+        '''
+        refs_path = self._get_refs_path(tensor_hash)
+        if not os.path.exists(refs_path):
+            return 0
+
+        with open(refs_path, 'r') as f:
+            return int(f.read() or 0)
+
+    def _make_manifest(self, params):
+        try:
+            assert isinstance(params, dict)
+            array_metas = []
+            arrays = []
+            values = {}
+
+            for (name, value) in params.items():
+                assert isinstance(name, str)
+
+                # Numpy arrays are stored by hash of content
+                # Otherwise, it must be one of the basic types
+                if isinstance(value, np.ndarray):
+                    assert not value.dtype.hasobject
+                    value = np.require(value, requirements='C')
+                    array_metas.append({
+                        'name': name,
+                        'hash': _hash_array(value),
+                        'dtype': value.dtype.str,
+                        'shape': list(value.shape)
+                    })
+                    arrays.append(value)
+                else:
+                    assert isinstance(value, (str, float, int))
+                    values[name] = value
+
+            manifest = {'arrays': array_metas, 'values': values}
+            return (manifest, arrays)
+
+        except:
+            traceback.print_stack()
+            raise InvalidParamsFormatError()
+
+    def _write_manifest(self, params_id, manifest):
+        os.makedirs(self._manifests_dir, exist_ok=True)
+        manifest_path = self._get_manifest_path(params_id)
+        tmp_file_path = '{}.tmp'.format(manifest_path)
+        with open(tmp_file_path, 'wb') as f:
+            f.write(msgpack.packb(manifest, use_bin_type=True))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file_path, manifest_path)
+
+    def _read_manifest(self, params_id):
+        manifest_path = self._get_manifest_path(params_id)
+        if not os.path.exists(manifest_path):
+            raise InvalidParamsError('No such params "{}"'.format(params_id))
+
+        with open(manifest_path, 'rb') as f:
+            return msgpack.unpackb(f.read(), raw=False)
+
+    def _write_tmp_tensor(self, tensor_hash, value):
+        tensor_path = self._get_tensor_path(tensor_hash)
+        os.makedirs(os.path.dirname(tensor_path), exist_ok=True)
+        tmp_file_path = '{}.{}.tmp'.format(tensor_path, uuid.uuid4())
+        with open(tmp_file_path, 'wb') as f:
+            f.write(memoryview(value.reshape(-1).view(np.uint8)))
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_file_path
+
+    def _read_tensor(self, array_meta, mmap):
+        dtype = np.dtype(array_meta['dtype'])
+        shape = tuple(array_meta['shape'])
+        if int(np.prod(shape)) == 0:
+            return np.empty(shape, dtype=dtype)
+
+        tensor_path = self._get_tensor_path(array_meta['hash'])
+        if mmap:
+            return np.memmap(tensor_path, dtype=dtype, mode='r', shape=shape)
+
+        return np.fromfile(tensor_path, dtype=dtype).reshape(shape)
+
+    # Adds ``delta`` to reference count of array, returning the new count
+    # Must be called while holding the lock
+    def _add_ref(self, tensor_hash, delta):
+        count = self.get_ref_count(tensor_hash) + delta
+        refs_path = self._get_refs_path(tensor_hash)
+        tmp_file_path = '{}.tmp'.format(refs_path)
+        with open(tmp_file_path, 'w') as f:
+            f.write(str(count))
+        os.replace(tmp_file_path, refs_path)
+        return count
+
+    @contextmanager
+    def _lock(self):
+        os.makedirs(self._params_dir, exist_ok=True)
+        with open(self._lock_file_path, 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _get_manifest_path(self, params_id):
+        return os.path.join(self._manifests_dir, params_id)
+
+    def _get_tensor_path(self, tensor_hash):
+        return os.path.join(self._tensors_dir, tensor_hash[:2], tensor_hash)
+
+    def _get_refs_path(self, tensor_hash):
+        return '{}.refs'.format(self._get_tensor_path(tensor_hash))
+
+
+def _hash_array(value):
+    return hashlib.sha256(memoryview(value.reshape(-1).view(np.uint8))).hexdigest()
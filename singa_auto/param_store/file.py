@@ -21,6 +21,7 @@ import os
 import uuid
 
 from .param_store import ParamStore, Params
+from .serialization import MappedParams, PARAMS_MAGIC, is_binary_params
 
 
 class FileParamStore(ParamStore):
@@ -34,27 +35,52 @@ class FileParamStore(ParamStore):
         self.model_class = model_class
 
     def save(self, params: Params):
-        # Serialize params and save bytes to params dir
+        # Stream params array by array into a temp file in params dir, then atomically rename it
+        # This way, a partially written params file is never visible under its params ID
         file_name = '{}_{}.model'.format(self.model_class, uuid.uuid4())
         dest_file_path = os.path.join(self._params_dir, file_name)
-        params_bytes = self._serialize_params(params)
+        tmp_file_path = '{}.tmp'.format(dest_file_path)
         # Check the directory. In case the directory doesn't exist, if so, create the path
         if not os.path.exists(self._params_dir):
             os.makedirs(self._params_dir)
-        with open(dest_file_path, 'wb') as f:
-            f.write(params_bytes)
+        try:
+            with open(tmp_file_path, 'wb') as f:
+                self._write_params(params, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file_path, dest_file_path)
+        except:
+            if os.path.exists(tmp_file_path):
+                os.remove(tmp_file_path)
+            raise
 
         # ID for params is its file name
         params_id = file_name
 
         return params_id
 
-    def load(self, params_id):
+    def load(self, params_id, mmap=False):
         # Load bytes to params dir and deserialize params
         file_name = params_id
         file_path = os.path.join(self._params_dir, file_name)
+
+        # Map arrays lazily from the file, so that processes loading the same params share the page cache
+        # Params in the legacy format can't be mapped, and are loaded eagerly
+        if mmap:
+            with open(file_path, 'rb') as f:
+                is_mappable = is_binary_params(f.read(len(PARAMS_MAGIC)))
+            if is_mappable:
+                return MappedParams(file_path)
+
+        # Read into a mutable buffer, so that deserialized arrays are writable views into it
         with open(file_path, 'rb') as f:
-            params_bytes = f.read()
-        params = self._deserialize_params(params_bytes)
+            params_bytes = bytearray(os.fstat(f.fileno()).st_size)
+            f.readinto(params_bytes)
+        params = self._deserialize_params(params_bytes, verify=True)
 
         return params
+
+    def delete(self, params_id):
+        file_name = params_id
+        file_path = os.path.join(self._params_dir, file_name)
+        os.remove(file_path)
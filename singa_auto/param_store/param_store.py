@@ -18,15 +18,28 @@
 #
 
 import abc
-import msgpack
-import traceback
-import numpy as np
+import os
 from singa_auto.model import Params
-from singa_auto.error_code import InvalidParamsFormatError
 
+from .serialization import serialize_params, deserialize_params, write_params
 
-PARAM_DATA_TYPE_SEPARATOR = '//'
-PARAM_DATA_TYPE_NUMPY = 'NP'
+
+class ParamStoreType:
+    FILE = 'FILE'
+    CONTENT_ADDRESSED = 'CONTENT_ADDRESSED'
+
+
+def make_param_store(store_type: str = None, **kwargs) -> 'ParamStore':
+    '''
+        Creates the param store of a type, defaulting to the type set in the ``PARAMS_STORE_TYPE`` environment variable.
+    '''
+    store_type = store_type or os.environ.get('PARAMS_STORE_TYPE', ParamStoreType.FILE)
+    if store_type == ParamStoreType.CONTENT_ADDRESSED:
+        from .content_addressed import ContentAddressedParamStore
+        return ContentAddressedParamStore(**kwargs)
+    else:
+        from .file import FileParamStore
+        return FileParamStore(**kwargs)
 
 
 class ParamStore(abc.ABC):
@@ -42,62 +55,44 @@ class ParamStore(abc.ABC):
         raise NotImplementedError()
 
     @abc.abstractmethod
-    def load(self, params_id: str) -> Params:
+    def load(self, params_id: str, mmap: bool = False) -> Params:
         '''
             Loads persisted parameters, identified by ID.
+
+            If ``mmap`` is set, the store may return read-only, dict-like parameters whose arrays
+            are lazily memory-mapped from storage, instead of loading them all into memory.
+            Stores that cannot memory-map parameters load them as usual.
+        '''
+        raise NotImplementedError()
+
+    def delete(self, params_id: str):
+        '''
+            Deletes persisted parameters, identified by ID.
         '''
         raise NotImplementedError()
 
+    def collect_garbage(self, used_params_ids) -> int:
+        '''
+            Deletes persisted parameters that are not in ``used_params_ids`` (e.g. not referenced by any trial),
+            returning the no. of parameters deleted. Parameters saved recently are kept, as they might be yet to be referenced.
+
+            Stores that keep parameters in storage shared across parameters override this; by default, nothing is deleted.
+        '''
+        return 0
+
     @staticmethod
     def _serialize_params(params):
-        # Serialize as `msgpack`
-        params_simple = _simplify_params(params)
-        params_bytes = msgpack.packb(params_simple, use_bin_type=True)
+        # Serialize in binary params format
+        params_bytes = serialize_params(params)
         return params_bytes
 
     @staticmethod
-    def _deserialize_params(params_bytes):
-        # Deserialize as `msgpack`
-        params_simple = msgpack.unpackb(params_bytes, raw=False)
-        params = _unsimplify_params(params_simple)
-        return params
-
-
-def _simplify_params(params):
-    try:
-        params_simple = {}
-
-        assert isinstance(params, dict)
-        for (name, value) in params.items():
-            assert isinstance(name, str)
-            assert PARAM_DATA_TYPE_SEPARATOR not in name  # Internally used as separator for types
-
-            # If value is a numpy array, prefix it with type
-            # Otherwise, it must be one of the basic types
-            if isinstance(value, np.ndarray):
-                name = f'{PARAM_DATA_TYPE_NUMPY}{PARAM_DATA_TYPE_SEPARATOR}{name}'
-                value = value.tolist()
-            else:
-                assert isinstance(value, (str, float, int))
-
-            params_simple[name] = value
-
-        return params_simple
+    def _write_params(params, f):
+        # Stream in binary params format to file
+        write_params(params, f)
 
-    except:
-        traceback.print_stack()
-        raise InvalidParamsFormatError()
-
-
-def _unsimplify_params(params_simple):
-    params = {}
-
-    for (name, value) in params_simple.items():
-        if PARAM_DATA_TYPE_SEPARATOR in name:
-            (type_id, name) = name.split(PARAM_DATA_TYPE_SEPARATOR)
-            if type_id == PARAM_DATA_TYPE_NUMPY:
-                value = np.array(value)
-
-        params[name] = value
-
-    return params
+    @staticmethod
+    def _deserialize_params(params_bytes, verify=False):
+        # Deserialize binary params format, falling back to legacy `msgpack` format
+        params = deserialize_params(params_bytes, verify=verify)
+        return params
@@ -0,0 +1,288 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import struct
+import zlib
+import traceback
+from collections.abc import Mapping
+import msgpack
+import numpy as np
+
+from singa_auto.model import Params
+from singa_auto.error_code import InvalidParamsFormatError
+
+# Binary format for model parameters:
+#
+#     <magic: 8 bytes> <version: uint32> <header size: uint64>
+#     <header: msgpack>
+#     <padding up to PARAMS_ALIGNMENT>
+#     <data: raw buffer of each array, each starting at a multiple of PARAMS_ALIGNMENT>
+#
+# The header is a msgpack map of
+#     { arrays: [{ name, dtype, shape, offset, nbytes, crc32 }], values: { <name>: <str|int|float> } }
+# where each array's ``offset`` is relative to the start of the data section,
+# and ``crc32`` is the checksum of the array's buffer.
+#
+# Arrays are read back with ``np.frombuffer`` as views into the serialized buffer, without copying.
+# Parameters serialized in the legacy format (msgpack of nested lists) are still deserialized.
+
+PARAMS_MAGIC = b'SAPARAMS'
+PARAMS_FORMAT_VERSION = 1
+PARAMS_ALIGNMENT = 64
+_PREFIX_STRUCT = struct.Struct('<IQ')  # (version, header size)
+_PREFIX_SIZE = len(PARAMS_MAGIC) + _PREFIX_STRUCT.size
+
+# Used by the legacy msgpack format
+PARAM_DATA_TYPE_SEPARATOR = '//'
+PARAM_DATA_TYPE_NUMPY = 'NP'
+
+
+def serialize_params(params: Params) -> bytes:
+    '''
+        Serializes parameters in the binary params format.
+    '''
+    return b''.join(_iter_params_chunks(params))
+
+
+def write_params(params: Params, f):
+    '''
+        Writes parameters in the binary params format to a writable binary file object,
+        one array at a time, without building the serialized bytes in memory.
+    '''
+    for chunk in _iter_params_chunks(params):
+        f.write(chunk)
+
+
+def deserialize_params(params_bytes, verify=False) -> Params:
+    '''
+        Deserializes parameters from either the binary params format or the legacy msgpack format.
+        ``params_bytes`` can be any bytes-like object; arrays are returned as views into it.
+        If ``verify`` is set, each array is checked against its checksum.
+    '''
+    if not is_binary_params(params_bytes):
+        return deserialize_params_msgpack(params_bytes)
+
+    (header, data_start) = _read_header(params_bytes)
+    params = dict(header['values'])
+    for array_meta in header['arrays']:
+        value = _array_from_buffer(params_bytes, data_start, array_meta)
+        if verify:
+            _verify_array(value, array_meta)
+        params[array_meta['name']] = value
+
+    return params
+
+
+def is_binary_params(params_bytes) -> bool:
+    return bytes(params_bytes[:len(PARAMS_MAGIC)]) == PARAMS_MAGIC
+
+
+class MappedParams(Mapping):
+    '''
+        Read-only, dict-like parameters backed by a memory-mapped file in the binary params format.
+        Arrays are read-only views into the file, and are only paged in when they are accessed.
+
+        :param str file_path: Path to the params file
+    '''
+
+    def __init__(self, file_path):
+        self._mmap = np.memmap(file_path, dtype=np.uint8, mode='r')
+        (header, self._data_start) = _read_header(self._mmap)
+        self._values = header['values']
+        self._array_metas = {x['name']: x for x in header['arrays']}
+
+    def __getitem__(self, name):
+        array_meta = self._array_metas.get(name)
+        if array_meta is not None:
+            return _array_from_buffer(self._mmap, self._data_start, array_meta)
+
+        return self._values[name]
+
+    def __iter__(self):
+        yield from self._array_metas
+        yield from self._values
+
+    def __len__(self):
+        return len(self._array_metas) + len(self._values)
+
+    def __contains__(self, name):
+        return name in self._array_metas or name in self._values
+
+
+def serialize_params_msgpack(params: Params) -> bytes:
+    '''
+        Serializes parameters in the legacy format, as `msgpack` of nested lists.
+    '''
+    params_simple = _simplify_params(params)
+    params_bytes = msgpack.packb(params_simple, use_bin_type=True)
+    return params_bytes
+
+
+def deserialize_params_msgpack(params_bytes) -> Params:
+    '''
+        Deserializes parameters in the legacy format, as `msgpack` of nested lists.
+    '''
+    params_simple = msgpack.unpackb(params_bytes, raw=False)
+    params = _unsimplify_params(params_simple)
+    return params
+
+
+def _iter_params_chunks(params):
+    (header, arrays) = _make_header(params)
+    header_bytes = msgpack.packb(header, use_bin_type=True)
+
+    yield PARAMS_MAGIC
+    yield _PREFIX_STRUCT.pack(PARAMS_FORMAT_VERSION, len(header_bytes))
+    yield header_bytes
+    pos = _PREFIX_SIZE + len(header_bytes)
+    yield _padding(pos)
+
+    # Write each array's buffer at its aligned offset
+    pos = 0
+    for (array_meta, value) in zip(header['arrays'], arrays):
+        yield bytes(array_meta['offset'] - pos)
+        yield memoryview(value.reshape(-1).view(np.uint8))
+        pos = array_meta['offset'] + array_meta['nbytes']
+
+
+def _make_header(params):
+    try:
+        assert isinstance(params, dict)
+        array_metas = []
+        arrays = []
+        values = {}
+        offset = 0
+
+        for (name, value) in params.items():
+            assert isinstance(name, str)
+
+            # Numpy arrays are stored as raw buffers
+            # Otherwise, it must be one of the basic types
+            if isinstance(value, np.ndarray):
+                assert not value.dtype.hasobject
+                value = np.require(value, requirements='C')
+                offset = _align(offset)
+                array_metas.append({
+                    'name': name,
+                    'dtype': value.dtype.str,
+                    'shape': list(value.shape),
+                    'offset': offset,
+                    'nbytes': value.nbytes,
+                    'crc32': _checksum(value)
+                })
+                arrays.append(value)
+                offset += value.nbytes
+            else:
+                assert isinstance(value, (str, float, int))
+                values[name] = value
+
+        header = {'arrays': array_metas, 'values': values}
+        return (header, arrays)
+
+    except:
+        traceback.print_stack()
+        raise InvalidParamsFormatError()
+
+
+def _read_header(params_bytes):
+    try:
+        (version, header_size) = _PREFIX_STRUCT.unpack_from(params_bytes, len(PARAMS_MAGIC))
+        if version > PARAMS_FORMAT_VERSION:
+            raise InvalidParamsFormatError('Unsupported params format version: {}'.format(version))
+
+        header_end = _PREFIX_SIZE + header_size
+        header = msgpack.unpackb(bytes(params_bytes[_PREFIX_SIZE:header_end]), raw=False)
+        data_start = _align(header_end)
+        return (header, data_start)
+
+    except struct.error:
+        raise InvalidParamsFormatError('Truncated params header')
+
+
+def _array_from_buffer(buffer, data_start, array_meta):
+    dtype = np.dtype(array_meta['dtype'])
+    shape = tuple(array_meta['shape'])
+    if array_meta['nbytes'] == 0:
+        return np.empty(shape, dtype=dtype)
+
+    count = array_meta['nbytes'] // dtype.itemsize
+    value = np.frombuffer(buffer,
+                          dtype=dtype,
+                          count=count,
+                          offset=data_start + array_meta['offset'])
+    return value.reshape(shape)
+
+
+def _checksum(value):
+    return zlib.crc32(memoryview(value.reshape(-1).view(np.uint8)))
+
+
+def _verify_array(value, array_meta):
+    # Params written without checksums are not verified
+    crc32 = array_meta.get('crc32')
+    if crc32 is not None and value.nbytes > 0 and _checksum(value) != crc32:
+        raise InvalidParamsFormatError('Checksum mismatch for params "{}"'.format(array_meta['name']))
+
+
+def _align(pos):
+    return (pos + PARAMS_ALIGNMENT - 1) // PARAMS_ALIGNMENT * PARAMS_ALIGNMENT
+
+
+def _padding(pos):
+    return bytes(_align(pos) - pos)
+
+
+def _simplify_params(params):
+    try:
+        params_simple = {}
+
+        assert isinstance(params, dict)
+        for (name, value) in params.items():
+            assert isinstance(name, str)
+            assert PARAM_DATA_TYPE_SEPARATOR not in name  # Internally used as separator for types
+
+            # If value is a numpy array, prefix it with type
+            # Otherwise, it must be one of the basic types
+            if isinstance(value, np.ndarray):
+                name = f'{PARAM_DATA_TYPE_NUMPY}{PARAM_DATA_TYPE_SEPARATOR}{name}'
+                value = value.tolist()
+            else:
+                assert isinstance(value, (str, float, int))
+
+            params_simple[name] = value
+
+        return params_simple
+
+    except:
+        traceback.print_stack()
+        raise InvalidParamsFormatError()
+
+
+def _unsimplify_params(params_simple):
+    params = {}
+
+    for (name, value) in params_simple.items():
+        if PARAM_DATA_TYPE_SEPARATOR in name:
+            (type_id, name) = name.split(PARAM_DATA_TYPE_SEPARATOR)
+            if type_id == PARAM_DATA_TYPE_NUMPY:
+                value = np.array(value)
+
+        params[name] = value
+
+    return params
@@ -18,26 +18,37 @@
 #
 import os
 import logging
+import threading
 from typing import Any, List
-from flask import Flask, jsonify, g, request
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from .predictor import Predictor
 from singa_auto.model import utils
+from singa_auto.error_code import PredictionTimeoutError
 import traceback
 
 service_id = os.environ['SINGA_AUTO_SERVICE_ID']
 
+# Max. time for a request's predictions to be made, after which it is cancelled
+PREDICT_TIMEOUT_SECS = float(os.environ.get('PREDICTOR_TIMEOUT_SECS', 60))
+
 logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
 
+_predictor: Predictor = None
+_predictor_lock = threading.Lock()
+
+
 def get_predictor() -> Predictor:
-    # Allow multiple threads to each have their own instance of predictor
-    if not hasattr(g, 'predictor'):
-        g.predictor = Predictor(service_id)
+    # All threads share a single instance of predictor, along with its reply channel
+    global _predictor
+    with _predictor_lock:
+        if _predictor is None:
+            _predictor = Predictor(service_id)
 
-    return g.predictor
+        return _predictor
 
 
 @app.route('/')
@@ -64,8 +75,11 @@ def predict():
         else:
             return jsonify({'ErrorMsg': 'data should be either at files (set "img" as key) or json payload'}), 400
         predictor = get_predictor()
-        predictions: List[Any] = predictor.predict(queries)
+        predictions: List[Any] = predictor.predict(queries, timeout_secs=PREDICT_TIMEOUT_SECS)
         return jsonify(predictions), 200
+    except PredictionTimeoutError as e:
+        logger.warning(e.message)
+        return jsonify({'ErrorMsg': e.message}), 504
     except:
         # for debug,print the error
         traceback.print_exc()
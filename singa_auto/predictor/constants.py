@@ -23,9 +23,14 @@ import uuid
 
 class Query:
 
-    def __init__(self, query: Any):
+    def __init__(
+        self,
+        query: Any,
+        # Channel that predictions for the query should be sent to, if any
+        reply_to: str = None):
         self.id = str(uuid.uuid4())
         self.query = query
+        self.reply_to = reply_to
 
     def __eq__(self, other):
         return (self.__class__ == other.__class__ and self.id == other.id and
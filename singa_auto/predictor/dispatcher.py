@@ -0,0 +1,228 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, CancelledError
+from typing import List, Callable
+
+from singa_auto.kafka import InferenceCache as KafkaInferenceCache
+
+from .constants import Prediction, Query
+
+REPLY_POLL_TIMEOUT_SECS = 1
+COALESCE_WINDOW_SECS = 0.001  # How long to wait for more submitted queries to send together
+COALESCE_MAX_QUERIES = 256  # Max. no. of submitted queries to send together
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingQuery:
+
+    def __init__(self, query: Query):
+        self.query = query
+        self.future = Future()
+        self.worker_count = None  # No. of workers yet to reply, once sent
+        self.predictions: List[Prediction] = []
+
+
+class QueryDispatcher:
+    '''
+        Sends queries to inference workers, and collects their predictions from a single long-lived reply channel.
+
+        Predictions are demultiplexed by query ID in a background thread into a future per query,
+        which is resolved as soon as the last worker has replied. Safe for use by multiple threads.
+
+        Queries passed to ``submit`` are sent by another background thread, which coalesces queries
+        submitted concurrently (e.g. by different requests) into shared batches for the workers.
+
+        :param KafkaInferenceCache kafka_cache: Cache to send queries & receive predictions through
+        :param str name: Prefix for the name of the reply channel
+        :param get_worker_ids: Returns the IDs of workers to send submitted queries to, blocking until there are any
+    '''
+
+    def __init__(self,
+                 kafka_cache: KafkaInferenceCache,
+                 name='predictor',
+                 get_worker_ids: Callable[[], List[str]] = None):
+        self._kafka_cache = kafka_cache
+        self._get_worker_ids = get_worker_ids
+        self._reply_channel = kafka_cache.make_reply_channel(name)
+        self._pending_queries = {}  # { <query_id>: <pending query> }
+        self._submitted_queries = queue.Queue()  # Of pending queries yet to be sent
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._reply_thread = threading.Thread(target=self._collect_replies, daemon=True)
+        self._send_thread = threading.Thread(target=self._send_submitted_queries, daemon=True)
+        self._reply_thread.start()
+        self._send_thread.start()
+
+    def submit(self, queries: List[Query]) -> List[Future]:
+        '''
+            Queues queries to be sent to the workers given by ``get_worker_ids``, together with other submitted queries.
+            Returns a future for each query, resolving to the list of predictions from the workers.
+            Cancelling a future before its query is sent keeps it from being sent, and predictions for the query
+            that arrive later are ignored.
+        '''
+        assert self._get_worker_ids is not None
+        pending_queries = self._add_pending_queries(queries)
+        for pending_query in pending_queries:
+            self._submitted_queries.put(pending_query)
+
+        return [x.future for x in pending_queries]
+
+    def dispatch(self, queries: List[Query], worker_ids: List[str]) -> List[Future]:
+        '''
+            Sends queries to each of the workers right away.
+            Returns a future for each query, resolving to the list of predictions from the workers.
+        '''
+        pending_queries = self._add_pending_queries(queries)
+        for pending_query in pending_queries:
+            pending_query.future.set_running_or_notify_cancel()
+        self._send(pending_queries, worker_ids)
+        return [x.future for x in pending_queries]
+
+    def cancel(self, queries: List[Query]):
+        '''
+            Cancels queries, failing their futures with ``CancelledError``.
+            Predictions for the queries that arrive later are ignored.
+        '''
+        with self._lock:
+            pending_queries = [
+                self._pending_queries.pop(x.id) for x in queries if x.id in self._pending_queries
+            ]
+
+        for pending_query in pending_queries:
+            # Queries that have been sent can no longer be cancelled through their future
+            if not pending_query.future.cancel():
+                pending_query.future.set_exception(CancelledError())
+
+        if len(pending_queries) > 0:
+            logger.info(f'Cancelled {len(pending_queries)} querie(s)')
+
+    def stop(self):
+        self._stop_event.set()
+        self._submitted_queries.put(None)  # Wake up sending thread
+        self._reply_thread.join()
+        # Sending thread might be waiting for workers, so it isn't waited on for long
+        self._send_thread.join(timeout=REPLY_POLL_TIMEOUT_SECS)
+        self._kafka_cache.close_reply_channel(self._reply_channel)
+
+        # Fail queries that are still pending
+        with self._lock:
+            pending_queries = list(self._pending_queries.values())
+            self._pending_queries = {}
+        for pending_query in pending_queries:
+            if pending_query.future.cancel():
+                continue
+            pending_query.future.set_exception(RuntimeError('Query dispatcher has stopped'))
+
+    def _add_pending_queries(self, queries: List[Query]) -> List[_PendingQuery]:
+        pending_queries = []
+        with self._lock:
+            for query in queries:
+                query.reply_to = self._reply_channel
+                pending_query = _PendingQuery(query)
+                self._pending_queries[query.id] = pending_query
+                pending_queries.append(pending_query)
+
+        # Stop tracking queries once their futures are done, e.g. when cancelled directly by the caller
+        for pending_query in pending_queries:
+            pending_query.future.add_done_callback(self._make_on_query_done(pending_query))
+
+        return pending_queries
+
+    def _make_on_query_done(self, pending_query: _PendingQuery):
+        def on_query_done(future):
+            with self._lock:
+                if self._pending_queries.get(pending_query.query.id) is pending_query:
+                    del self._pending_queries[pending_query.query.id]
+
+        return on_query_done
+
+    def _send(self, pending_queries: List[_PendingQuery], worker_ids: List[str]):
+        assert len(worker_ids) > 0
+        with self._lock:
+            for pending_query in pending_queries:
+                pending_query.worker_count = len(worker_ids)
+
+        queries = [x.query for x in pending_queries]
+        for worker_id in worker_ids:
+            self._kafka_cache.add_queries_for_worker(worker_id, queries)
+
+    def _send_submitted_queries(self):
+        while not self._stop_event.is_set():
+            pending_queries = self._take_submitted_queries()
+
+            # Skip queries cancelled before they're sent
+            pending_queries = [x for x in pending_queries if x.future.set_running_or_notify_cancel()]
+            if len(pending_queries) == 0:
+                continue
+
+            try:
+                worker_ids = self._get_worker_ids()
+                self._send(pending_queries, worker_ids)
+            except Exception as e:
+                logger.exception('Error while sending queries:')
+                with self._lock:
+                    pending_queries = [
+                        x for x in pending_queries if self._pending_queries.pop(x.query.id, None) is not None
+                    ]
+                for pending_query in pending_queries:
+                    pending_query.future.set_exception(e)
+
+    # Blocks for the next submitted query, then takes queries submitted together with it
+    def _take_submitted_queries(self) -> List[_PendingQuery]:
+        pending_queries = []
+        pending_query = self._submitted_queries.get()
+        deadline = time.monotonic() + COALESCE_WINDOW_SECS
+        while pending_query is not None:
+            pending_queries.append(pending_query)
+            if len(pending_queries) >= COALESCE_MAX_QUERIES:
+                break
+            try:
+                pending_query = self._submitted_queries.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+
+        return pending_queries
+
+    def _collect_replies(self):
+        while not self._stop_event.is_set():
+            predictions = self._kafka_cache.take_replies(self._reply_channel, REPLY_POLL_TIMEOUT_SECS)
+            for prediction in predictions:
+                self._add_prediction(prediction)
+
+    def _add_prediction(self, prediction: Prediction):
+        with self._lock:
+            pending_query = self._pending_queries.get(prediction.query_id)
+            if pending_query is None:
+                logger.info(f'Ignoring prediction for unknown query "{prediction.query_id}"')
+                return
+
+            pending_query.predictions.append(prediction)
+            pending_query.worker_count -= 1
+            if pending_query.worker_count > 0:
+                return
+
+            del self._pending_queries[prediction.query_id]
+
+        pending_query.future.set_result(pending_query.predictions)
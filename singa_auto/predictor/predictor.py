@@ -19,10 +19,10 @@
 
 import logging
 import os
-from collections import defaultdict
 from typing import List, Callable, Any
 import time
 import traceback
+from concurrent.futures import TimeoutError
 
 from singa_auto.utils.auth import superadmin_client
 from singa_auto.meta_store import MetaStore
@@ -31,16 +31,21 @@ from singa_auto.kafka import InferenceCache as KafkaInferenceCache
 
 from .constants import Prediction, Query
 from .ensemble import get_ensemble_method
+from .dispatcher import QueryDispatcher
 
-from singa_auto.error_code import InvalidInferenceJobError
+from singa_auto.error_code import InvalidInferenceJobError, PredictionTimeoutError
 
-PREDICT_LOOP_SLEEP_SECS = 0.1
+WAIT_WORKERS_SLEEP_SECS = 0.5
 
 
 logger = logging.getLogger(__name__)
 
 
 class Predictor:
+    '''
+        Serves predictions for an inference job by ensembling predictions from its inference workers.
+        Safe for use by multiple threads.
+    '''
 
     def __init__(self, service_id, meta_store=None):
         self._service_id = service_id
@@ -56,6 +61,9 @@ class Predictor:
                                                 self._redis_host,
                                                 self._redis_port)
         self._kakfa_cache = KafkaInferenceCache()
+        self._dispatcher = QueryDispatcher(self._kakfa_cache,
+                                           name=f'predictor_{self._inference_job_id}',
+                                           get_worker_ids=self._wait_for_workers)
         logger.info(
             f'Initialized predictor for inference job "{self._inference_job_id}"'
         )
@@ -64,8 +72,13 @@ class Predictor:
     def start(self):
         self._notify_start()
 
-    def predict(self, queries: List[Any]):
-        worker_predictions_list = self._get_predictions_from_workers(queries)
+    def predict(self, queries: List[Any], timeout_secs: float = None):
+        '''
+            Gets ensembled predictions for queries, which are sent to workers together with queries of concurrent calls.
+            Raises ``PredictionTimeoutError`` if predictions aren't made within ``timeout_secs``,
+            in which case the queries are cancelled.
+        '''
+        worker_predictions_list = self._get_predictions_from_workers(queries, timeout_secs)
         logger.info("Getting prediction list")
         predictions = self._combine_worker_predictions(worker_predictions_list)
         return predictions
@@ -73,6 +86,7 @@ class Predictor:
     # Only a single thread should run this
     def stop(self):
         self._notify_stop()
+        self._dispatcher.stop()
 
         # Clear caches for inference job
         try:
@@ -118,49 +132,36 @@ class Predictor:
                                        inference_job_id=self._inference_job_id)
 
     def _get_predictions_from_workers(
-            self, queries: List[Any]) -> List[List[Prediction]]:
+            self, queries: List[Any], timeout_secs: float = None) -> List[List[Prediction]]:
         queries = [Query(x) for x in queries]
 
-        # Wait for at least 1 free worker
-        worker_ids = []
+        # Send queries to every worker, and wait for all predictions to be made
+        futures = self._dispatcher.submit(queries)
+        deadline = time.monotonic() + timeout_secs if timeout_secs is not None else None
+        try:
+            worker_predictions_list = [
+                x.result(timeout=max(deadline - time.monotonic(), 0) if deadline is not None else None)
+                for x in futures
+            ]
+        except TimeoutError:
+            self._dispatcher.cancel(queries)
+            raise PredictionTimeoutError(f'Predictions not made within {timeout_secs}s')
+        except BaseException:
+            # e.g. on interruption, stop waiting for the queries
+            self._dispatcher.cancel(queries)
+            raise
 
+        return worker_predictions_list
+
+    def _wait_for_workers(self) -> List[str]:
+        # Wait for at least 1 free worker
+        worker_ids = self._redis_cache.get_workers()
         while len(worker_ids) == 0:
-            logger.info("Getting free worker from redis...")
+            logger.info("Waiting for free worker from redis...")
+            time.sleep(WAIT_WORKERS_SLEEP_SECS)
             worker_ids = self._redis_cache.get_workers()
-            time.sleep(0.5)
-
-        # For each worker, send queries to worker
-        pending_queries = set()  # {(query_id, worker_id)}
-        for worker_id in worker_ids:
-            self._kakfa_cache.add_queries_for_worker(worker_id, queries)
-            # self._redis_cache.add_queries_for_worker(worker_id, queries)
-            pending_queries.update([(x.id, worker_id) for x in queries])
-
-        # Wait for all predictions to be made
-        query_id_to_predictions = defaultdict(list)  # { <query_id>: [prediction] }
-        while len(pending_queries) > 0:
-            # For every pending query to worker
-            for (query_id, worker_id) in list(pending_queries):
-                # Check cache
-                prediction = self._kakfa_cache.take_prediction_for_worker(
-                    worker_id, query_id)
-                # prediction = self._redis_cache.take_prediction_for_worker(worker_id, query_id)
-                if prediction is None:
-                    continue
-
-                # Record prediction & mark as not pending
-                query_id_to_predictions[query_id].append(prediction)
-                pending_queries.remove((query_id, worker_id))
-            logger.info("Getting prediction result from kafka...")
-            time.sleep(PREDICT_LOOP_SLEEP_SECS)
-
-        # Reorganize predictions
-        worker_predictions_list = []
-        for query in queries:
-            worker_predictions: list = query_id_to_predictions[query.id]
-            worker_predictions_list.append(worker_predictions)
 
-        return worker_predictions_list
+        return worker_ids
 
     def _combine_worker_predictions(self, worker_predictions_list: List[List[Prediction]]) -> List[Any]:
         # Ensemble predictions for each query
@@ -67,12 +67,16 @@ class InferenceCache:
     def take_prediction_for_worker(self, worker_id: str,
                                    query_id: str) -> Union[Prediction, None]:
         name = f'workers:{worker_id}:{query_id}:prediction'
-        prediction = self._redis.get(name)
+
+        # Get & delete prediction from cache in a single round-trip
+        with self._redis.pipeline() as pipe:
+            pipe.get(name)
+            pipe.delete(name)
+            (prediction, _) = pipe.execute()
+
         if prediction is None:
             return None
 
-        # Delete prediction from cache
-        self._redis.delete(name)
         prediction = pickle.loads(prediction)
         logger.info(
             f'Took prediction for query "{query_id}" from worker "{worker_id}"')
@@ -93,15 +97,10 @@ class InferenceCache:
     def pop_queries_for_worker(self, worker_id: str,
                                batch_size: int) -> List[Query]:
         name = f'workers:{worker_id}:queries'
-        queries = []
 
-        # Repeatedly pop from list of queries to accumulate batch
-        for _ in range(batch_size):
-            query = self._redis.pop_from_list(name)
-            if query is None:
-                break
-            query = pickle.loads(query)
-            queries.append(query)
+        # Pop a batch of queries from list of queries
+        queries = self._redis.pop_many_from_list(name, batch_size)
+        queries = [pickle.loads(x) for x in queries]
 
         if len(queries) > 0:
             logger.info(
@@ -113,10 +112,10 @@ class InferenceCache:
                                    predictions: List[Prediction]):
         logger.info(
             f'Adding {len(predictions)} prediction(s) for worker "{worker_id}"')
-        for prediction in predictions:
-            name = f'workers:{worker_id}:{prediction.query_id}:prediction'
-            prediction = pickle.dumps(prediction)
-            self._redis.set(name, prediction)
+        self._redis.mset({
+            f'workers:{worker_id}:{x.query_id}:prediction': pickle.dumps(x)
+            for x in predictions
+        })
 
     def delete_worker(self, worker_id: str):
         self._redis.delete_from_set('workers', worker_id)
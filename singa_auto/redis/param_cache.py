@@ -18,27 +18,23 @@
 #
 
 import json
-import numpy as np
 from typing import Dict
 import uuid
 import logging
 from collections import namedtuple
-import msgpack
 from datetime import datetime
-import traceback
 
 from singa_auto.model import Params
 from singa_auto.advisor import ParamsType
 from singa_auto.utils.local_cache import LocalCache
-from .redis import RedisSession
-from singa_auto.error_code import InvalidParamsError, InvalidParamsFormatError
+from singa_auto.param_store.serialization import serialize_params, deserialize_params
+from .redis import RedisSession, RedisPipeline
+from singa_auto.error_code import InvalidParamsError
 
 logger = logging.getLogger(__name__)
 
 
 REDIS_NAMESPACE = 'PARAMS'
-PARAM_DATA_TYPE_SEPARATOR = '//'
-PARAM_DATA_TYPE_NUMPY = 'NP'
 
 _ParamMeta = namedtuple('_ParamMeta', ('param_id', 'score', 'time'))
 
@@ -86,7 +82,7 @@ class ParamCache(object):
         self._redis.acquire_lock()
         try:
             # With redis, sync in-memory metadata with Redis'
-            self._pull_from_redis()
+            redis_params = self._pull_from_redis()
 
             param_meta = self._update_params_meta(score, time)
             if param_meta:
@@ -94,7 +90,7 @@ class ParamCache(object):
                 self._local_cache.put(param_meta.param_id, params)
 
             if self._redis:
-                self._push_to_redis()
+                self._push_to_redis(redis_params)
 
         finally:
             self._redis.release_lock()
@@ -108,7 +104,7 @@ class ParamCache(object):
     '''
 
     def retrieve_params(self, params_type: ParamsType) -> Params:
-        self._redis.acquire_lock()
+        self._redis.acquire_lock(shared=True)
         try:
             # With redis, sync in-memory metadata with Redis'
             self._pull_from_redis()
@@ -226,6 +222,7 @@ class ParamCache(object):
     ####################################
 
     # Pulls metadata from Redis, updating local metadata
+    # Returns the pulled metadata
     def _pull_from_redis(self):
         redis_params = self._pull_metadata_from_redis()
 
@@ -233,8 +230,11 @@ class ParamCache(object):
         for (param_type, param_meta) in redis_params.items():
             self._params[param_type] = param_meta
 
-    # Pushes metadata & selected params to Redis, deletes outdated params on Redis
-    def _push_to_redis(self):
+        return redis_params
+
+    # Pushes metadata & selected params to Redis, deletes outdated params on Redis, in a single round-trip
+    # `redis_params` is the metadata on Redis, as last pulled while holding the lock
+    def _push_to_redis(self, redis_params):
         params_to_push = ['GLOBAL_BEST', 'GLOBAL_RECENT']
 
         # Extract params meta to share
@@ -245,26 +245,26 @@ class ParamCache(object):
         }
 
         # Compare new against old params, and determine which params to push and delete from Redis
-        redis_params = self._pull_metadata_from_redis()
         og_param_ids = set([x.param_id for x in redis_params.values()])
         new_param_ids = set([x.param_id for x in params_shared.values()])
         to_add = [x for x in new_param_ids if x not in og_param_ids]
         to_delete = [x for x in og_param_ids if x not in new_param_ids]
 
-        # For each param to add, push it
-        for param_id in to_add:
-            params = self._local_cache.get(param_id)
-            if params:
-                self._push_params_to_redis(param_id, params)
+        with self._redis.pipeline() as pipe:
+            # For each param to add, push it
+            for param_id in to_add:
+                params = self._local_cache.get(param_id)
+                if params:
+                    self._push_params_to_redis(pipe, param_id, params)
 
-        # Delete params to delete
-        if len(to_delete) > 0:
-            self._delete_params_from_redis(*to_delete)
+            # Delete params to delete
+            if len(to_delete) > 0:
+                self._delete_params_from_redis(pipe, *to_delete)
 
-        # Push updated metadata to Redis
-        self._push_metadata_to_redis(params_shared)
+            # Push updated metadata to Redis
+            self._push_metadata_to_redis(pipe, params_shared)
 
-    def _push_metadata_to_redis(self, params):
+    def _push_metadata_to_redis(self, pipe: RedisPipeline, params):
         redis_params = {
             param_type: self._param_meta_to_jsonable(param_meta)
             for (param_type, param_meta) in params.items()
@@ -273,7 +273,7 @@ class ParamCache(object):
         logger.info('Pushing metadata to Redis: {}...'.format(metadata))
 
         metadata_str = json.dumps(metadata)
-        self._redis.set('meta', metadata_str)
+        pipe.set('meta', metadata_str)
 
     def _pull_metadata_from_redis(self):
         metadata_str = self._redis.get('meta')
@@ -293,10 +293,10 @@ class ParamCache(object):
 
         return {}
 
-    def _delete_params_from_redis(self, *param_ids):
+    def _delete_params_from_redis(self, pipe: RedisPipeline, *param_ids):
         logger.info('Deleting params: {}...'.format(param_ids))
         param_names = ['params:{}'.format(x) for x in param_ids]
-        self._redis.delete(*param_names)
+        pipe.delete(*param_names)
 
     # Clears ALL metadata and params for session from Redis
     def _clear_all_from_redis(self):
@@ -304,11 +304,11 @@ class ParamCache(object):
         self._redis.delete('meta')
         self._redis.delete_pattern('params:*')
 
-    def _push_params_to_redis(self, param_id: str, params: Params):
+    def _push_params_to_redis(self, pipe: RedisPipeline, param_id: str, params: Params):
         logger.info('Pushing params: "{}"...'.format(param_id))
         param_name = 'params:{}'.format(param_id)
-        params_bytes = _serialize_params(params)
-        self._redis.set(param_name, params_bytes)
+        params_bytes = serialize_params(params)
+        pipe.set(param_name, params_bytes)
 
     def _pull_params_from_redis(self, param_id: str) -> Params:
         logger.info('Pulling params: "{}"...'.format(param_id))
@@ -317,7 +317,8 @@ class ParamCache(object):
         if params_bytes is None:
             return None
 
-        params = _deserialize_params(params_bytes)
+        # Deserialize from a mutable copy, so that arrays are writable like params loaded from the legacy format
+        params = deserialize_params(bytearray(params_bytes))
         return params
 
     def _param_meta_to_jsonable(self, param_meta: _ParamMeta):
@@ -331,56 +332,3 @@ class ParamCache(object):
         param_meta = _ParamMeta(**jsonable)
         return param_meta
 
-
-def _serialize_params(params):
-    # Serialize as `msgpack`
-    params_simple = _simplify_params(params)
-    params_bytes = msgpack.packb(params_simple, use_bin_type=True)
-    return params_bytes
-
-
-def _deserialize_params(params_bytes):
-    # Deserialize as `msgpack`
-    params_simple = msgpack.unpackb(params_bytes, raw=False)
-    params = _unsimplify_params(params_simple)
-    return params
-
-
-def _simplify_params(params):
-    try:
-        params_simple = {}
-
-        assert isinstance(params, dict)
-        for (name, value) in params.items():
-            assert isinstance(name, str)
-            assert PARAM_DATA_TYPE_SEPARATOR not in name  # Internally used as separator for types
-
-            # If value is a numpy array, prefix it with type
-            # Otherwise, it must be one of the basic types
-            if isinstance(value, np.ndarray):
-                name = f'{PARAM_DATA_TYPE_NUMPY}{PARAM_DATA_TYPE_SEPARATOR}{name}'
-                value = value.tolist()
-            else:
-                assert isinstance(value, (str, float, int))
-
-            params_simple[name] = value
-
-        return params_simple
-
-    except:
-        traceback.print_stack()
-        raise InvalidParamsFormatError()
-
-
-def _unsimplify_params(params_simple):
-    params = {}
-
-    for (name, value) in params_simple.items():
-        if PARAM_DATA_TYPE_SEPARATOR in name:
-            (type_id, name) = name.split(PARAM_DATA_TYPE_SEPARATOR)
-            if type_id == PARAM_DATA_TYPE_NUMPY:
-                value = np.array(value)
-
-        params[name] = value
-
-    return params
@@ -18,15 +18,89 @@
 #
 
 import uuid
+import math
 import time
+import random
 import logging
+import fnmatch
+import threading
+from contextlib import contextmanager
 import msgpack
 import os
 
+from singa_auto.utils.metrics import get_histogram
+
 logger = logging.getLogger(__name__)
 
 REDIS_LOCK_EXPIRE_SECONDS = 60
-REDIS_LOCK_WAIT_SLEEP_SECONDS = 0.1
+REDIS_LOCK_RENEW_SECONDS = 20  # How often a held lock is renewed, to keep it from expiring
+REDIS_LOCK_WAIT_MIN_SLEEP_SECONDS = 0.005
+REDIS_LOCK_WAIT_MAX_SLEEP_SECONDS = 0.5
+REDIS_LOCK_WAIT_LOG_SECONDS = 5  # Waits for a lock longer than this are logged
+REDIS_LOCK_WRITER_WAITING_EXPIRE_SECONDS = 2  # Must be longer than max sleep, as waiting writers refresh it on retry
+
+# Lua scripts for the lock, each run atomically on Redis
+# KEYS: [<lock>, <lock readers>, <lock fence>, <lock writer waiting>]
+# ARGV: [<token>, <expiry in ms>, <current time in ms>, <expiry of writer waiting in ms>]
+
+# Acquires the exclusive lock if there is no writer & no live reader
+# Otherwise, marks a writer as waiting so that new readers hold off
+# Returns the new fencing token, or -1 if not acquired
+_ACQUIRE_EXCLUSIVE_LOCK_SCRIPT = '''
+redis.call('zremrangebyscore', KEYS[2], '-inf', ARGV[3])
+if redis.call('exists', KEYS[1]) == 0 and redis.call('zcard', KEYS[2]) == 0 then
+    redis.call('set', KEYS[1], ARGV[1], 'px', ARGV[2])
+    redis.call('del', KEYS[4])
+    return redis.call('incr', KEYS[3])
+end
+redis.call('set', KEYS[4], ARGV[1], 'px', ARGV[4])
+return -1
+'''
+
+# Acquires a shared lock if there is no writer holding or waiting for the lock
+# Returns the current fencing token, or -1 if not acquired
+_ACQUIRE_SHARED_LOCK_SCRIPT = '''
+redis.call('zremrangebyscore', KEYS[2], '-inf', ARGV[3])
+if redis.call('exists', KEYS[1]) == 0 and redis.call('exists', KEYS[4]) == 0 then
+    redis.call('zadd', KEYS[2], tonumber(ARGV[3]) + tonumber(ARGV[2]), ARGV[1])
+    return tonumber(redis.call('get', KEYS[3]) or '0')
+end
+return -1
+'''
+
+# Releases the exclusive lock, only if it is held with the token
+_RELEASE_EXCLUSIVE_LOCK_SCRIPT = '''
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+'''
+
+# Releases a shared lock held with the token
+_RELEASE_SHARED_LOCK_SCRIPT = '''
+return redis.call('zrem', KEYS[2], ARGV[1])
+'''
+
+# Extends the expiry of the exclusive lock, only if it is held with the token
+_RENEW_EXCLUSIVE_LOCK_SCRIPT = '''
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+'''
+
+# Extends the expiry of a shared lock, only if it is held with the token
+_RENEW_SHARED_LOCK_SCRIPT = '''
+if redis.call('zscore', KEYS[2], ARGV[1]) then
+    redis.call('zadd', KEYS[2], tonumber(ARGV[3]) + tonumber(ARGV[2]), ARGV[1])
+    return 1
+end
+return 0
+'''
+
+# Connection pools shared by all Redis sessions in this process, by connection URL
+_connection_pools = {}
+_connection_pools_lock = threading.Lock()
 
 
 class RedisSession(object):
@@ -34,10 +108,14 @@ class RedisSession(object):
         Wraps Redis.
 
         If host & port are None, underlying Redis connection will be mocked.
+        Sessions to the same Redis server share a single connection pool in each process.
 
         Namespace usage:
 
-            <namespace>:lock  | 0-1 lock for this namespace, 1 for acquired
+            <namespace>:lock                | Token of the holder of the exclusive lock for this namespace, if any
+            <namespace>:lock:readers        | Sorted set of tokens of holders of shared locks, by expiry time
+            <namespace>:lock:fence          | Fencing token, incremented on each acquisition of the exclusive lock
+            <namespace>:lock:writer_waiting | Set while a writer is waiting for the exclusive lock
     '''
 
     def __init__(
@@ -49,51 +127,115 @@ class RedisSession(object):
             uuid.uuid4())  # Process identifier for distributed locking
         self._namespace = namespace
         self._redis = self._make_redis_client(redis_host, redis_port, os.environ.get('REDIS_PASSWORD', None))
-
-    def acquire_lock(self):
-        lock_value = self._uid
-        lock_name = self._get_redis_name('lock')
+        self._lock_scripts = {
+            name: self._redis.register_script(script)
+            for (name, script) in _LOCK_SCRIPTS.items()
+        }
+        self._lock_keys = [
+            self._get_redis_name(x)
+            for x in ['lock', 'lock:readers', 'lock:fence', 'lock:writer_waiting']
+        ]
+        self._lock_token = None  # Token of lock held by this session, if any
+        self._lock_shared = False
+        self._lock_renewal = None  # (<thread>, <stop event>) renewing the held lock
+
+    def acquire_lock(self, shared=False) -> int:
+        '''
+            Blocks until the lock for this namespace is acquired, retrying with exponential backoff & jitter.
+            While held, the lock is renewed in the background so that it doesn't expire.
+
+            With ``shared``, acquires a shared (read) lock, which can be held concurrently with other shared locks,
+            but not with the exclusive (write) lock. Waiting writers take precedence over new readers.
+
+            Returns a fencing token that increases with each acquisition of the exclusive lock;
+            a shared lock gets the token of the last acquisition of the exclusive lock.
+        '''
+        assert self._lock_token is None, 'Lock is already held by this session'
+        token = '{}:{}'.format(self._uid, uuid.uuid4())
+        script = self._lock_scripts['acquire_shared' if shared else 'acquire_exclusive']
+        lock_type = 'shared' if shared else 'exclusive'
 
         # Keep trying to acquire lock
-        res = None
-        while not res:
-            res = self._redis.set(lock_name,
-                                  lock_value,
-                                  nx=True,
-                                  ex=REDIS_LOCK_EXPIRE_SECONDS)
-            if not res:
-                sleep_secs = REDIS_LOCK_WAIT_SLEEP_SECONDS
-                logger.info(
-                    'Waiting for lock to be released, sleeping for {}s...'.
-                    format(sleep_secs))
-                time.sleep(sleep_secs)
+        start_time = time.monotonic()
+        sleep_secs = REDIS_LOCK_WAIT_MIN_SLEEP_SECONDS
+        is_wait_logged = False
+        while True:
+            fence = self._run_lock_script(script, token)
+            if fence >= 0:
+                break
+
+            wait_secs = time.monotonic() - start_time
+            if not is_wait_logged and wait_secs > REDIS_LOCK_WAIT_LOG_SECONDS:
+                logger.info('Waiting for {} lock on namespace {} for over {}s...'.format(
+                    lock_type, self._namespace, REDIS_LOCK_WAIT_LOG_SECONDS))
+                is_wait_logged = True
+
+            time.sleep(random.uniform(sleep_secs / 2, sleep_secs))
+            sleep_secs = min(sleep_secs * 2, REDIS_LOCK_WAIT_MAX_SLEEP_SECONDS)
+
+        get_histogram('redis_lock_wait_secs:{}'.format(lock_type)).observe(time.monotonic() - start_time)
+        self._lock_token = token
+        self._lock_shared = shared
+        self._start_lock_renewal()
+        return fence
 
     def release_lock(self):
-        lock_value = self._uid
-        lock_name = self._get_redis_name('lock')
+        token = self._lock_token
+        if token is None:
+            logger.info('Lock is not held - not releasing...')
+            return
+
+        self._stop_lock_renewal()
+        self._lock_token = None
 
-        # Only release lock if it's confirmed to be the one I acquired
+        # Only release lock if it's confirmed to be the one I acquired, atomically
         # Possible that it was a lock acquired by someone else after my lock expired
-        cur_lock_value = self._redis.get(lock_name)
-        cur_lock_value = cur_lock_value.decode(
-        ) if cur_lock_value is not None else None
-        if cur_lock_value == lock_value:
-            self._redis.delete(lock_name)
-        else:
+        script = self._lock_scripts['release_shared' if self._lock_shared else 'release_exclusive']
+        if not self._run_lock_script(script, token):
             logger.info('Lock is not mine - not releasing...')
 
+    @contextmanager
+    def lock(self, shared=False):
+        '''
+            Holds the lock for this namespace for the block, yielding its fencing token.
+            See ``acquire_lock``.
+        '''
+        fence = self.acquire_lock(shared=shared)
+        try:
+            yield fence
+        finally:
+            self.release_lock()
+
     def get(self, name):
         key = self._get_redis_name(name)
         value = self._redis.get(key)
         value = self._decode_value(value)
         return value
 
-    def set(self, name, value):
+    def mget(self, *names):
+        if len(names) == 0:
+            return []
+        keys = [self._get_redis_name(x) for x in names]
+        values = self._redis.mget(keys)
+        return [self._decode_value(x) for x in values]
+
+    def set(self, name, value, nx=False):
         key = self._get_redis_name(name)
         value = self._encode_value(value)
-        self._redis.set(key, value)
+        return self._redis.set(key, value, nx=nx)
+
+    def mset(self, mapping):
+        if len(mapping) == 0:
+            return
+        mapping = {
+            self._get_redis_name(name): self._encode_value(value)
+            for (name, value) in mapping.items()
+        }
+        self._redis.mset(mapping)
 
     def delete(self, *names):
+        if len(names) == 0:
+            return
         keys = [self._get_redis_name(x) for x in names]
         self._redis.delete(*keys)
 
@@ -130,6 +272,81 @@ class RedisSession(object):
         value = self._decode_value(value)
         return value
 
+    def wait_to_pop_from_lists(self, names, timeout_secs):
+        '''
+            Blocks for up to ``timeout_secs`` until any of the lists has a value, then pops the value at the end
+            of the first such list in ``names``, as ``pop_from_list`` would have.
+            Returns (<name of list>, <value>), or None if no list had a value before the timeout.
+        '''
+        keys = [self._get_redis_name(x) for x in names]
+        popped = self._redis.brpop(keys, timeout=int(math.ceil(timeout_secs)))
+        if popped is None:
+            return None
+
+        (key, value) = popped
+        key = key.decode() if isinstance(key, bytes) else key
+        return (names[keys.index(key)], self._decode_value(value))
+
+    def pop_many_from_list(self, name, count):
+        '''
+            Atomically pops up to ``count`` values from the end of a list in a single round-trip,
+            in the order that ``pop_from_list`` would have popped them.
+        '''
+        key = self._get_redis_name(name)
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.lrange(key, -count, -1)
+        pipe.ltrim(key, 0, -count - 1)
+        (values, _) = pipe.execute()
+        return [self._decode_value(x) for x in reversed(values)]
+
+    @contextmanager
+    def pipeline(self, transaction=True):
+        '''
+            Batches commands into a single round-trip, executed atomically if ``transaction`` is set.
+            Commands queued on the yielded ``RedisPipeline`` are executed at the end of the block,
+            unless ``RedisPipeline.execute`` has been called to retrieve their results.
+
+            For example:
+
+            ::
+
+                with redis.pipeline() as pipe:
+                    pipe.get('a')
+                    pipe.delete('a')
+                    (a, _) = pipe.execute()
+        '''
+        pipe = RedisPipeline(self, self._redis.pipeline(transaction=transaction))
+        yield pipe
+        if not pipe.is_executed:
+            pipe.execute()
+
+    def _run_lock_script(self, script, token):
+        now_ms = int(time.time() * 1000)
+        expire_ms = REDIS_LOCK_EXPIRE_SECONDS * 1000
+        writer_waiting_expire_ms = REDIS_LOCK_WRITER_WAITING_EXPIRE_SECONDS * 1000
+        return int(script(keys=self._lock_keys, args=[token, expire_ms, now_ms, writer_waiting_expire_ms]))
+
+    def _start_lock_renewal(self):
+        script = self._lock_scripts['renew_shared' if self._lock_shared else 'renew_exclusive']
+        token = self._lock_token
+        stop_event = threading.Event()
+
+        def renew():
+            while not stop_event.wait(REDIS_LOCK_RENEW_SECONDS):
+                if not self._run_lock_script(script, token):
+                    logger.warning('Lock on namespace {} was lost before it was released'.format(self._namespace))
+                    return
+
+        thread = threading.Thread(target=renew, daemon=True)
+        thread.start()
+        self._lock_renewal = (thread, stop_event)
+
+    def _stop_lock_renewal(self):
+        (thread, stop_event) = self._lock_renewal
+        stop_event.set()
+        thread.join()
+        self._lock_renewal = None
+
     def _encode_value(self, value):
         value = msgpack.packb(value, use_bin_type=True)
         return value
@@ -145,11 +362,9 @@ class RedisSession(object):
 
     def _make_redis_client(self, host, port, passwd):
         if host is not None and port is not None:
-            import redis
-            from redis import ConnectionPool
             from redis import StrictRedis
             cache_connection_url = 'redis://:{}@{}:{}'.format(passwd, host, port)
-            connection_pool = ConnectionPool.from_url(cache_connection_url)
+            connection_pool = _get_connection_pool(cache_connection_url)
             client = StrictRedis(connection_pool=connection_pool,
                                  decode_responses=True)
             logger.info(
@@ -161,24 +376,123 @@ class RedisSession(object):
         return client
 
 
+class RedisPipeline(object):
+    '''
+        Queues commands of a ``RedisSession`` to be sent to Redis in a single round-trip.
+        Values are encoded & decoded as in ``RedisSession``.
+    '''
+
+    def __init__(self, session: RedisSession, pipe):
+        self._session = session
+        self._pipe = pipe
+        self._decoders = []  # Decoder for the result of each queued command
+        self.is_executed = False
+
+    def get(self, name):
+        self._pipe.get(self._session._get_redis_name(name))
+        self._decoders.append(self._session._decode_value)
+
+    def mget(self, *names):
+        keys = [self._session._get_redis_name(x) for x in names]
+        self._pipe.mget(keys)
+        self._decoders.append(lambda values: [self._session._decode_value(x) for x in values])
+
+    def set(self, name, value, nx=False):
+        key = self._session._get_redis_name(name)
+        self._pipe.set(key, self._session._encode_value(value), nx=nx)
+        self._decoders.append(None)
+
+    def mset(self, mapping):
+        mapping = {
+            self._session._get_redis_name(name): self._session._encode_value(value)
+            for (name, value) in mapping.items()
+        }
+        self._pipe.mset(mapping)
+        self._decoders.append(None)
+
+    def delete(self, *names):
+        keys = [self._session._get_redis_name(x) for x in names]
+        self._pipe.delete(*keys)
+        self._decoders.append(None)
+
+    def add_to_set(self, name, *values):
+        key = self._session._get_redis_name(name)
+        self._pipe.sadd(key, *[self._session._encode_value(x) for x in values])
+        self._decoders.append(None)
+
+    def prepend_to_list(self, name, *values):
+        key = self._session._get_redis_name(name)
+        self._pipe.lpush(key, *[self._session._encode_value(x) for x in values])
+        self._decoders.append(None)
+
+    def execute(self):
+        results = self._pipe.execute()
+        self.is_executed = True
+        return [
+            decode(x) if decode is not None else x
+            for (decode, x) in zip(self._decoders, results)
+        ]
+
+
+_LOCK_SCRIPTS = {
+    'acquire_exclusive': _ACQUIRE_EXCLUSIVE_LOCK_SCRIPT,
+    'acquire_shared': _ACQUIRE_SHARED_LOCK_SCRIPT,
+    'release_exclusive': _RELEASE_EXCLUSIVE_LOCK_SCRIPT,
+    'release_shared': _RELEASE_SHARED_LOCK_SCRIPT,
+    'renew_exclusive': _RENEW_EXCLUSIVE_LOCK_SCRIPT,
+    'renew_shared': _RENEW_SHARED_LOCK_SCRIPT
+}
+
+
+def _get_connection_pool(connection_url):
+    with _connection_pools_lock:
+        connection_pool = _connection_pools.get(connection_url)
+        if connection_pool is None:
+            from redis import ConnectionPool
+            connection_pool = ConnectionPool.from_url(connection_url)
+            _connection_pools[connection_url] = connection_pool
+
+        return connection_pool
+
+
 class MockRedis():
     data = {}
+    _expire_at = {}  # Expiry time in ms of keys with expiry, by key
+    _lock = threading.RLock()  # Makes multi-step commands & scripts atomic across threads
+    _list_cond = threading.Condition(_lock)  # Notified when values are added to lists, for blocking pops
 
     def get(self, key):
+        self._expire(key)
         value = self.data.get(key)
         return value
 
-    def set(self, key, value, **kwargs):
-        is_set = (key in self.data)
-        if isinstance(value, str):
-            value = value.encode()
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
 
-        self.data[key] = value
-        return not is_set
+    def set(self, key, value, nx=False, ex=None, px=None):
+        with self._lock:
+            self._expire(key)
+            is_set = (key in self.data)
+            if nx and is_set:
+                return None
+
+            if isinstance(value, str):
+                value = value.encode()
+
+            self.data[key] = value
+            self._expire_at.pop(key, None)
+            if ex is not None or px is not None:
+                px = px if px is not None else ex * 1000
+                self._expire_at[key] = _now_ms() + int(px)
+            return True
+
+    def mset(self, mapping):
+        for (key, value) in mapping.items():
+            self.set(key, value)
+        return True
 
     def keys(self, patt):
-        # TODO: Do more accurate implementation based on pattern
-        return self.data.keys()
+        return [key for key in self.data.keys() if fnmatch.fnmatchcase(key, patt)]
 
     def sadd(self, key, *values):
         if key not in self.data:
@@ -214,16 +528,19 @@ class MockRedis():
         return list(self.data[key])
 
     def lpush(self, key, *values):
-        if key not in self.data:
-            self.data[key] = list()
+        with self._list_cond:
+            if key not in self.data:
+                self.data[key] = list()
 
-        if not isinstance(self.data[key], list):
-            raise KeyError(f'Value at key "{key}" is not a list')
+            if not isinstance(self.data[key], list):
+                raise KeyError(f'Value at key "{key}" is not a list')
 
-        for value in values:
-            if isinstance(value, str):
-                value = value.encode()
-            self.data[key].insert(0, value)
+            for value in values:
+                if isinstance(value, str):
+                    value = value.encode()
+                self.data[key].insert(0, value)
+
+            self._list_cond.notify_all()
 
     def rpop(self, key):
         if key not in self.data:
@@ -237,9 +554,171 @@ class MockRedis():
 
         return self.data[key].pop()
 
+    def brpop(self, keys, timeout=0):
+        # As in Redis, a timeout of 0 blocks indefinitely
+        deadline = time.monotonic() + timeout
+        with self._list_cond:
+            while True:
+                for key in keys:
+                    values = self.data.get(key)
+                    if isinstance(values, list) and len(values) > 0:
+                        return (key.encode(), values.pop())
+
+                wait_secs = deadline - time.monotonic() if timeout > 0 else None
+                if wait_secs is not None and wait_secs <= 0:
+                    return None
+                self._list_cond.wait(wait_secs)
+
+    def lrange(self, key, start, end):
+        values = self.data.get(key, [])
+        if not isinstance(values, list):
+            raise KeyError(f'Value at key "{key}" is not a list')
+
+        # Redis' ranges are inclusive of ``end``, and negative indexes are offsets from the end
+        n = len(values)
+        start = max(n + start, 0) if start < 0 else start
+        end = min(n + end if end < 0 else end, n - 1)
+        if start > end:
+            return []
+        return values[start:end + 1]
+
+    def ltrim(self, key, start, end):
+        if key in self.data:
+            self.data[key] = self.lrange(key, start, end)
+        return True
+
     def delete(self, *keys):
         if len(keys) == 0:
             raise ValueError('Need at least 1 key to delete')
 
+        deleted = 0
         for key in keys:
-            del self.data[key]
+            self._expire(key)
+            self._expire_at.pop(key, None)
+            if self.data.pop(key, None) is not None:
+                deleted += 1
+        return deleted
+
+    def pipeline(self, transaction=True):
+        return MockPipeline(self)
+
+    def register_script(self, script):
+        return MockScript(self, script)
+
+    def _expire(self, key):
+        expire_at = self._expire_at.get(key)
+        if expire_at is not None and expire_at <= _now_ms():
+            self._expire_at.pop(key, None)
+            self.data.pop(key, None)
+
+
+class MockPipeline():
+    '''
+        Queues commands on ``MockRedis``, running them in order on ``execute``.
+    '''
+
+    def __init__(self, redis: MockRedis):
+        self._redis = redis
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self._redis, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        with self._redis._lock:
+            results = [method(*args, **kwargs) for (method, args, kwargs) in self._commands]
+        self._commands = []
+        return results
+
+
+class MockScript():
+    '''
+        Runs one of the lock's Lua scripts on ``MockRedis``, with an equivalent Python implementation.
+    '''
+
+    def __init__(self, redis: MockRedis, script):
+        self._redis = redis
+        self._run = _MOCK_LOCK_SCRIPTS[script]
+
+    def __call__(self, keys=[], args=[]):
+        with self._redis._lock:
+            return self._run(self._redis, keys, [str(x) for x in args])
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _mock_get_readers(redis, keys, now_ms):
+    # Readers are stored as { <token>: <expiry in ms> }, with expired readers removed
+    readers = {
+        token: expire_at
+        for (token, expire_at) in redis.data.get(keys[1], {}).items()
+        if expire_at > now_ms
+    }
+    redis.data[keys[1]] = readers
+    return readers
+
+
+def _mock_acquire_exclusive_lock(redis, keys, args):
+    (token, expire_ms, now_ms) = (args[0], int(args[1]), int(args[2]))
+    readers = _mock_get_readers(redis, keys, now_ms)
+    if redis.get(keys[0]) is None and len(readers) == 0:
+        redis.set(keys[0], token, px=expire_ms)
+        redis.delete(keys[3])
+        fence = int(redis.get(keys[2]) or 0) + 1
+        redis.set(keys[2], str(fence))
+        return fence
+    redis.set(keys[3], token, px=int(args[3]))
+    return -1
+
+
+def _mock_acquire_shared_lock(redis, keys, args):
+    (token, expire_ms, now_ms) = (args[0], int(args[1]), int(args[2]))
+    readers = _mock_get_readers(redis, keys, now_ms)
+    if redis.get(keys[0]) is None and redis.get(keys[3]) is None:
+        readers[token] = now_ms + expire_ms
+        return int(redis.get(keys[2]) or 0)
+    return -1
+
+
+def _mock_release_exclusive_lock(redis, keys, args):
+    if redis.get(keys[0]) == args[0].encode():
+        return redis.delete(keys[0])
+    return 0
+
+
+def _mock_release_shared_lock(redis, keys, args):
+    readers = redis.data.get(keys[1], {})
+    return 1 if readers.pop(args[0], None) is not None else 0
+
+
+def _mock_renew_exclusive_lock(redis, keys, args):
+    if redis.get(keys[0]) == args[0].encode():
+        redis._expire_at[keys[0]] = _now_ms() + int(args[1])
+        return 1
+    return 0
+
+
+def _mock_renew_shared_lock(redis, keys, args):
+    readers = redis.data.get(keys[1], {})
+    if args[0] in readers:
+        readers[args[0]] = int(args[2]) + int(args[1])
+        return 1
+    return 0
+
+
+_MOCK_LOCK_SCRIPTS = {
+    _ACQUIRE_EXCLUSIVE_LOCK_SCRIPT: _mock_acquire_exclusive_lock,
+    _ACQUIRE_SHARED_LOCK_SCRIPT: _mock_acquire_shared_lock,
+    _RELEASE_EXCLUSIVE_LOCK_SCRIPT: _mock_release_exclusive_lock,
+    _RELEASE_SHARED_LOCK_SCRIPT: _mock_release_shared_lock,
+    _RENEW_EXCLUSIVE_LOCK_SCRIPT: _mock_renew_exclusive_lock,
+    _RENEW_SHARED_LOCK_SCRIPT: _mock_renew_shared_lock
+}
@@ -17,15 +17,16 @@
 # under the License.
 #
 
-from typing import Union, List
+from typing import Union, List, Tuple
 import logging
 
-from singa_auto.advisor import Proposal, TrialResult
+from singa_auto.advisor import Proposal, TrialResult, IntermediateResult
 from .redis import RedisSession
 
 logger = logging.getLogger(__name__)
 
 REDIS_NAMESPACE = 'TRAIN'
+MAX_RESULTS_PER_TAKE = 1000
 
 
 class TrainCache(object):
@@ -33,15 +34,20 @@ class TrainCache(object):
     Caches proposals and trial results to facilitate communication between advisor & train workers.
 
     For each session, assume a single advisor and multiple train workers running concurrently.
+    Proposals & results are exchanged through queues, so that workers block until their next proposal
+    and the advisor blocks until the next result, rather than polling for them.
 
     :param str session_id: Associated session ID
     '''
     '''
         Internally, organises data into these Redis namespaces:
 
-        workers:<worker_id>:proposal  | Proposal for worker
-        workers:<worker_id>:result    | Result from worker
-        workers                       | Set of IDs of workers that are free
+        workers:<worker_id>:proposals | Queue of proposals for worker
+        workers:<worker_id>:stop      | ID of worker's running trial that is to be stopped early
+        workers                       | Set of IDs of workers that are running
+        results                       | Queue of results of trials from all workers, each freeing up its worker,
+                                      | where a worker that has just started is freed up without a result
+        intermediate_results          | Queue of intermediate results of running trials, from all workers
     '''
 
     def __init__(self, session_id='local', redis_host=None, redis_port=None):
@@ -56,35 +62,64 @@ class TrainCache(object):
         worker_ids = self._redis.list_set('workers') or []
         return worker_ids
 
-    def take_result(self, worker_id) -> Union[TrialResult, None]:
-        name = f'workers:{worker_id}:result'
-        result = self._redis.get(name)
-        if result is None:
-            return None
+    def take_results(self, timeout_secs) -> Tuple[List[Tuple[str, Union[TrialResult, None]]], List[Tuple[str, IntermediateResult]]]:
+        '''
+            Blocks for up to ``timeout_secs`` until there are results or intermediate results,
+            then retrieves & clears all of them, in the order they were submitted.
 
-        # Clear result from Redis
-        self._redis.delete(name)
-        logger.info(f'Retrieved result "{result}" for worker "{worker_id}"')
-        return TrialResult.from_jsonable(result)
+            :returns: (<list of (<worker ID>, <result, or None if worker has just started>)>, <list of (<worker ID>, <intermediate result>)>),
+                each list being of workers that are now free & running trials respectively
+        '''
+        popped = self._redis.wait_to_pop_from_lists(['intermediate_results', 'results'], timeout_secs)
+        if popped is None:
+            return ([], [])
 
-    def get_proposal(self, worker_id: str) -> Union[Proposal, None]:
-        name = f'workers:{worker_id}:proposal'
-        proposal = self._redis.get(name)
-        if proposal is None:
-            return None
-        proposal = Proposal.from_jsonable(proposal)
-        return proposal
+        # Take the rest of the queued results, without blocking
+        (name, value) = popped
+        values = {'results': [], 'intermediate_results': []}
+        values[name].append(value)
+        for (name, name_values) in values.items():
+            name_values.extend(self._redis.pop_many_from_list(name, MAX_RESULTS_PER_TAKE))
+
+        results = []
+        for x in values['results']:
+            result = TrialResult.from_jsonable(x['result']) if x['result'] is not None else None
+            logger.info(f'Retrieved result "{result}" for worker "{x["worker_id"]}"')
+            results.append((x['worker_id'], result))
+
+        intermediate_results = [(x['worker_id'], IntermediateResult.from_jsonable(x['result']))
+                                for x in values['intermediate_results']]
+
+        return (results, intermediate_results)
 
     def create_proposal(self, worker_id: str, proposal: Proposal):
-        name = f'workers:{worker_id}:proposal'
-        assert self._redis.get(name) is None
-        logger.info(
-            f'Creating proposal "{proposal}" for worker "{worker_id}"...')
-        self._redis.set(name, proposal.to_jsonable())
+        self.create_proposals([(worker_id, proposal)])
+
+    def create_proposals(self, worker_proposals: List[Tuple[str, Proposal]]):
+        '''
+            Sends proposals to multiple workers in a single round-trip.
+
+            :param worker_proposals: List of (<worker ID>, <proposal for worker>)
+        '''
+        if len(worker_proposals) == 0:
+            return
+
+        with self._redis.pipeline() as pipe:
+            for (worker_id, proposal) in worker_proposals:
+                logger.info(f'Creating proposal "{proposal}" for worker "{worker_id}"...')
+                pipe.prepend_to_list(f'workers:{worker_id}:proposals', proposal.to_jsonable())
+
+    def stop_trial(self, worker_id: str, trial_id: str):
+        '''
+            Signals the worker to stop its running trial early.
+        '''
+        name = f'workers:{worker_id}:stop'
+        logger.info(f'Stopping trial "{trial_id}" of worker "{worker_id}"...')
+        self._redis.set(name, trial_id)
 
     def clear_all(self):
         logger.info(f'Clearing proposals & trial results...')
-        self._redis.delete('workers')
+        self._redis.delete('workers', 'results', 'intermediate_results')
         self._redis.delete_pattern('workers:*')
 
     ####################################
@@ -92,18 +127,44 @@ class TrainCache(object):
     ####################################
 
     def add_worker(self, worker_id: str):
-        self._redis.add_to_set('workers', worker_id)
+        '''
+            Adds the worker to the set of running workers, and frees it up for its first proposal.
+        '''
+        with self._redis.pipeline() as pipe:
+            pipe.add_to_set('workers', worker_id)
+            pipe.prepend_to_list('results', {'worker_id': worker_id, 'result': None})
+
+    def wait_for_proposal(self, worker_id: str, timeout_secs) -> Union[Proposal, None]:
+        '''
+            Blocks for up to ``timeout_secs`` until the worker's next proposal, returning it and clearing it,
+            or returns None if there is no proposal before the timeout.
+        '''
+        popped = self._redis.wait_to_pop_from_lists([f'workers:{worker_id}:proposals'], timeout_secs)
+        if popped is None:
+            return None
 
-    def delete_proposal(self, worker_id: str):
-        name = f'workers:{worker_id}:proposal'
-        logger.info(f'Deleting existing proposal for worker "{worker_id}"...')
-        self._redis.delete(name)
+        (_, proposal) = popped
+        return Proposal.from_jsonable(proposal)
 
     def delete_worker(self, worker_id: str):
         self._redis.delete_from_set('workers', worker_id)
 
-    def create_result(self, worker_id: str, result: TrialResult):
-        name = f'workers:{worker_id}:result'
-        assert self._redis.get(name) is None
-        logger.info(f'Creating result "{result}" for worker "{worker_id}"...')
-        self._redis.set(name, result.to_jsonable())
+    def submit_result(self, worker_id: str, result: TrialResult):
+        '''
+            Submits the result of the worker's trial, freeing up the worker for its next proposal.
+        '''
+        logger.info(f'Submitting result "{result}" for worker "{worker_id}"...')
+        self._redis.prepend_to_list('results', {'worker_id': worker_id, 'result': result.to_jsonable()})
+
+    def add_intermediate_result(self, worker_id: str, result: IntermediateResult):
+        self._redis.prepend_to_list('intermediate_results', {
+            'worker_id': worker_id,
+            'result': result.to_jsonable()
+        })
+
+    def is_trial_stopped(self, worker_id: str, trial_id: str) -> bool:
+        '''
+            Returns whether the worker's running trial is to be stopped early.
+        '''
+        name = f'workers:{worker_id}:stop'
+        return self._redis.get(name) == trial_id
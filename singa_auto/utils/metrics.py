@@ -0,0 +1,134 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+HISTOGRAM_MAX_SAMPLES = 10000
+
+# Histograms of this process, by name
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+class Histogram:
+    '''
+        Thread-safe histogram of observed values (e.g. durations in seconds).
+
+        Count, sum, min & max cover all observed values, while percentiles are computed over
+        the most recent ``max_samples`` values.
+    '''
+
+    def __init__(self, name: str, max_samples: int = HISTOGRAM_MAX_SAMPLES):
+        self.name = name
+        self._samples = deque(maxlen=max_samples)
+        self._count = 0
+        self._sum = 0.0
+        self._min = None
+        self._max = None
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._samples.append(value)
+            self._count += 1
+            self._sum += value
+            self._min = value if self._min is None else min(self._min, value)
+            self._max = value if self._max is None else max(self._max, value)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) == 0:
+            return None
+        return _percentile(samples, q)
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            (count, total, min_value, max_value) = (self._count, self._sum, self._min, self._max)
+
+        if count == 0:
+            return {'count': 0}
+
+        return {
+            'count': count,
+            'sum': total,
+            'mean': total / count,
+            'min': min_value,
+            'max': max_value,
+            'p50': _percentile(samples, 50),
+            'p90': _percentile(samples, 90),
+            'p99': _percentile(samples, 99)
+        }
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._count = 0
+            self._sum = 0.0
+            self._min = None
+            self._max = None
+
+
+def get_histogram(name: str) -> Histogram:
+    '''
+        Gets the histogram of name ``name`` of this process, creating it if it doesn't exist.
+    '''
+    with _histograms_lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = Histogram(name)
+            _histograms[name] = histogram
+
+        return histogram
+
+
+def get_histograms() -> dict:
+    '''
+        Gets all histograms of this process, as a { <name>: <histogram> } dictionary.
+    '''
+    with _histograms_lock:
+        return dict(_histograms)
+
+
+@contextmanager
+def timed(histogram: Histogram):
+    '''
+        Observes the time taken in seconds by the block in ``histogram``.
+    '''
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        histogram.observe(time.monotonic() - start)
+
+
+# Linearly interpolated percentile of sorted, non-empty ``samples``
+def _percentile(samples, q):
+    pos = (len(samples) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(samples) - 1)
+    return samples[lo] + (samples[hi] - samples[lo]) * (pos - lo)
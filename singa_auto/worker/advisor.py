@@ -19,18 +19,20 @@
 
 import logging
 import os
-from typing import Dict
 import time
+from typing import Dict
 import traceback
 
 from singa_auto.utils.auth import superadmin_client
+from singa_auto.utils.metrics import get_histogram
 from singa_auto.meta_store import MetaStore
 from singa_auto.model import load_model_class
 from singa_auto.advisor import make_advisor, BaseAdvisor
 from singa_auto.redis import TrainCache, ParamCache
 from singa_auto.error_code import InvalidSubTrainJobError
 
-LOOP_SLEEP_SECS = 0.1
+RESULT_WAIT_SECS = 5  # Max time to block for the next result at a time, between checks of the budget
+METRICS_LOG_INTERVAL_SECS = 60
 
 
 logger = logging.getLogger(__name__)
@@ -40,6 +42,8 @@ class _WorkerInfo:
 
     def __init__(self):
         self.trial_id: int = None  # ID of pending trial assigned to worker, None if there is no pending trial
+        self.is_stopped = False  # Whether pending trial has been stopped early
+        self.is_free = False  # Whether worker is waiting for a proposal
 
 
 class AdvisorWorker:
@@ -53,6 +57,9 @@ class AdvisorWorker:
         self._advisor: BaseAdvisor = None
         self._worker_infos: Dict[str, _WorkerInfo] = {
         }  # { <worker_id> : <info about worker> }
+        self._cpu_secs_per_proposal_hist = get_histogram('advisor_cpu_secs_per_proposal')
+        self._cpu_time: float = None  # CPU time of advisor process as of the last proposals
+        self._metrics_logged_time = time.monotonic()
 
     def start(self):
         self._monitor.pull_job_info()
@@ -61,6 +68,7 @@ class AdvisorWorker:
         self._param_cache = ParamCache(self._monitor.sub_train_job_id,
                                        self._redis_host, self._redis_port)
         self._advisor = self._make_advisor()
+        self._cpu_time = time.process_time()
 
         logger.info(
             f'Starting advisor for sub train job "{self._monitor.sub_train_job_id}"...'
@@ -72,7 +80,7 @@ class AdvisorWorker:
             if not self._make_proposals():
                 self._notify_budget_reached()
                 break
-            time.sleep(LOOP_SLEEP_SECS)
+            self._maybe_log_metrics()
 
     def stop(self):
         self._notify_stop()
@@ -105,63 +113,95 @@ class AdvisorWorker:
 
         return advisor
 
-    # Fetch results of workers
+    # Wait for results of workers, stopping running trials early as advised
     def _fetch_results(self):
-        for (worker_id, info) in self._worker_infos.items():
-            # If no pending trial, skip
-            if info.trial_id is None:
-                continue
+        (results, intermediate_results) = self._train_cache.take_results(RESULT_WAIT_SECS)
 
-            # Fetch result for worker
-            # If no result yet, skip
-            result = self._train_cache.take_result(worker_id)
-            if result is None:
+        for (worker_id, result) in intermediate_results:
+            # Ignore results of trials that are no longer running
+            info = self._worker_infos.get(worker_id)
+            if info is None or info.trial_id != result.trial_id or info.is_stopped:
                 continue
 
-            # Pass result to advisor
-            self._advisor.feedback(worker_id, result)
-
-            # Mark worker as not pending
-            info.trial_id = None
+            if self._advisor.should_stop(worker_id, result):
+                logger.info(f'Stopping trial #{result.trial_no} at step {result.step} early...')
+                self._train_cache.stop_trial(worker_id, result.trial_id)
+                info.is_stopped = True
 
-    # Make proposals for workers
-    # Returns False if tuning is to be stopped
-    def _make_proposals(self):
-        # For each free worker
-        worker_ids = self._train_cache.get_workers()
-        for worker_id in worker_ids:
+        for (worker_id, result) in results:
             # If new worker, add info
             if worker_id not in self._worker_infos:
                 self._worker_infos[worker_id] = _WorkerInfo()
+            info = self._worker_infos[worker_id]
 
-            # Get info for worker
-            worker_info = self._worker_infos[worker_id]
-
-            # Check that worker doesn't already have a proposal
-            proposal = self._train_cache.get_proposal(worker_id)
-            if proposal is not None:
-                continue
-
-            # Create trial
-            (trial_no, trial_id) = self._monitor.create_next_trial(worker_id)
+            # Pass result to advisor
+            if result is not None and info.trial_id is not None:
+                self._advisor.feedback(worker_id, result)
 
-            # Make proposal to free worker
-            proposal = self._advisor.propose(worker_id, trial_no)
+            # Mark worker as free
+            info.trial_id = None
+            info.is_free = True
 
+    # Make proposals for workers
+    # Returns False if tuning is to be stopped
+    def _make_proposals(self):
+        # Find free workers that are still running
+        free_worker_ids = [worker_id for (worker_id, info) in self._worker_infos.items() if info.is_free]
+        if len(free_worker_ids) == 0:
+            return True
+
+        worker_ids = set(self._train_cache.get_workers())
+        for worker_id in free_worker_ids:
+            if worker_id not in worker_ids:
+                self._worker_infos[worker_id].is_free = False
+        free_worker_ids = [x for x in free_worker_ids if x in worker_ids]
+        if len(free_worker_ids) == 0:
+            return True
+
+        # Make proposals to all free workers at once
+        worker_trials = [(worker_id, self._monitor.next_trial_no()) for worker_id in free_worker_ids]
+        proposals = self._advisor.propose_many(worker_trials)
+        self._observe_cpu_time(len(proposals))
+
+        worker_proposals = []
+        to_stop = False
+        for ((worker_id, trial_no), proposal) in zip(worker_trials, proposals):
             # If advisor has no more proposals, to stop tuning
             if proposal is None:
-                return False
+                to_stop = True
+                break
 
-            # Attach trial ID to proposal
+            # Create trial & attach its ID to proposal
+            trial_id = self._monitor.create_trial(worker_id, trial_no)
             proposal.trial_id = trial_id
-
-            # Push proposal to worker
-            self._train_cache.create_proposal(worker_id, proposal)
+            worker_proposals.append((worker_id, proposal))
 
             # Associate trial ID to worker
-            worker_info.trial_id = trial_id
+            info = self._worker_infos[worker_id]
+            info.trial_id = trial_id
+            info.is_stopped = False
+            info.is_free = False
+
+        # Push proposals to workers, all at once
+        self._train_cache.create_proposals(worker_proposals)
+
+        return not to_stop
+
+    # Attribute CPU time of the advisor since the last proposals, including ingesting feedback
+    # & any work of the advisor in background threads, to the proposals just made
+    def _observe_cpu_time(self, num_proposals):
+        cpu_time = time.process_time()
+        cpu_secs_per_proposal = (cpu_time - self._cpu_time) / max(num_proposals, 1)
+        for _ in range(num_proposals):
+            self._cpu_secs_per_proposal_hist.observe(cpu_secs_per_proposal)
+        self._cpu_time = cpu_time
+
+    def _maybe_log_metrics(self):
+        if time.monotonic() - self._metrics_logged_time < METRICS_LOG_INTERVAL_SECS:
+            return
 
-        return True
+        logger.info(f'Advisor CPU time per proposal (s): {self._cpu_secs_per_proposal_hist.summary()}')
+        self._metrics_logged_time = time.monotonic()
 
     def _notify_budget_reached(self):
         superadmin_client().send_event(
@@ -226,11 +266,13 @@ class _SubTrainJobMonitor():
             self._num_trials = len(trials)
             self._model_id = model.id
 
-    # Returns created trial number
-    def create_next_trial(self, worker_id):
+    # Returns next trial number
+    def next_trial_no(self):
         self._num_trials += 1
-        trial_no = self._num_trials
+        return self._num_trials
 
+    # Returns ID of created trial
+    def create_trial(self, worker_id, trial_no):
         with self._meta_store:
             trial = self._meta_store.create_trial(self.sub_train_job_id,
                                                   trial_no, self._model_id,
@@ -240,4 +282,4 @@ class _SubTrainJobMonitor():
 
             logger.info(
                 f'Created trial #{trial_no} of ID "{trial_id}" in meta store')
-            return (trial_no, trial_id)
+            return trial_id
@@ -19,22 +19,28 @@
 
 import logging
 import os
-from typing import List, Type
 import time
+from typing import List, Type
 import traceback
+from collections import defaultdict
 
+from singa_auto.constants import InferenceBudgetOption
 from singa_auto.utils.auth import superadmin_client
+from singa_auto.utils.metrics import get_histogram
 from singa_auto.meta_store import MetaStore
 from singa_auto.model import load_model_class, BaseModel
 from singa_auto.advisor import Proposal
-from singa_auto.param_store import FileParamStore
+from singa_auto.param_store import make_param_store
 from singa_auto.predictor import Query, Prediction
 from singa_auto.redis import InferenceCache as RedisInferenceCache
 from singa_auto.kafka import InferenceCache as KafkaInferenceCache
 from singa_auto.error_code import InvalidWorkerError, InvalidTrialError
 
-LOOP_SLEEP_SECS = 0.1
-PREDICT_BATCH_SIZE = 32
+QUERIES_WAIT_TIMEOUT_SECS = 1
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_QUEUE_DELAY_MS = 10
+ARRIVAL_RATE_SMOOTHING = 0.2  # Weight of latest sample in moving average of query arrival rate
+METRICS_LOG_INTERVAL_SECS = 60
 
 
 logger = logging.getLogger(__name__)
@@ -50,12 +56,18 @@ class InferenceWorker():
         self._service_id = service_id
         self._worker_id = worker_id
         self._meta_store = meta_store or MetaStore()
-        self._param_store = param_store or FileParamStore()
+        self._param_store = param_store or make_param_store()
         self._redis_host = os.getenv('REDIS_HOST', 'singa_auto_redis')
         self._redis_port = os.getenv('REDIS_PORT', 6379)
         self._kafka_host = os.getenv('KAFKA_HOST', 'singa_auto_kafka')
         self._kafka_port = os.getenv('KAFKA_PORT', 9092)
-        self._batch_size = PREDICT_BATCH_SIZE
+        self._max_batch_size = DEFAULT_MAX_BATCH_SIZE
+        self._max_queue_delay_secs = DEFAULT_MAX_QUEUE_DELAY_MS / 1000
+        self._arrival_rate = 0  # Moving average of no. of queries arriving per second
+        self._last_fetch_time = None
+        self._batch_size_hist = get_histogram('inference_batch_size')
+        self._queue_delay_hist = get_histogram('inference_queue_delay_secs')
+        self._metrics_logged_time = time.monotonic()
         self._redis_cache: RedisInferenceCache = None
         self._inference_job_id = None
         self._model_inst: BaseModel = None
@@ -79,12 +91,12 @@ class InferenceWorker():
         self._model_inst = self._load_trial_model()
 
         while True:
+            # Blocks on the broker until queries arrive
             queries = self._fetch_queries()
             if len(queries) > 0:
                 predictions = self._predict(queries)
-                self._submit_predictions(predictions)
-            else:
-                time.sleep(LOOP_SLEEP_SECS)
+                self._submit_predictions(queries, predictions)
+            self._maybe_log_metrics()
 
     def stop(self):
         self._notify_stop()
@@ -158,6 +170,12 @@ class InferenceWorker():
                 self._store_params_id = trial.store_params_id
 
             self._inference_job_id = inference_job.id
+            budget = inference_job.budget or {}
+            self._max_batch_size = int(budget.get(InferenceBudgetOption.MAX_BATCH_SIZE, DEFAULT_MAX_BATCH_SIZE))
+            self._max_queue_delay_secs = float(
+                budget.get(InferenceBudgetOption.MAX_QUEUE_DELAY_MS, DEFAULT_MAX_QUEUE_DELAY_MS)) / 1000
+            logger.info(f'Batching up to {self._max_batch_size} queries, '
+                        f'waiting up to {self._max_queue_delay_secs}s to fill batch')
             self._py_model_class = load_model_class(model.model_file_bytes, 
                                                     model.model_class, None, 
                                                     model.model_type, 
@@ -165,7 +183,7 @@ class InferenceWorker():
 
     def _load_trial_model(self):
         logger.info('Loading saved model parameters from store...')
-        params = self._param_store.load(self._store_params_id)
+        params = self._param_store.load(self._store_params_id, mmap=True)
 
         logger.info('Loading trial\'s trained model...')
         model_inst = self._py_model_class(**self._proposal.knobs)
@@ -179,10 +197,46 @@ class InferenceWorker():
         self._redis_cache.add_worker(self._worker_id)
 
     def _fetch_queries(self) -> List[Query]:
+        # Block until the first queries of the batch arrive
         queries = self._kafka_cache.pop_queries_for_worker(
-            self._worker_id, self._batch_size)
+            self._worker_id, self._max_batch_size, timeout_secs=QUERIES_WAIT_TIMEOUT_SECS)
+        if len(queries) == 0:
+            return queries
+
+        # Take queries that are already queued, then under load, wait for more to fill the batch until the deadline
+        # When idle (i.e. no more queries are expected to arrive before the deadline), dispatch immediately
+        first_query_time = time.monotonic()
+        deadline = first_query_time + self._max_queue_delay_secs
+        while len(queries) < self._max_batch_size:
+            remaining_secs = deadline - time.monotonic()
+            is_under_load = self._arrival_rate * remaining_secs >= 1
+            timeout_secs = remaining_secs if is_under_load else 0
+            more_queries = self._kafka_cache.pop_queries_for_worker(
+                self._worker_id, self._max_batch_size - len(queries), timeout_secs=max(timeout_secs, 0))
+            if len(more_queries) == 0:
+                break
+            queries += more_queries
+
+        self._update_arrival_rate(len(queries))
+        self._batch_size_hist.observe(len(queries))
+        self._queue_delay_hist.observe(time.monotonic() - first_query_time)
         return queries
 
+    def _update_arrival_rate(self, query_count):
+        now = time.monotonic()
+        if self._last_fetch_time is not None:
+            rate = query_count / max(now - self._last_fetch_time, 1e-6)
+            self._arrival_rate = ARRIVAL_RATE_SMOOTHING * rate + (1 - ARRIVAL_RATE_SMOOTHING) * self._arrival_rate
+        self._last_fetch_time = now
+
+    def _maybe_log_metrics(self):
+        if time.monotonic() - self._metrics_logged_time < METRICS_LOG_INTERVAL_SECS:
+            return
+
+        logger.info(f'Batch sizes: {self._batch_size_hist.summary()}')
+        logger.info(f'Queue delays (s): {self._queue_delay_hist.summary()}')
+        self._metrics_logged_time = time.monotonic()
+
     def _predict(self, queries: List[Query]) -> List[Prediction]:
         # Pass queries to model, set null predictions if it errors
         try:
@@ -200,9 +254,19 @@ class InferenceWorker():
 
         return predictions
 
-    def _submit_predictions(self, predictions: List[Prediction]):
-        self._kafka_cache.add_predictions_for_worker(self._worker_id,
-                                                     predictions)
+    def _submit_predictions(self, queries: List[Query], predictions: List[Prediction]):
+        # Reply to the channel of each query, if any
+        # Queries from predictors of older versions have no ``reply_to``, and their predictions are kept for this worker
+        channel_to_predictions = defaultdict(list)
+        for (query, prediction) in zip(queries, predictions):
+            channel_to_predictions[getattr(query, 'reply_to', None)].append(prediction)
+
+        for (channel, channel_predictions) in channel_to_predictions.items():
+            if channel is None:
+                self._kafka_cache.add_predictions_for_worker(self._worker_id,
+                                                             channel_predictions)
+            else:
+                self._kafka_cache.add_replies(channel, channel_predictions)
 
     def _notify_stop(self):
         self._redis_cache.delete_worker(self._worker_id)
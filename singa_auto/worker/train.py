@@ -21,19 +21,20 @@ import logging
 import os
 from typing import Union
 import traceback
-import time
 from datetime import datetime
 
 from singa_auto.utils.auth import superadmin_client
 from singa_auto.meta_store import MetaStore
-from singa_auto.model import BaseModel, load_model_class, logger as model_logger
-from singa_auto.advisor import Proposal, TrialResult, ParamsType
+from singa_auto.model import BaseModel, LoggerUtils, load_model_class, logger as model_logger, utils as model_utils
+from singa_auto.model.log import LogType
+from singa_auto.advisor import Proposal, TrialResult, ParamsType, IntermediateResult
 from singa_auto.redis import TrainCache, ParamCache
-from singa_auto.data_store import FileDataStore
-from singa_auto.param_store import FileParamStore, ParamStore
+from singa_auto.data_store import FileDataStore, CachedDataStore
+from singa_auto.datasets.image_stats import set_dataset_stat
+from singa_auto.param_store import ParamStore, make_param_store
 from singa_auto.error_code import InvalidWorkerError, InvalidDatasetError
 
-LOOP_SLEEP_SECS = 0.1
+PROPOSAL_WAIT_SECS = 10  # Max time to block for the next proposal at a time
 MAX_CONSEC_TRIAL_ERRORS = 100
 
 
@@ -47,11 +48,12 @@ class TrainWorker:
         self._monitor: _SubTrainJobMonitor = _SubTrainJobMonitor(service_id)
         self._redis_host = os.environ['REDIS_HOST']
         self._redis_port = os.environ['REDIS_PORT']
-        self._param_store: ParamStore = FileParamStore()
+        self._param_store: ParamStore = make_param_store()
         self._trial_id = None  # ID of currently running trial
         self._train_cache: TrainCache = None
         self._param_cache: ParamCache = None
         self._trial_errors = 0  # Consecutive traial errors
+        self._trial_steps = 0  # No. of intermediate results reported for currently running trial
 
     def start(self):
         self._monitor.pull_job_info()
@@ -83,12 +85,11 @@ class TrainWorker:
         else:
             # training as usual
             while True:
-                logger.info('Fetching proposal....')
+                logger.info('Waiting for proposal....')
                 proposal = self._fetch_proposal()
                 if proposal is not None:
                     result = self._perform_trial(proposal)
                     self._submit_result(result)
-                time.sleep(LOOP_SLEEP_SECS)
 
     def stop(self):
         if "DIST_TRAIN_MODEL" in os.environ and os.environ["DIST_TRAIN_MODEL"] == "DIST":
@@ -119,7 +120,7 @@ class TrainWorker:
         self._train_cache.add_worker(self._worker_id)
 
     def _fetch_proposal(self):
-        proposal = self._train_cache.get_proposal(self._worker_id)
+        proposal = self._train_cache.wait_for_proposal(self._worker_id, PROPOSAL_WAIT_SECS)
         return proposal
 
     def _perform_trial(self, proposal: Proposal) -> TrialResult:
@@ -128,10 +129,11 @@ class TrainWorker:
         logger.info(
             f'Starting trial {self._trial_id} with proposal {proposal}...')
         try:
-            # Setup logging
+            # Setup logging, reporting logged metrics as intermediate results
             logger_info = self._start_logging_to_trial(
-                lambda log_line, log_lvl: self._monitor.log_to_trial(
-                    self._trial_id, log_line, log_lvl))
+                lambda log_line, log_lvl: self._handle_trial_log(
+                    proposal, log_line, log_lvl))
+            self._start_trial_control(proposal)
 
             self._monitor.mark_trial_as_running(self._trial_id, proposal)
 
@@ -162,6 +164,7 @@ class TrainWorker:
             return TrialResult(proposal)
         finally:
             self._stop_logging_to_trial(logger_info)
+            self._stop_trial_control()
 
             # Untie from done trial
             self._trial_id = None
@@ -187,6 +190,37 @@ class TrainWorker:
 
         return (root_logger, py_model_logger, log_handler)
 
+    def _handle_trial_log(self, proposal: Proposal, log_line, log_lvl):
+        self._monitor.log_to_trial(proposal.trial_id, log_line, log_lvl)
+
+        log_dict = LoggerUtils.parse_log_line(log_line)
+        if not isinstance(log_dict, dict) or log_dict.get('type') != LogType.METRICS:
+            return
+
+        # Report metrics at the logged epoch, or otherwise at the no. of metrics reported so far
+        metrics = {
+            name: value
+            for (name, value) in log_dict.items()
+            if name not in ('type', 'time')
+        }
+        step = metrics.get('epoch', self._trial_steps)
+        self._trial_steps += 1
+        try:
+            result = IntermediateResult(proposal.trial_no, proposal.trial_id, step, metrics)
+            self._train_cache.add_intermediate_result(self._worker_id, result)
+        except:
+            logger.error('Error reporting intermediate result:')
+            logger.error(traceback.format_exc())
+
+    def _start_trial_control(self, proposal: Proposal):
+        # Allow model to check whether it should stop training early
+        self._trial_steps = 0
+        model_utils.trial.set_should_stop(
+            lambda: self._train_cache.is_trial_stopped(self._worker_id, proposal.trial_id))
+
+    def _stop_trial_control(self):
+        model_utils.trial.set_should_stop(None)
+
     def _load_model(self, proposal: Proposal):
         logger.info('Creating model instance...')
         py_model_class = self._monitor.model_class
@@ -251,8 +285,7 @@ class TrainWorker:
         return store_params_id
 
     def _submit_result(self, result: TrialResult):
-        self._train_cache.create_result(self._worker_id, result)
-        self._train_cache.delete_proposal(self._worker_id)
+        self._train_cache.submit_result(self._worker_id, result)
 
     def _stop_logging_to_trial(self, logger_info):
         (root_logger, py_model_logger, log_handler) = logger_info
@@ -276,7 +309,7 @@ class _SubTrainJobMonitor:
         self.train_args = None
         self._meta_store = meta_store or MetaStore()
         self._service_id = service_id
-        self._data_store = FileDataStore()
+        self._data_store = CachedDataStore(FileDataStore())
 
     def pull_job_info(self):
         service_id = self._service_id
@@ -356,21 +389,30 @@ class _SubTrainJobMonitor:
             if train_job.annotation_dataset_id is not None:
 
                 annotation_dataset = self._meta_store.get_dataset(train_job.annotation_dataset_id)
-                annotation_dataset_path = self._data_store.load(annotation_dataset.store_dataset_id)
+                annotation_dataset_path = self._load_dataset(annotation_dataset)
                 assert annotation_dataset_path is not None
 
             else:
                 annotation_dataset_path = None
 
-            train_dataset_path = self._data_store.load(train_dataset.store_dataset_id)
-            val_dataset_path = self._data_store.load(val_dataset.store_dataset_id)
+            train_dataset_path = self._load_dataset(train_dataset)
+            val_dataset_path = self._load_dataset(val_dataset)
 
             assert train_dataset_path is not None and val_dataset_path is not None
+
+            # Make persisted dataset stats available to models, so that they are not recomputed
+            set_dataset_stat(train_dataset_path, train_dataset.stat)
+            set_dataset_stat(val_dataset_path, val_dataset.stat)
         except Exception as e:
             raise InvalidDatasetError(e)
 
         return (train_dataset_path, val_dataset_path, annotation_dataset_path)
 
+    def _load_dataset(self, dataset):
+        # Load from node-local cache, verifying the dataset against its size & checksum at upload
+        checksum = (dataset.stat or {}).get('checksum')
+        return self._data_store.load(dataset.store_dataset_id, size_bytes=dataset.size_bytes or None, checksum=checksum)
+
 
 class LoggerUtilsHandler(logging.Handler):
 